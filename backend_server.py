@@ -3,7 +3,7 @@ Flask Backend Server for Jupyter Web Interface
 Provides real Python code execution via REST API
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file
 from flask_cors import CORS
 import sys
 import io
@@ -12,10 +12,116 @@ import contextlib
 import threading
 import time
 import subprocess
-from datetime import datetime
+import os
+import uuid
+import json
+import queue
+import signal
+import multiprocessing
+import contextvars
+import types
+import reprlib
+import re
+import fnmatch
+import bisect
+import mmap
+import codecs
+import mimetypes
+import itertools
+import dis
+import ast
+import pickle
+import marshal
+import functools
+import hashlib
+import collections
+import sqlite3
+import base64
+import argparse
+import glob
+import concurrent.futures
+from datetime import datetime, timedelta
+
+SERVER_START_TIME = time.time()
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['X-File-Size', 'X-File-Version', 'X-Truncated', 'Content-Range'])  # Enable CORS for all routes
+
+# Kernel pool configuration (overridable through environment variables)
+KERNEL_POOL_SIZE = int(os.environ.get('JUPYTER_WEB_KERNEL_POOL_SIZE', '2'))  # Pre-forked idle kernels
+KERNEL_IDLE_TIMEOUT = int(os.environ.get('JUPYTER_WEB_KERNEL_IDLE_TIMEOUT', '1800'))  # Seconds before an unused session kernel is reaped
+KERNEL_REAP_INTERVAL = int(os.environ.get('JUPYTER_WEB_KERNEL_REAP_INTERVAL', '60'))  # Seconds between reaper sweeps
+EXECUTION_TIMEOUT = float(os.environ.get('JUPYTER_WEB_EXECUTION_TIMEOUT', '300'))  # Default per-cell time limit (0 disables)
+KERNEL_INTERRUPT_GRACE = float(os.environ.get('JUPYTER_WEB_KERNEL_INTERRUPT_GRACE', '5'))  # Seconds to honour an interrupt before killing
+MAX_CELL_OUTPUT = int(os.environ.get('JUPYTER_WEB_MAX_CELL_OUTPUT', '1000000'))  # Characters of output kept per stream per cell
+STREAM_CHUNK_SIZE = 4096  # Characters buffered before a streamed output chunk is sent
+STREAM_FLUSH_INTERVAL = 0.1  # Seconds before a partial output chunk is sent anyway
+STREAM_PROGRESS_INTERVAL = 1.0  # Seconds between progress events while a cell runs
+STREAM_QUEUE_SIZE = 64  # Pending chunks per kernel before output writes block (backpressure)
+PLOT_CACHE_DIR = os.environ.get('JUPYTER_WEB_PLOT_CACHE_DIR', '.plot_cache')  # Content-addressed plot files
+PLOT_CACHE_MAX_BYTES = int(os.environ.get('JUPYTER_WEB_PLOT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))  # On-disk budget
+PLOT_MEMORY_CACHE_BYTES = int(os.environ.get('JUPYTER_WEB_PLOT_MEMORY_CACHE_BYTES', str(32 * 1024 * 1024)))  # Hot plots kept in RAM
+CELL_CACHE_DIR = os.environ.get('JUPYTER_WEB_CELL_CACHE_DIR', '.cell_cache')  # Pickled results of '%%cache' cells
+CELL_CACHE_MAX_BYTES = int(os.environ.get('JUPYTER_WEB_CELL_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))  # On-disk budget
+CELL_CACHE_MARKER = '%%cache'  # First line that opts a cell into the cell cache
+# Plot rendering defaults; sessions and requests can override them (see get_plot_options)
+PLOT_DEFAULTS = {
+    'format': 'png',  # png, svg, webp, jpeg or auto (svg for light figures, png for dense ones)
+    'dpi': 100,  # Dots per inch, or 'auto' to keep the image under max_pixels
+    'max_points': 100000,  # Artists with more points are decimated (scatter) or rasterized (vector formats)
+    'max_pixels': 1500000,  # Pixel budget used by dpi='auto'
+    'tight': True  # bbox_inches='tight' (costs an extra layout pass)
+}
+PLOT_FORMATS = ('png', 'svg', 'webp', 'jpeg', 'auto')
+VARIABLE_PAGE_SIZE = 50  # Default number of variables per /api/variables page
+VARIABLE_PREVIEW_CHARS = 500  # Maximum length of a variable preview
+VARIABLE_PREVIEW_ROWS = 5  # Rows shown in DataFrame/Series previews
+VARIABLE_SLICE_MAX_ROWS = 1000  # Maximum rows/items returned by one /api/variables/<name> request
+VARIABLE_LOCK_TIMEOUT = 0.5  # Seconds /api/variables waits for a running cell before answering that the kernel is busy
+DEFAULT_SESSION_ID = 'default'
+# Scheduled notebook runs
+SCHEDULER_ENABLED = os.environ.get('JUPYTER_WEB_SCHEDULER_ENABLED', '1') != '0'
+SCHEDULER_DB_PATH = os.environ.get('JUPYTER_WEB_SCHEDULER_DB', os.path.join('.scheduler', 'tasks.db'))  # Durable task store
+SCHEDULER_MAX_CONCURRENCY = int(os.environ.get('JUPYTER_WEB_SCHEDULER_MAX_CONCURRENCY', '2'))  # Task runs executing at once
+SCHEDULER_POLL_INTERVAL = 30.0  # Maximum seconds between schedule checks
+SCHEDULER_MISFIRE_GRACE = float(os.environ.get('JUPYTER_WEB_SCHEDULER_MISFIRE_GRACE', '300'))  # Seconds late before a run counts as missed
+SCHEDULER_MAX_CATCH_UP = 100  # Missed occurrences replayed at most by the 'run_all' policy
+SCHEDULER_HISTORY_LIMIT = 100  # Runs kept per task
+JOB_MAX_WORKERS = int(os.environ.get('JUPYTER_WEB_JOB_MAX_WORKERS', '4'))  # Background jobs executing at once
+JOB_HISTORY_LIMIT = int(os.environ.get('JUPYTER_WEB_JOB_HISTORY_LIMIT', '100'))  # Finished jobs kept for lookup
+PACKAGE_WHEELHOUSE_DIR = os.environ.get('JUPYTER_WEB_WHEELHOUSE', '.wheelhouse')  # Local wheel cache for offline reinstalls
+INSTALL_TIMEOUT = float(os.environ.get('JUPYTER_WEB_INSTALL_TIMEOUT', '600'))  # Seconds one install operation may take
+INSTALL_LOG_LINES = 200  # pip output lines kept per install operation
+INSTALL_HISTORY_LIMIT = 50  # Install operations kept for /api/install/<id>
+DIRECTORY_INDEX_TTL = float(os.environ.get('JUPYTER_WEB_DIRECTORY_INDEX_TTL', '5'))  # Seconds a cached listing may be reused
+DIRECTORY_INDEX_MAX_DIRECTORIES = 1000  # Directory listings kept in memory
+FOLDER_FILE_EXTENSIONS = ('.py', '.ipynb', '.txt', '.md', '.json', '.html', '.css', '.js')  # Shown by /api/files/folder
+SEARCH_INDEX_REFRESH_INTERVAL = 2  # Seconds between background checks of the search index for changed directories
+SEARCH_INDEX_MAX_FILES = 200000  # Files indexed for /api/files/search
+SEARCH_CONTENT_EXTENSIONS = ('.py', '.ipynb')  # Files whose content is searchable
+SEARCH_MAX_FILE_BYTES = 5 * 1024 * 1024  # Larger files are skipped by content search
+SEARCH_CONTENT_CACHE_BYTES = 128 * 1024 * 1024  # Extracted file text kept in memory
+SEARCH_TIME_BUDGET = float(os.environ.get('JUPYTER_WEB_SEARCH_TIME_BUDGET', '2'))  # Seconds one search request may take
+SEARCH_MAX_PAGE_SIZE = 500  # Results returned per search request
+SEARCH_MATCH_TEXT_CHARS = 200  # Characters of a matching line returned
+FILE_CONTENT_INLINE_BYTES = 8 * 1024 * 1024  # Larger files are streamed by /api/files/content
+FILE_STREAM_CHUNK_BYTES = 256 * 1024  # Chunk size of streamed file content
+FILE_PREVIEW_LINES = 1000  # Default line count of head/tail previews
+FILE_PREVIEW_MAX_BYTES = 4 * 1024 * 1024  # Cap on a head/tail preview (e.g. files without newlines)
+NOTEBOOK_FLUSH_INTERVAL = float(os.environ.get('JUPYTER_WEB_NOTEBOOK_FLUSH_INTERVAL', '1'))  # Seconds patched notebooks are batched before being written
+OUTPUT_STORE_DIR = os.environ.get('JUPYTER_WEB_OUTPUT_STORE_DIR', '.output_store')  # Content-addressed blobs of large notebook outputs
+OUTPUT_INLINE_MAX_BYTES = int(os.environ.get('JUPYTER_WEB_OUTPUT_INLINE_MAX_BYTES', '4096'))  # Larger outputs of saved notebooks go to the output store
+UPLOAD_DIR = os.environ.get('JUPYTER_WEB_UPLOAD_DIR', '.uploads')  # Partial uploads until they are complete
+UPLOAD_EXPIRY = float(os.environ.get('JUPYTER_WEB_UPLOAD_EXPIRY', str(24 * 3600)))  # Seconds an idle partial upload is kept
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024  # Chunk size suggested to clients
+UPLOAD_READ_BYTES = 1024 * 1024  # Bytes read from a request body at a time
+# Kernels are forked copy-on-write from a warm template process (multiprocessing forkserver)
+# that has these modules imported already; platforms without fork fall back to spawn
+KERNEL_START_METHOD = os.environ.get(
+    'JUPYTER_WEB_KERNEL_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+KERNEL_PRELOAD = [m for m in os.environ.get('JUPYTER_WEB_KERNEL_PRELOAD', 'numpy,pandas,matplotlib.pyplot').split(',') if m]
 
 # Global namespace for code execution with common imports
 # Common package mappings: variable name -> pip package name
@@ -61,114 +167,481 @@ def detect_missing_package(error_message):
         if match:
             var_name = match.group(1)
             if var_name in PACKAGE_MAPPINGS:
-                missing_packages.append({
-                    'variable': var_name,
-                    'package': PACKAGE_MAPPINGS[var_name],
-                    'install_command': f'pip install {PACKAGE_MAPPINGS[var_name]}'
-                })
+                missing_packages.append(missing_package_info(var_name))
     
     # Extract module name from ImportError/ModuleNotFoundError
     elif "No module named" in error_message:
         import re
         match = re.search(r"No module named '(\w+)'", error_message)
         if match:
-            module_name = match.group(1)
-            package_name = PACKAGE_MAPPINGS.get(module_name, module_name)
-            missing_packages.append({
-                'variable': module_name,
-                'package': package_name,
-                'install_command': f'pip install {package_name}'
-            })
+            missing_packages.append(missing_package_info(match.group(1)))
     
     return missing_packages
 
-def initialize_namespace():
-    """Initialize execution namespace with common scientific computing libraries"""
-    namespace = {
-        '__builtins__': __builtins__,
-        '__name__': '__main__',
-        '__doc__': None
+def missing_package_info(name):
+    """missing_packages entry for a module or alias name"""
+    package_name = PACKAGE_MAPPINGS.get(name, name)
+    return {
+        'variable': name,
+        'package': package_name,
+        'install_command': f'pip install {package_name}'
     }
-    
-    # Try to import common libraries
+
+# Top-level module names known to be importable (only positives are cached, so a
+# package installed by other means is picked up on the next check)
+module_spec_index = set()
+
+def module_available(module_name):
+    """Whether a module can be imported, without importing it"""
+    import importlib.util
+    top_level = module_name.split('.')[0]
+    if top_level in module_spec_index or top_level in sys.modules:
+        return True
     try:
-        import numpy as np
-        namespace['np'] = np
-        namespace['numpy'] = np
-    except ImportError:
-        pass
+        found = importlib.util.find_spec(top_level) is not None
+    except (ImportError, ValueError):
+        found = False
+    if found:
+        module_spec_index.add(top_level)
+    return found
+
+class ImportCollector(ast.NodeVisitor):
+    """Absolute imports a cell runs unconditionally at module level
     
-    try:
-        import pandas as pd
-        namespace['pd'] = pd
-        namespace['pandas'] = pd
-    except ImportError:
+    Only top-level statements count, plus the body of a try block that does not handle
+    ImportError (optional dependencies) and its finally block. Imports under if, for,
+    while, with or match (platform guards like ``if sys.platform == 'win32': import
+    winreg``), in except/else branches and in function bodies are ignored; if such an
+    import fails, the cell reports it when it runs.
+    """
+    
+    GUARD_EXCEPTIONS = {'ImportError', 'ModuleNotFoundError', 'Exception', 'BaseException'}
+    
+    def __init__(self):
+        self.modules = []
+    
+    def visit_Import(self, node):
+        self.modules.extend(alias.name for alias in node.names)
+    
+    def visit_ImportFrom(self, node):
+        if node.level == 0 and node.module:
+            self.modules.append(node.module)
+    
+    def visit_FunctionDef(self, node):
         pass
     
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_Lambda = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+    visit_If = visit_FunctionDef
+    visit_For = visit_FunctionDef
+    visit_AsyncFor = visit_FunctionDef
+    visit_While = visit_FunctionDef
+    visit_With = visit_FunctionDef
+    visit_AsyncWith = visit_FunctionDef
+    visit_Match = visit_FunctionDef
+    
+    def visit_Try(self, node):
+        def handles_import_errors(handler):
+            if handler.type is None:
+                return True
+            types_ = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+            return any(isinstance(t, ast.Name) and t.id in self.GUARD_EXCEPTIONS for t in types_)
+        
+        if not any(handles_import_errors(handler) for handler in node.handlers):
+            for statement in node.body:
+                self.visit(statement)
+        for statement in node.finalbody:
+            self.visit(statement)
+    
+    visit_TryStar = visit_Try
+
+def preflight_missing_packages(code):
+    """All packages a cell needs that are not installed, found before it runs
+    
+    Checks the modules the cell imports and the PACKAGE_MAPPINGS aliases it reads that
+    are still unimported placeholders. Returns missing_packages entries ([] if none,
+    or if the cell does not parse: execution then reports the syntax error).
+    """
     try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    
+    collector = ImportCollector()
+    collector.visit(tree)
+    names = [module.split('.')[0] for module in collector.modules]
+    names += [
+        alias for alias in sorted(cell_input_names(code))
+        if isinstance(execution_namespace.get(alias), LazyModule)
+    ]
+    
+    missing = [
+        missing_package_info(name) for name in dict.fromkeys(names)
+        if not module_available(ALIAS_MODULES.get(name, name))
+    ]
+    
+    # One entry per pip package (e.g. 'np' and 'numpy')
+    return list({info['package']: info for info in missing}.values())
+
+# Namespace aliases whose module name differs from the alias itself
+ALIAS_MODULES = {
+    'np': 'numpy',
+    'pd': 'pandas',
+    'plt': 'matplotlib.pyplot',
+    'sns': 'seaborn',
+    'tf': 'tensorflow'
+}
+
+def configure_matplotlib_environment():
+    """Prepare matplotlib for headless use without importing it"""
+    # Use Anti-Grain Geometry backend (no GUI) whenever matplotlib gets imported
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    
+    # Suppress matplotlib warnings for web environment
+    import warnings
+    warnings.filterwarnings('ignore', message='FigureCanvasAgg is non-interactive')
+    warnings.filterwarnings('ignore', message='.*cannot be shown.*')
+    warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
+
+def patch_pyplot():
+    """Override plt.show() since we capture plots automatically"""
+    plt = sys.modules.get('matplotlib.pyplot')
+    if plt is None or getattr(plt.show, '_web_override', False):
+        return
+    
+    def show_override(*args, **kwargs):
+        """Replacement for plt.show() in web environment: publishes figures when streaming"""
+        publish_figures()
+    
+    show_override._web_override = True
+    plt.show = show_override
+
+def import_namespace_module(module_name):
+    """Import a module for a namespace alias, applying web-specific setup"""
+    import importlib
+    if module_name.split('.')[0] in ('matplotlib', 'seaborn'):
         import matplotlib
         # Set non-interactive backend before importing pyplot
-        matplotlib.use('Agg')  # Use Anti-Grain Geometry backend (no GUI)
-        import matplotlib.pyplot as plt
-        
-        # Suppress matplotlib warnings for web environment
-        import warnings
-        warnings.filterwarnings('ignore', message='FigureCanvasAgg is non-interactive')
-        warnings.filterwarnings('ignore', message='.*cannot be shown.*')
-        warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
-        
-        # Override plt.show() to be a no-op since we capture plots automatically
-        def show_override():
-            """No-op replacement for plt.show() in web environment"""
-            pass
-        
-        plt.show = show_override
-        
-        namespace['plt'] = plt
-        namespace['matplotlib'] = matplotlib
-        print("✓ Successfully imported matplotlib with Agg backend")
-    except ImportError as e:
-        print(f"✗ Failed to import matplotlib: {e}")
-        pass
+        matplotlib.use('Agg')
+    module = importlib.import_module(module_name)
+    patch_pyplot()
+    return module
+
+class LazyModule(types.ModuleType):
+    """Placeholder bound to a namespace alias that imports the real module on first use
     
-    try:
-        import seaborn as sns
-        namespace['sns'] = sns
-        namespace['seaborn'] = sns
-    except ImportError:
-        pass
+    On first attribute access the module is imported and the placeholder rebinds the
+    alias in its namespace to the real module, so later lookups cost nothing.
+    """
     
-    try:
-        import scipy
-        namespace['scipy'] = scipy
-    except ImportError:
-        pass
+    def __init__(self, alias, module_name, namespace):
+        super().__init__(module_name)
+        object.__setattr__(self, '_lazy_alias', alias)
+        object.__setattr__(self, '_lazy_namespace', namespace)
+    
+    def _load(self):
+        module = import_namespace_module(self.__name__)
+        namespace = self._lazy_namespace
+        if namespace.get(self._lazy_alias) is self:
+            namespace[self._lazy_alias] = module
+        return module
+    
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+    
+    def __dir__(self):
+        return dir(self._load())
+    
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}' (not imported yet)>"
+
+def initialize_namespace():
+    """Initialize execution namespace with lazily imported scientific computing libraries"""
+    global namespace_init_time
+    start_time = time.time()
     
-    print(f"📦 Initialized namespace with {len(namespace)} items:")
-    for key in sorted(namespace.keys()):
-        if not key.startswith('__'):
-            print(f"   - {key}")
+    namespace = {
+        '__builtins__': __builtins__,
+        '__name__': '__main__',
+        '__doc__': None
+    }
+    
+    configure_matplotlib_environment()
+    patch_pyplot()
+    
+    # Bind every known alias to a placeholder; the module is imported the first
+    # time a cell uses it (a missing package then raises ModuleNotFoundError)
+    for alias in PACKAGE_MAPPINGS:
+        module = sys.modules.get(ALIAS_MODULES.get(alias, alias))
+        namespace[alias] = module or LazyModule(alias, ALIAS_MODULES.get(alias, alias), namespace)
+    
+    namespace_init_time = time.time() - start_time
+    lazy_count = sum(isinstance(v, LazyModule) for v in namespace.values())
+    print(f"📦 Initialized namespace with {len(namespace)} items "
+          f"({lazy_count} lazy imports) in {namespace_init_time * 1000:.1f}ms")
     
     return namespace
 
+namespace_init_time = 0.0
 execution_namespace = initialize_namespace()
 
+# Per-execution state, local to the executing thread/context so concurrent executions never mix
+current_stdout = contextvars.ContextVar('current_stdout', default=None)
+current_stderr = contextvars.ContextVar('current_stderr', default=None)
+# Receives streaming events ('stream', 'display') of the running execution, if any
+display_listener = contextvars.ContextVar('display_listener', default=None)
+# Plot rendering options of the running execution (overrides of PLOT_DEFAULTS)
+current_plot_options = contextvars.ContextVar('current_plot_options', default=None)
+
+class ContextLocalStream(io.TextIOBase):
+    """Stand-in for sys.stdout/sys.stderr that writes to the current context's capture
+    
+    Installed once for the whole process; writes outside any execution (server logs)
+    go to the original stream.
+    """
+    
+    def __init__(self, target_var, fallback):
+        self._target_var = target_var
+        self._fallback = fallback
+    
+    def _target(self):
+        return self._target_var.get() or self._fallback
+    
+    def writable(self):
+        return True
+    
+    def write(self, text):
+        return self._target().write(text)
+    
+    def flush(self):
+        target = self._target()
+        if target is not None and hasattr(target, 'flush'):
+            target.flush()
+    
+    def isatty(self):
+        return self._target() is self._fallback and self._fallback.isatty()
+    
+    def fileno(self):
+        return self._fallback.fileno()
+    
+    def __getattr__(self, name):
+        # encoding, errors, buffer, ... of the real stream
+        return getattr(self._fallback, name)
+
+def install_output_proxies():
+    """Route sys.stdout/sys.stderr through context-local streams (idempotent)"""
+    if not isinstance(sys.stdout, ContextLocalStream):
+        sys.stdout = ContextLocalStream(current_stdout, sys.stdout)
+    if not isinstance(sys.stderr, ContextLocalStream):
+        sys.stderr = ContextLocalStream(current_stderr, sys.stderr)
+
+install_output_proxies()
+
+class OutputCapture(io.TextIOBase):
+    """Text stream capturing cell output up to a size cap, optionally forwarding it as stream events"""
+    
+    def __init__(self, name, listener=None, retain=True, limit=MAX_CELL_OUTPUT):
+        self.name = name
+        self.listener = listener
+        self.retain = retain
+        self.limit = limit
+        self.size = 0
+        self.truncated = False
+        self._parts = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, text):
+        length = len(text)
+        if self.truncated or not text:
+            return length
+        
+        if self.size + length > self.limit:
+            text = text[:self.limit - self.size] + f"\n[Output truncated: {self.name} exceeded {self.limit} characters]\n"
+            self.truncated = True
+        self.size += len(text)
+        
+        if self.retain:
+            self._parts.append(text)
+        if self.listener:
+            self.listener({'type': 'stream', 'name': self.name, 'text': text})
+        return length
+    
+    def getvalue(self):
+        return ''.join(self._parts)
+
+def publish_figures():
+    """Send open matplotlib figures to the streaming listener right away (plt.show)"""
+    listener = display_listener.get()
+    if listener is None:
+        return
+    plots = capture_matplotlib_plots()
+    if plots:
+        listener({'type': 'display', 'plots': plots})
+
 class CodeExecutionResult:
-    def __init__(self, success=True, output="", error="", execution_time=0, missing_packages=None, plots=None):
+    def __init__(self, success=True, output="", error="", execution_time=0, missing_packages=None, plots=None,
+                 interrupted=False, variables_delta=None, reused=False, cache=None):
         self.success = success
         self.output = output
         self.error = error
         self.execution_time = execution_time
         self.missing_packages = missing_packages or []
         self.plots = plots or []
+        self.interrupted = interrupted
+        self.variables_delta = variables_delta
+        self.reused = reused  # Replayed from an earlier run by incremental execution
+        self.cache = cache  # Cell cache lookup ({'hit': ..., 'bytes': ...}) for cached cells
         self.timestamp = datetime.now().isoformat()
 
+def interrupt_thread(thread_id, exception=KeyboardInterrupt):
+    """Asynchronously raise an exception in another thread (None clears a pending one)"""
+    import ctypes
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id),
+                                               ctypes.py_object(exception) if exception else None)
+
+class ExecutionWatchdog:
+    """Raise KeyboardInterrupt in the executing thread once the timeout elapses"""
+    
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.fired = False
+        self._done = False
+        self._timer = None
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        if self.timeout:
+            self._timer = threading.Timer(self.timeout, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+    
+    def _fire(self):
+        with self._lock:
+            if not self._done:
+                self.fired = True
+                interrupt_thread(self._thread_id)
+    
+    def __exit__(self, *exc_info):
+        if self._timer:
+            self._timer.cancel()
+        with self._lock:
+            self._done = True
+            if self.fired:
+                # Drop the interrupt if it has not been delivered yet
+                interrupt_thread(self._thread_id, None)
+        return False
+
+def count_artist_points(artist):
+    """Number of data points drawn by a line or scatter artist (0 for anything else)"""
+    from matplotlib.collections import PathCollection
+    from matplotlib.lines import Line2D
+    if isinstance(artist, Line2D):
+        return len(artist.get_xdata(orig=False))
+    if isinstance(artist, PathCollection):
+        return len(artist.get_offsets())
+    return 0
+
+def reduce_dense_artists(fig, max_points, vector):
+    """Decimate scatter plots and rasterize dense artists in vector output; returns artists touched"""
+    from matplotlib.collections import PathCollection
+    touched = 0
+    
+    for ax in fig.get_axes():
+        for artist in list(ax.lines) + list(ax.collections):
+            points = count_artist_points(artist)
+            if points <= max_points:
+                continue
+            touched += 1
+            
+            if isinstance(artist, PathCollection):
+                # Keep an even sample of the points (and of any per-point styling)
+                step = -(-points // max_points)
+                artist.set_offsets(artist.get_offsets()[::step])
+                sizes = artist.get_sizes()
+                if len(sizes) == points:
+                    artist.set_sizes(sizes[::step])
+                for getter, setter in ((artist.get_facecolors, artist.set_facecolors),
+                                       (artist.get_edgecolors, artist.set_edgecolors)):
+                    colors = getter()
+                    if len(colors) == points:
+                        setter(colors[::step])
+                array = artist.get_array()
+                if array is not None and len(array) == points:
+                    artist.set_array(array[::step])
+            if vector:
+                # Millions of vector paths make huge, slow SVGs
+                artist.set_rasterized(True)
+    return touched
+
+def choose_plot_format(fig, options):
+    """Resolve the 'auto' format: SVG for light figures, PNG once any artist is dense"""
+    if options['format'] != 'auto':
+        return options['format']
+    total_points = sum(
+        count_artist_points(artist)
+        for ax in fig.get_axes() for artist in list(ax.lines) + list(ax.collections)
+    )
+    return 'svg' if total_points <= options['max_points'] // 10 else 'png'
+
+def choose_plot_dpi(fig, options):
+    """Resolve dpi='auto' to stay within the pixel budget (never above 100 dpi)"""
+    if options['dpi'] != 'auto':
+        return options['dpi']
+    width, height = fig.get_size_inches()
+    return max(30, min(100, int((options['max_pixels'] / (width * height)) ** 0.5)))
+
+PLOT_MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+def render_figure(fig, options):
+    """Render one figure according to the plot options"""
+    from io import BytesIO
+    start_time = time.time()
+    
+    plot_format = choose_plot_format(fig, options)
+    decimated = reduce_dense_artists(fig, options['max_points'], vector=plot_format == 'svg')
+    dpi = choose_plot_dpi(fig, options)
+    
+    import matplotlib
+    img_buffer = BytesIO()
+    save_kwargs = {'format': plot_format, 'dpi': dpi}
+    if options['tight']:
+        save_kwargs['bbox_inches'] = 'tight'
+    if plot_format == 'svg':
+        save_kwargs['metadata'] = {'Date': None}
+    try:
+        # Fixed SVG id salt keeps output (and so its content hash) identical across runs
+        with matplotlib.rc_context({'svg.hashsalt': 'jupyter-web'}):
+            fig.savefig(img_buffer, **save_kwargs)
+    except ValueError:
+        # webp/jpeg need Pillow; fall back to PNG
+        plot_format = save_kwargs['format'] = 'png'
+        img_buffer = BytesIO()
+        fig.savefig(img_buffer, **save_kwargs)
+    
+    return {
+        'data': img_buffer.getvalue(),
+        'mime': PLOT_MIME_TYPES[plot_format],
+        'dpi': dpi,
+        'decimated_artists': decimated,
+        'render_time': time.time() - start_time
+    }
+
 def capture_matplotlib_plots():
-    """Capture any matplotlib plots and return as base64 images"""
+    """Capture any matplotlib plots as rendered images ({'data': bytes, 'mime': ..., 'render_time': ...})"""
+    if 'matplotlib.pyplot' not in sys.modules:
+        # Nothing can have been plotted; don't pay for importing pyplot
+        return []
     try:
         import matplotlib.pyplot as plt
-        import base64
-        from io import BytesIO
+        options = {**PLOT_DEFAULTS, **(current_plot_options.get() or {})}
         
         # Get all figure numbers
         figs = plt.get_fignums()
@@ -176,15 +649,7 @@ def capture_matplotlib_plots():
         
         for fig_num in figs:
             fig = plt.figure(fig_num)
-            
-            # Save plot to BytesIO
-            img_buffer = BytesIO()
-            fig.savefig(img_buffer, format='png', bbox_inches='tight', dpi=100)
-            img_buffer.seek(0)
-            
-            # Convert to base64
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-            plots.append(f'data:image/png;base64,{img_base64}')
+            plots.append(render_figure(fig, options))
             
             # Close the figure to free memory
             plt.close(fig)
@@ -193,34 +658,55 @@ def capture_matplotlib_plots():
     except:
         return []
 
-def execute_python_code(code, timeout=30):
+def execute_python_code(code, timeout=EXECUTION_TIMEOUT, listener=None, plot_options=None):
     """
     Execute Python code safely with output capture
+    
+    Code running longer than ``timeout`` seconds is interrupted with KeyboardInterrupt.
+    With a ``listener``, stdout is streamed to it as it is written instead of being
+    returned in the result, and figures shown with plt.show() are published immediately.
+    ``plot_options`` override PLOT_DEFAULTS for rendering this cell's figures.
     """
-    # Capture stdout and stderr
+    # Report every missing package at once instead of failing on the first import; only
+    # code that actually runs is checked, not cells reused or served from the cell cache
+    missing_packages = preflight_missing_packages(code)
+    if missing_packages:
+        names = ', '.join(info['package'] for info in missing_packages)
+        return CodeExecutionResult(success=False, error=f"ModuleNotFoundError: Missing packages: {names}",
+                                   missing_packages=missing_packages)
+    
+    # Capture stdout and stderr for this execution only: sys.stdout stays the
+    # process-wide ContextLocalStream, so concurrent executions in other threads
+    # (and server log prints) are unaffected
+    install_output_proxies()
     old_stdout = sys.stdout
     old_stderr = sys.stderr
     
-    stdout_capture = io.StringIO()
-    stderr_capture = io.StringIO()
+    stdout_capture = OutputCapture('stdout', listener, retain=listener is None)
+    stderr_capture = OutputCapture('stderr', listener)
     
     start_time = time.time()
+    watchdog = ExecutionWatchdog(timeout)
+    context_tokens = []
+    tracker = None
     
     try:
-        # Redirect output streams
-        sys.stdout = stdout_capture
-        sys.stderr = stderr_capture
+        # Redirect output streams of the current context
+        context_tokens = [
+            (current_stdout, current_stdout.set(stdout_capture)),
+            (current_stderr, current_stderr.set(stderr_capture)),
+            (display_listener, display_listener.set(listener)),
+            (current_plot_options, current_plot_options.set(plot_options))
+        ]
         
-        # Execute the code in the global namespace
-        exec(code, execution_namespace)
+        # Execute the code in the global namespace, tracking the names it changes
+        compiled = compile(code, '<string>', 'exec')
+        tracker = NamespaceTracker(execution_namespace, compiled)
+        with watchdog:
+            exec(compiled, execution_namespace)
         
         execution_time = time.time() - start_time
         
-        # Debug: Print current namespace variables
-        user_vars = {k: str(type(v).__name__) for k, v in execution_namespace.items() 
-                    if not k.startswith('__') and not callable(v)}
-        print(f"🔍 Current namespace variables: {user_vars}")
-        
         # Capture any matplotlib plots
         plots = capture_matplotlib_plots()
         
@@ -234,7 +720,8 @@ def execute_python_code(code, timeout=30):
                 output=output,
                 error=error_output,
                 execution_time=execution_time,
-                plots=plots
+                plots=plots,
+                variables_delta=tracker.delta()
             )
         
         return CodeExecutionResult(
@@ -242,9 +729,26 @@ def execute_python_code(code, timeout=30):
             output=output,
             error="",
             execution_time=execution_time,
-            plots=plots
+            plots=plots,
+            variables_delta=tracker.delta()
         )
         
+    except KeyboardInterrupt:
+        execution_time = time.time() - start_time
+        if watchdog.fired:
+            error_msg = f"TimeoutError: Execution exceeded the {timeout:g}s time limit and was interrupted"
+        else:
+            error_msg = "KeyboardInterrupt: Execution interrupted"
+        
+        return CodeExecutionResult(
+            success=False,
+            output=stdout_capture.getvalue(),
+            error=f"{error_msg}\n\n{traceback.format_exc()}",
+            execution_time=execution_time,
+            interrupted=True,
+            variables_delta=tracker.delta() if tracker else None
+        )
+    
     except Exception as e:
         execution_time = time.time() - start_time
         error_msg = f"{type(e).__name__}: {str(e)}"
@@ -267,523 +771,4440 @@ def execute_python_code(code, timeout=30):
             error=f"{error_msg}\n\n{traceback_msg}",
             execution_time=execution_time,
             missing_packages=missing_packages,
-            plots=[]
+            plots=[],
+            variables_delta=tracker.delta() if tracker else None
         )
     
     finally:
-        # Restore original streams
+        # Restore original streams (and the proxies, should the cell have replaced them)
+        for var, token in reversed(context_tokens):
+            var.reset(token)
         sys.stdout = old_stdout
         sys.stderr = old_stderr
 
-@app.route('/api/execute', methods=['POST'])
-def execute_code():
+# ================================
+# VARIABLE INSPECTION
+# ================================
+
+variable_repr = reprlib.Repr()
+variable_repr.maxstring = VARIABLE_PREVIEW_CHARS
+variable_repr.maxother = VARIABLE_PREVIEW_CHARS
+variable_repr.maxlist = variable_repr.maxtuple = variable_repr.maxset = variable_repr.maxdict = 10
+
+def is_user_variable(name, value, show_all=False):
+    """Whether a namespace entry is user data (modules and callables only with show_all)"""
+    if name.startswith('__'):
+        return False
+    if show_all:
+        return True
+    return not isinstance(value, (types.ModuleType, type)) and not callable(value)
+
+def variable_memory_size(value, deep=False):
+    """Memory footprint in bytes without rendering the object (deep counts Python objects inside pandas data)"""
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=deep).sum())
+    if pd is not None and isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=deep))
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+def variable_preview(value):
+    """Short, bounded text preview of a value"""
+    np = sys.modules.get('numpy')
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        text = value.head(VARIABLE_PREVIEW_ROWS).to_string(max_cols=20)
+    elif np is not None and isinstance(value, np.ndarray):
+        text = np.array2string(value, threshold=100, edgeitems=3)
+    else:
+        text = variable_repr.repr(value)
+    
+    if len(text) > VARIABLE_PREVIEW_CHARS:
+        text = text[:VARIABLE_PREVIEW_CHARS] + '...'
+    return text
+
+def describe_variable(name, value, deep=False):
+    """Type, shape, dtype, size and a bounded preview of one variable"""
+    if isinstance(value, types.ModuleType):
+        # Probing attributes would import lazy placeholders
+        return {'name': name, 'type': 'module', 'module': value.__name__, 'preview': repr(value)}
+    
+    info = {
+        'name': name,
+        'type': type(value).__name__,
+        'module': type(value).__module__,
+        'nbytes': variable_memory_size(value, deep=deep)
+    }
+    
+    shape = getattr(value, 'shape', None)
+    if isinstance(shape, tuple):
+        info['shape'] = list(shape)
+    
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(value, pd.DataFrame):
+        info['dtype'] = {str(column): str(dtype) for column, dtype in list(value.dtypes.items())[:50]}
+    elif hasattr(value, 'dtype'):
+        info['dtype'] = str(value.dtype)
+    
+    if isinstance(value, (str, bytes, list, tuple, dict, set, frozenset, range)):
+        info['length'] = len(value)
+    
+    info['preview'] = variable_preview(value)
+    return info
+
+def list_user_variables(offset=0, limit=VARIABLE_PAGE_SIZE, name_filter='', type_filter='',
+                        deep=False, show_all=False):
+    """One page of variable descriptions, filtered by name substring and type name"""
+    name_filter = name_filter.lower()
+    type_filter = type_filter.lower()
+    
+    names = sorted(
+        name for name, value in execution_namespace.items()
+        if is_user_variable(name, value, show_all)
+        and name_filter in name.lower()
+        and (not type_filter or type(value).__name__.lower() == type_filter)
+    )
+    
+    page = names[offset:offset + limit]
+    return {
+        'total': len(names),
+        'offset': offset,
+        'limit': limit,
+        'variables': [describe_variable(name, execution_namespace[name], deep=deep) for name in page]
+    }
+
+# Names whose use lets a cell bind globals the bytecode does not show
+DYNAMIC_BINDING_NAMES = {'globals', 'vars', 'locals', 'exec', 'eval', 'execution_namespace'}
+
+@functools.lru_cache(maxsize=256)
+def analyse_cell_names(code_object):
+    """Names a compiled cell may bind/delete and read at module level
+    
+    Returns (bound, read), or (None, None) when the cell can rebind arbitrary
+    names (star imports, globals(), exec, ...).
     """
-    Execute Python code endpoint
+    bound, read = set(), set()
+    pending = [(code_object, True)]
+    while pending:
+        code, top_level = pending.pop()
+        for instruction in dis.get_instructions(code):
+            opname = instruction.opname
+            if opname == 'IMPORT_STAR':
+                return None, None
+            if opname in ('STORE_GLOBAL', 'DELETE_GLOBAL') or (top_level and opname in ('STORE_NAME', 'DELETE_NAME')):
+                bound.add(instruction.argval)
+            elif opname in ('LOAD_GLOBAL', 'LOAD_NAME'):
+                read.add(instruction.argval)
+        pending.extend((const, False) for const in code.co_consts if isinstance(const, types.CodeType))
+    
+    if read & DYNAMIC_BINDING_NAMES:
+        return None, None
+    return frozenset(bound), frozenset(read)
+
+@functools.lru_cache(maxsize=256)
+def cell_input_names(code):
+    """Names a cell may read before binding them itself, i.e. its inputs from earlier cells
+    
+    Top-level statements are scanned in order; a name only stops being an input once an
+    unconditional statement (assignment, import, def, class) has bound it.
     """
-    try:
-        data = request.get_json()
-        
-        if not data or 'code' not in data:
-            return jsonify({
-                'success': False,
-                'error': 'No code provided'
-            }), 400
+    assigned, inputs = set(), set()
+    for statement in ast.parse(code).body:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in assigned:
+                inputs.add(node.id)
         
-        code = data['code']
-        cell_id = data.get('cell_id', 'unknown')
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            assigned.update((alias.asname or alias.name).split('.')[0] for alias in statement.names)
+        elif isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            assigned.add(statement.name)
+        elif isinstance(statement, (ast.Assign, ast.AnnAssign)) and statement.value is not None:
+            targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+            assigned.update(
+                node.id for target in targets for node in ast.walk(target)
+                if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+            )
+    return frozenset(inputs)
+
+def variable_version(value):
+    """Cheap change signature: identity, type and, for data containers, length/shape
+    
+    Modules are keyed by name, so a LazyModule and the module it imports compare equal.
+    """
+    if isinstance(value, types.ModuleType):
+        return types.ModuleType, value.__name__
+    if isinstance(value, (list, dict, set, bytearray)):
+        return id(value), type(value), len(value)
+    shape = getattr(value, 'shape', None)
+    return id(value), type(value), shape if isinstance(shape, tuple) else None
+
+class NamespaceTracker:
+    """Diff the namespace entries a cell can touch before and after it runs
+    
+    Only the names found in the cell's bytecode are snapshotted, so the cost follows
+    the cell, not the session size. Cells that can bind arbitrary names fall back to
+    an identity snapshot of the whole namespace (still nothing is stringified).
+    """
+    
+    def __init__(self, namespace, code_object):
+        self.namespace = namespace
+        bound, read = analyse_cell_names(code_object)
+        self.watched = None if bound is None else bound | read
+        names = namespace if self.watched is None else self.watched
+        self.before = {name: variable_version(namespace[name]) for name in names if name in namespace}
+    
+    def delta(self):
+        """{'created': [...], 'updated': [...], 'deleted': [...]}; created/updated are variable descriptions"""
+        namespace = self.namespace
+        names = namespace.keys() if self.watched is None else self.watched
+        after = {name: variable_version(namespace[name]) for name in names if name in namespace}
         
-        # Execute the code
-        result = execute_python_code(code)
-        
-        response = {
-            'success': result.success,
-            'output': result.output,
-            'error': result.error,
-            'execution_time': result.execution_time,
-            'timestamp': result.timestamp,
-            'cell_id': cell_id,
-            'missing_packages': result.missing_packages,
-            'plots': result.plots
-        }
+        created = [name for name in after if name not in self.before]
+        updated = [name for name in after if name in self.before and after[name] != self.before[name]]
+        deleted = [name for name in self.before if name not in after and not name.startswith('__')]
         
-        return jsonify(response)
+        def describe(changed):
+            return [
+                describe_variable(name, namespace[name]) for name in sorted(changed)
+                if is_user_variable(name, namespace[name])
+            ]
         
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': f'Server error: {str(e)}'
-        }), 500
+        return {
+            'created': describe(created),
+            'updated': describe(updated),
+            'deleted': sorted(deleted)
+        }
 
-@app.route('/api/reset', methods=['POST'])
-def reset_namespace():
-    """
-    Reset the execution namespace (like restarting kernel)
-    """
-    global execution_namespace
+def json_safe(value):
+    """Convert a value to something jsonify can encode (NaN/inf become None)"""
+    if isinstance(value, float):
+        return value if value == value and value not in (float('inf'), float('-inf')) else None
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): json_safe(item) for key, item in value.items()}
+    if hasattr(value, 'item') and getattr(value, 'ndim', None) == 0:
+        return json_safe(value.item())  # NumPy scalar
+    return variable_repr.repr(value)
+
+def slice_variable(name, start=0, stop=None, columns=None):
+    """Rows/items ``start:stop`` of a variable (DataFrame, Series, array, sequence, mapping or string)"""
+    if name not in execution_namespace or name.startswith('__'):
+        return {'found': False, 'error': f"Variable '{name}' is not defined"}
+    value = execution_namespace[name]
     
-    # Reset to fresh namespace with common imports
-    execution_namespace = initialize_namespace()
+    stop = start + VARIABLE_SLICE_MAX_ROWS if stop is None else min(stop, start + VARIABLE_SLICE_MAX_ROWS)
+    result = {'found': True, 'name': name, 'type': type(value).__name__, 'start': start}
     
-    return jsonify({
-        'success': True,
-        'message': 'Execution namespace reset successfully'
-    })
+    np = sys.modules.get('numpy')
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(value, pd.DataFrame):
+        if columns:
+            missing = [column for column in columns if column not in value.columns]
+            if missing:
+                return {'found': True, 'error': f"Unknown columns: {', '.join(missing)}"}
+            value = value[columns]
+        result['total'] = len(value)
+        result['data'] = json.loads(value.iloc[start:stop].to_json(orient='split', date_format='iso'))
+    elif pd is not None and isinstance(value, pd.Series):
+        result['total'] = len(value)
+        result['data'] = json.loads(value.iloc[start:stop].to_json(orient='split', date_format='iso'))
+    elif np is not None and isinstance(value, np.ndarray):
+        if value.ndim == 0:
+            return {'found': True, 'error': f"Variable '{name}' is a scalar array"}
+        result['total'] = value.shape[0]
+        result['data'] = json_safe(value[start:stop].tolist())
+    elif isinstance(value, (list, tuple, range, str, bytes)):
+        result['total'] = len(value)
+        part = value[start:stop]
+        result['data'] = part if isinstance(part, str) else json_safe(list(part))
+    elif isinstance(value, dict):
+        result['total'] = len(value)
+        items = itertools.islice(value.items(), start, stop)
+        result['data'] = [[json_safe(key), json_safe(item)] for key, item in items]
+    else:
+        return {'found': True, 'error': f"Variable '{name}' of type {type(value).__name__} cannot be sliced"}
+    
+    result['stop'] = min(stop, result['total'])
+    return result
 
-@app.route('/api/variables', methods=['GET'])
-def get_variables():
-    """
-    Get current variables in the namespace
+def inject_installed_packages(packages):
+    """Make freshly installed packages importable here and bind their PACKAGE_MAPPINGS aliases
+    
+    Returns the aliases that now resolve. Aliases are bound lazily, like at namespace
+    initialisation; names a user has rebound to their own values are left alone.
     """
-    # Filter out built-in variables
-    user_vars = {
-        k: str(v) for k, v in execution_namespace.items() 
-        if not k.startswith('__') and k != '__builtins__'
-    }
+    import importlib
+    import importlib.util
+    # Path finders cache directory listings; without this a package installed after
+    # a failed import can stay invisible to this process
+    importlib.invalidate_caches()
     
-    return jsonify({
-        'success': True,
-        'variables': user_vars
-    })
+    installed = {requirement_name(package) for package in packages}
+    bound = []
+    for alias, package in PACKAGE_MAPPINGS.items():
+        if requirement_name(package) not in installed:
+            continue
+        module_name = ALIAS_MODULES.get(alias, alias)
+        current = execution_namespace.get(alias)
+        if alias in execution_namespace and not isinstance(current, types.ModuleType):
+            continue  # The user's own value
+        try:
+            if importlib.util.find_spec(module_name.split('.')[0]) is None:
+                continue
+        except (ImportError, ValueError):
+            continue
+        if current is None or isinstance(current, LazyModule):
+            execution_namespace[alias] = sys.modules.get(module_name) or LazyModule(alias, module_name,
+                                                                                      execution_namespace)
+        bound.append(alias)
+    return bound
 
-@app.route('/api/status', methods=['GET'])
-def get_status():
-    """
-    Get server status
-    """
-    return jsonify({
-        'success': True,
-        'status': 'running',
-        'python_version': sys.version,
-        'available_modules': list(sys.modules.keys())[:20]  # First 20 modules
-    })
+# ================================
+# PLOT STORE
+# ================================
 
-@app.route('/api/install', methods=['POST'])
-def install_package():
-    """
-    Install Python package using pip
+PLOT_EXTENSIONS = {'image/png': 'png', 'image/svg+xml': 'svg', 'image/webp': 'webp', 'image/jpeg': 'jpg'}
+
+class PlotStore:
+    """Content-addressed plot cache: a bounded in-memory LRU in front of a bounded directory
+    
+    Plots are keyed by the SHA-256 of their bytes, so re-rendering an identical figure
+    yields the same id (and URL) and the browser can reuse its cached copy.
     """
-    try:
-        data = request.get_json()
-        package = data.get('package', '')
+    
+    def __init__(self, directory=PLOT_CACHE_DIR, max_disk_bytes=PLOT_CACHE_MAX_BYTES,
+                 max_memory_bytes=PLOT_MEMORY_CACHE_BYTES):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()  # plot id -> (bytes, mime), most recent last
+        self._memory_bytes = 0
+        self._disk = collections.OrderedDict()  # plot id -> (file name, size), most recent last
+        self._disk_bytes = 0
+        self._load_index()
+    
+    def _load_index(self):
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                plot_id, _, extension = entry.name.partition('.')
+                if entry.is_file() and extension in PLOT_EXTENSIONS.values():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, plot_id, entry.name, stat.st_size))
+        for _, plot_id, name, size in sorted(entries):
+            self._disk[plot_id] = (name, size)
+            self._disk_bytes += size
+    
+    def _remember(self, plot_id, data, mime):
+        # Caller holds the lock
+        if plot_id in self._memory:
+            self._memory.move_to_end(plot_id)
+            return
+        self._memory[plot_id] = (data, mime)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+    
+    def put(self, data, mime='image/png'):
+        """Store plot bytes and return their id"""
+        plot_id = hashlib.sha256(data).hexdigest()
+        name = f"{plot_id}.{PLOT_EXTENSIONS.get(mime, 'bin')}"
         
-        if not package:
-            return jsonify({
-                'success': False,
-                'error': 'No package name provided'
-            }), 400
+        with self._lock:
+            self._remember(plot_id, data, mime)
+            if plot_id in self._disk:
+                self._disk.move_to_end(plot_id)
+                return plot_id
+            
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = os.path.join(self.directory, f'.{name}.{uuid.uuid4().hex}.tmp')
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, os.path.join(self.directory, name))
+            self._disk[plot_id] = (name, len(data))
+            self._disk_bytes += len(data)
+            
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                evicted_id, (evicted_name, size) = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(os.path.join(self.directory, evicted_name))
+                except OSError:
+                    pass
+        return plot_id
+    
+    def get(self, plot_id):
+        """Return (bytes, mime) for a plot id, or None if it has been evicted"""
+        with self._lock:
+            if plot_id in self._memory:
+                self._memory.move_to_end(plot_id)
+                return self._memory[plot_id]
+            entry = self._disk.get(plot_id)
+            if entry is None:
+                return None
+            self._disk.move_to_end(plot_id)
         
-        # Use subprocess to install package
-        result = subprocess.run([
-            sys.executable, '-m', 'pip', 'install', package
-        ], capture_output=True, text=True, timeout=120)
+        name = entry[0]
+        mime = next((m for m, ext in PLOT_EXTENSIONS.items() if name.endswith('.' + ext)), 'application/octet-stream')
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
         
-        if result.returncode == 0:
-            return jsonify({
-                'success': True,
-                'message': f'Package "{package}" installed successfully',
-                'output': result.stdout
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': f'Failed to install package "{package}"',
-                'output': result.stderr
-            }), 400
-            
-    except subprocess.TimeoutExpired:
-        return jsonify({
-            'success': False,
-            'error': 'Package installation timed out'
-        }), 408
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': f'Installation error: {str(e)}'
-        }), 500
+        with self._lock:
+            self._remember(plot_id, data, mime)
+        return data, mime
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'plots': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'memory_plots': len(self._memory),
+                'memory_bytes': self._memory_bytes
+            }
 
-@app.route('/api/install-and-retry', methods=['POST'])
-def install_and_retry():
-    """Install missing packages and retry code execution"""
+plot_store = PlotStore()
+
+def plot_references(plots):
+    """Store captured plots and return the references sent to clients"""
+    references = []
+    for plot in plots:
+        plot_id = plot_store.put(plot['data'], plot['mime'])
+        references.append({
+            'id': plot_id,
+            'url': f'/api/plots/{plot_id}',
+            'size': len(plot['data']),
+            **{key: value for key, value in plot.items() if key != 'data'}
+        })
+    return references
+
+# ================================
+# KERNEL PROCESSES
+# ================================
+
+def reset_execution_namespace():
+    """Replace the execution namespace with a fresh one"""
+    global execution_namespace
+    execution_namespace = initialize_namespace()
+
+class KernelEventChannel:
+    """Batch a running cell's events and send them to the server from a sender thread
+    
+    Only the sender thread writes to the pipe, so an interrupt raised in the executing
+    thread can never leave a half-written message behind. The bounded queue makes
+    output writes block when the server stops reading (backpressure).
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self._queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._pending = []  # [name, text] runs not yet queued
+        self._pending_size = 0
+        self._output_size = 0
+        self._thread = None
+    
+    def __call__(self, event):
+        if event['type'] != 'stream':
+            self._queue_pending()
+            self._queue.put(event)
+            return
+        
+        with self._lock:
+            if self._pending and self._pending[-1][0] == event['name']:
+                self._pending[-1][1] += event['text']
+            else:
+                self._pending.append([event['name'], event['text']])
+            self._pending_size += len(event['text'])
+            self._output_size += len(event['text'])
+            full = self._pending_size >= STREAM_CHUNK_SIZE
+        if full:
+            self._queue_pending()
+    
+    def _take_pending(self):
+        with self._lock:
+            pending, self._pending, self._pending_size = self._pending, [], 0
+        return [{'type': 'stream', 'name': name, 'text': text} for name, text in pending]
+    
+    def _queue_pending(self):
+        for event in self._take_pending():
+            self._queue.put(event)
+    
+    def start(self):
+        self._started_at = time.time()
+        self._thread = threading.Thread(target=self._send_loop, name='kernel-events', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._queue_pending()
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _send(self, event):
+        self.conn.send({'type': 'event', 'event': event})
+    
+    def _send_loop(self):
+        last_progress = time.time()
+        while True:
+            try:
+                event = self._queue.get(timeout=STREAM_FLUSH_INTERVAL)
+            except queue.Empty:
+                event = False
+            
+            if event is None:
+                break
+            if event:
+                self._send(event)
+            else:
+                # Nothing queued for a while: send whatever partial output there is
+                for pending_event in self._take_pending():
+                    self._send(pending_event)
+            
+            if time.time() - last_progress >= STREAM_PROGRESS_INTERVAL:
+                last_progress = time.time()
+                self._send({
+                    'type': 'progress',
+                    'elapsed': round(last_progress - self._started_at, 1),
+                    'output_size': self._output_size
+                })
+
+def recording_listener(listener, events):
+    """Wrap a streaming listener so the events it receives are also kept in ``events``"""
+    if listener is None:
+        return None
+    
+    def record(event):
+        events.append(event)
+        listener(event)
+    return record
+
+def replay_result(output, error, plots, events, listener, **fields):
+    """Successful CodeExecutionResult rebuilt from a recorded run, replaying its output to ``listener``"""
+    # Output that was streamed when recorded is only in the events
+    output = output or ''.join(
+        event['text'] for event in events if event['type'] == 'stream' and event['name'] == 'stdout'
+    )
+    if listener:
+        # stdout is only delivered as stream events
+        for event in events or [{'type': 'stream', 'name': 'stdout', 'text': output}]:
+            listener(event)
+        output = ''
+    else:
+        # Figures published by plt.show() while streaming are not part of the result
+        plots = [plot for event in events if event['type'] == 'display' for plot in event['plots']] + plots
+    return CodeExecutionResult(success=True, output=output, error=error, plots=plots, **fields)
+
+def split_cache_marker(code):
+    """(code without a leading '%%cache' line, whether the marker was present)"""
+    first_line, _, rest = code.lstrip().partition('\n')
+    if first_line.strip() == CELL_CACHE_MARKER:
+        return rest, True
+    return code, False
+
+def value_fingerprint(value):
+    """Content hash of a namespace value, or None if it cannot be fingerprinted"""
+    digest = hashlib.sha256(type(value).__qualname__.encode('utf-8'))
+    np = sys.modules.get('numpy')
+    pd = sys.modules.get('pandas')
+    
+    if isinstance(value, types.ModuleType):
+        digest.update(value.__name__.encode('utf-8'))  # Lazy modules stay unloaded
+    elif isinstance(value, (types.FunctionType, type)) and getattr(value, '__module__', None) in ('__main__', 'builtins'):
+        # Defined in a cell: identify it by its code, not by a picklable reference
+        code = getattr(value, '__code__', None)
+        digest.update(value.__qualname__.encode('utf-8'))
+        digest.update(marshal.dumps(code) if code is not None else repr(sorted(vars(value))).encode('utf-8'))
+    elif pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        labels = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        digest.update(repr((value.shape, labels, str(value.dtypes))).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif np is not None and isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(repr((value.shape, value.dtype.str)).encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        try:
+            digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return None
+    return digest.hexdigest()
+
+class CellCache:
+    """Opt-in disk cache of cell results (cells starting with '%%cache', or the 'cache' flag)
+    
+    An entry is keyed by the cell source plus content fingerprints of the namespace values
+    the cell reads, and holds the values it bound and its output, pickled. A hit rebinds
+    those values instead of running the cell. Entries are shared by all kernels; the
+    directory is kept under ``max_bytes`` by evicting the least recently used files.
+    """
+    
+    def __init__(self, directory=CELL_CACHE_DIR, max_bytes=CELL_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+    
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+    
+    def cache_key(self, code, read):
+        """Key for running ``code`` against the current namespace, or None if an input cannot be fingerprinted"""
+        fingerprints = []
+        for name in sorted(read & cell_input_names(code)):
+            if name in execution_namespace:
+                fingerprint = value_fingerprint(execution_namespace[name])
+                if fingerprint is None:
+                    return None
+            else:
+                fingerprint = 'unbound'
+            fingerprints.append(f'{name}={fingerprint}')
+        return hashlib.sha256('\n'.join([code] + fingerprints).encode('utf-8')).hexdigest()
+    
+    def load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            entry = pickle.loads(data)
+            os.utime(path)  # Most recently used
+        except FileNotFoundError:
+            return None, 0
+        except Exception:
+            # Unreadable here (e.g. a class that no longer exists): drop it
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return None, 0
+        return entry, len(data)
+    
+    def store(self, key, entry):
+        """Write an entry; returns its size, or 0 if it cannot be pickled or exceeds the budget"""
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return 0
+        if len(data) > self.max_bytes:
+            return 0
+        
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = os.path.join(self.directory, f'.{key}.{uuid.uuid4().hex}.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self._path(key))
+        self.evict()
+        return len(data)
+    
+    def evict(self):
+        """Remove least recently used entries until the directory fits the budget"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            total -= size
+    
+    def entries(self):
+        """[(mtime, size, path)] of the cached entries"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl') and entry.is_file():
+                    with contextlib.suppress(OSError):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+    
+    def execute(self, code, timeout=EXECUTION_TIMEOUT, listener=None, plot_options=None):
+        """Execute a cell through the cache; the result's ``cache`` tells whether it was a hit"""
+        try:
+            compiled = compile(code, '<string>', 'exec')
+        except SyntaxError:
+            compiled = None
+        bound, read = analyse_cell_names(compiled) if compiled else (None, None)
+        key = self.cache_key(code, read) if bound is not None else None
+        if key is None:
+            # The cell binds names dynamically or reads values that cannot be fingerprinted
+            result = execute_python_code(code, timeout=timeout, listener=listener, plot_options=plot_options)
+            result.cache = {'hit': False, 'cacheable': False}
+            return result
+        
+        entry, size = self.load(key)
+        if entry is not None:
+            tracker = NamespaceTracker(execution_namespace, compiled)
+            execution_namespace.update(entry['values'])
+            for name, module_name in entry['modules'].items():
+                execution_namespace[name] = import_namespace_module(module_name)
+            for name in entry['deleted']:
+                execution_namespace.pop(name, None)
+            return replay_result(entry['output'], entry['error'], entry['plots'], entry['events'], listener,
+                                 variables_delta=tracker.delta(),
+                                 cache={'hit': True, 'key': key, 'bytes': size,
+                                        'time_saved': entry['execution_time']})
+        
+        events = []
+        result = execute_python_code(code, timeout=timeout, listener=recording_listener(listener, events),
+                                     plot_options=plot_options)
+        size = 0
+        if result.success:
+            produced = {name: execution_namespace[name] for name in bound if name in execution_namespace}
+            size = self.store(key, {
+                # Modules cannot be pickled; they are re-imported on a hit
+                'modules': {name: value.__name__ for name, value in produced.items()
+                            if isinstance(value, types.ModuleType)},
+                'values': {name: value for name, value in produced.items()
+                           if not isinstance(value, types.ModuleType)},
+                'deleted': [name for name in bound if name not in execution_namespace],
+                'output': result.output,
+                'error': result.error,
+                'plots': result.plots,
+                'events': events,
+                'execution_time': result.execution_time
+            })
+        result.cache = {'hit': False, 'cacheable': size > 0, 'key': key, 'bytes': size}
+        return result
+
+cell_cache = CellCache()
+
+def execute_cell(code, timeout=EXECUTION_TIMEOUT, listener=None, plot_options=None, cache=False):
+    """execute_python_code, going through the cell cache when ``cache`` is set"""
+    if cache:
+        return cell_cache.execute(code, timeout=timeout, listener=listener, plot_options=plot_options)
+    return execute_python_code(code, timeout=timeout, listener=listener, plot_options=plot_options)
+
+class CellCacheStats:
+    """Server-side hit/miss counters of the cell cache, fed by the results kernels return"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.time_saved = 0.0
+    
+    def record(self, result):
+        info = getattr(result, 'cache', None)
+        if not info:
+            return
+        with self._lock:
+            if info['hit']:
+                self.hits += 1
+                self.bytes_saved += info['bytes']
+                self.time_saved += info['time_saved']
+            else:
+                self.misses += 1
+    
+    def stats(self):
+        entries = cell_cache.entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'seconds_saved': self.time_saved,
+                'entries': len(entries),
+                'disk_bytes': sum(size for _, size, _ in entries),
+                'max_bytes': cell_cache.max_bytes
+            }
+
+cell_cache_stats = CellCacheStats()
+
+class CellRecord:
+    """What an incremental cell run read and produced, kept to decide whether it can be skipped"""
+    
+    def __init__(self, source_hash, compiled, inputs, outputs, deleted, result, events):
+        self.source_hash = source_hash
+        self.compiled = compiled
+        self.inputs = inputs      # Name -> variable_version before the run (None if unbound)
+        self.outputs = outputs    # Name -> value the cell bound
+        self.deleted = deleted    # Names the cell deleted
+        self.result = result
+        self.events = events      # Streamed events, replayed to a streaming listener
+        # Content of the bound values as the cell left them, to notice later in-place edits
+        self.fingerprints = {name: value_fingerprint(value) for name, value in outputs.items()}
+    
+    def is_current(self, source_hash, namespace):
+        """Same source, every name the cell reads still holds the value it read, and
+        the values it bound were not modified in place since (e.g. ``y.append(4)`` in a
+        later cell); rebinding such a value would not reproduce the cell's effect"""
+        return source_hash == self.source_hash and all(
+            (variable_version(namespace[name]) if name in namespace else None) == version
+            for name, version in self.inputs.items()
+        ) and all(
+            fingerprint is not None and value_fingerprint(self.outputs[name]) == fingerprint
+            for name, fingerprint in self.fingerprints.items()
+        )
+
+# Incremental execution state of this kernel: cell key -> CellRecord
+cell_records = {}
+
+def execute_incremental(code, cell_key=None, timeout=EXECUTION_TIMEOUT, listener=None, plot_options=None,
+                        cache=False):
+    """Execute a cell unless neither its source nor the values it reads changed since its last run
+    
+    A skipped cell rebinds the values it produced last time (so downstream cells see
+    the same inputs and are skipped too) and replays its output. A cell whose bound
+    values were changed in place afterwards, or cannot be fingerprinted, is re-run, so
+    repeated runs give the same result. Inputs are compared with variable_version, so
+    in-place edits of a value a cell only reads, keeping its identity and shape, go
+    unnoticed. Cells that fail or bind names dynamically are always re-run.
+    """
+    source_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+    cell_key = cell_key if cell_key is not None else source_hash
+    record = cell_records.get(cell_key)
+    
+    if record is not None and record.is_current(source_hash, execution_namespace):
+        tracker = NamespaceTracker(execution_namespace, record.compiled)
+        execution_namespace.update(record.outputs)
+        for name in record.deleted:
+            execution_namespace.pop(name, None)
+        cached = record.result
+        return replay_result(cached.output, cached.error, cached.plots, record.events, listener,
+                             variables_delta=tracker.delta(), reused=True)
+    
+    cell_records.pop(cell_key, None)
+    try:
+        compiled = compile(code, '<string>', 'exec')
+    except SyntaxError:
+        compiled = None
+    bound, read = analyse_cell_names(compiled) if compiled else (None, None)
+    if bound is None:
+        return execute_cell(code, timeout=timeout, listener=listener, plot_options=plot_options, cache=cache)
+    
+    # Globals the bytecode loads, minus those the cell binds itself before reading them
+    inputs = {
+        name: variable_version(execution_namespace[name]) if name in execution_namespace else None
+        for name in read & cell_input_names(code)
+    }
+    events = []
+    result = execute_cell(code, timeout=timeout, listener=recording_listener(listener, events),
+                          plot_options=plot_options, cache=cache)
+    if result.success:
+        outputs = {name: execution_namespace[name] for name in bound if name in execution_namespace}
+        deleted = [name for name in bound if name not in execution_namespace]
+        cell_records[cell_key] = CellRecord(source_hash, compiled, inputs, outputs, deleted, result, events)
+    return result
+
+def kernel_execute(message):
+    """Run a cell inside the kernel; SIGINT from the server interrupts it"""
+    code, marked = split_cache_marker(message['code'])
+    cache = marked or bool(message.get('cache'))
+    
+    channel = KernelEventChannel(kernel_connection) if message.get('stream') else None
+    previous_handler = signal.signal(signal.SIGINT, signal.default_int_handler)
+    if channel:
+        channel.start()
+    try:
+        if message.get('incremental'):
+            return execute_incremental(code, message.get('cell_key'), timeout=message.get('timeout'),
+                                       listener=channel, plot_options=message.get('plot_options'), cache=cache)
+        return execute_cell(code, timeout=message.get('timeout'), listener=channel,
+                            plot_options=message.get('plot_options'), cache=cache)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        if channel:
+            channel.stop()
+
+# Operations a kernel worker understands: op name -> handler(message)
+KERNEL_OPERATIONS = {
+    'execute': kernel_execute,
+    'variables': lambda message: list_user_variables(**message['query']),
+    'variable_slice': lambda message: slice_variable(**message['query']),
+    'inject_packages': lambda message: inject_installed_packages(message['packages']),
+}
+
+kernel_connection = None  # Pipe to the server, set inside kernel worker processes
+
+def kernel_worker_main(conn):
+    """Kernel worker process loop: run requests from the server against a private namespace"""
+    global kernel_connection
+    kernel_connection = conn
+    
+    # Interrupts are only honoured while a cell runs (see kernel_execute)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    reset_execution_namespace()
+    conn.send({'type': 'ready', 'namespace_init_time': namespace_init_time})
+    
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        
+        op = message.get('op')
+        if op == 'shutdown':
+            break
+        
+        try:
+            reply = {'success': True, 'result': KERNEL_OPERATIONS[op](message)}
+        except KeyboardInterrupt:
+            reply = {'success': False, 'error': 'KeyboardInterrupt: Operation interrupted'}
+        except Exception as e:
+            reply = {'success': False, 'error': f"{type(e).__name__}: {str(e)}"}
+        
+        try:
+            conn.send({'type': 'reply', **reply})
+        except (BrokenPipeError, EOFError):
+            break
+    
+    conn.close()
+
+class KernelDiedError(RuntimeError):
+    """Raised when a kernel process exits while serving a request"""
+
+class KernelTimeoutError(KernelDiedError):
+    """Raised when a kernel ignored an interrupt and had to be killed"""
+
+class KernelBusyError(RuntimeError):
+    """Raised when a kernel is still running another operation after ``lock_timeout``"""
+
+def kernel_died_result(error, start_time):
+    """Execution result reported when the kernel was lost mid-cell"""
+    return CodeExecutionResult(
+        success=False,
+        error=f"{type(error).__name__}: {str(error)}\n\nThe kernel was restarted; all variables were lost.",
+        execution_time=time.time() - start_time,
+        interrupted=True
+    )
+
+class Kernel:
+    """Handle on a kernel worker process owned by the server"""
+    
+    def __init__(self, context):
+        self.kernel_id = uuid.uuid4().hex[:12]
+        self.session_id = None
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lock = threading.Lock()  # One request at a time per kernel
+        self.namespace_init_time = None  # Reported by the worker once its namespace is set up
+        
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=kernel_worker_main,
+            args=(child_conn,),
+            name=f'kernel-{self.kernel_id}',
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+    
+    def is_alive(self):
+        return self.process.is_alive()
+    
+    def is_busy(self):
+        return self.lock.locked()
+    
+    def interrupt(self):
+        """Raise KeyboardInterrupt in the running cell; returns False where signals are unsupported"""
+        if os.name == 'nt' or not self.is_alive():
+            return False
+        os.kill(self.process.pid, signal.SIGINT)
+        return True
+    
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+    
+    def _abandon(self):
+        """Interrupt an operation nobody is waiting for and drain its reply"""
+        if self.interrupt():
+            deadline = time.time() + KERNEL_INTERRUPT_GRACE
+            while self.conn.poll(max(0, deadline - time.time())):
+                if self.conn.recv()['type'] == 'reply':
+                    return
+        self.kill()
+    
+    def stream(self, op, reply_timeout=None, lock_timeout=None, **payload):
+        """Send an operation to the worker, yielding its events and finally {'type': 'reply', ...}
+        
+        If no reply arrives within ``reply_timeout`` seconds the worker is interrupted, then killed.
+        With ``lock_timeout``, KernelBusyError is raised instead of waiting longer for an
+        operation already running (e.g. a long cell) to finish.
+        """
+        if not self.lock.acquire(timeout=-1 if lock_timeout is None else lock_timeout):
+            raise KernelBusyError(f'Kernel {self.kernel_id} is busy running a cell')
+        with contextlib.ExitStack() as held:
+            held.callback(self.lock.release)
+            message = None
+            try:
+                self.conn.send({'op': op, **payload})
+                deadline = time.time() + reply_timeout if reply_timeout else None
+                interrupted = False
+                
+                while True:
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and (remaining <= 0 or not self.conn.poll(remaining)):
+                        # Cooperative interrupt first, then hard kill
+                        if not interrupted and self.interrupt():
+                            print(f"⏱️ Kernel {self.kernel_id} gave no reply within {reply_timeout:g}s, interrupting")
+                            interrupted = True
+                            deadline = time.time() + KERNEL_INTERRUPT_GRACE
+                            continue
+                        print(f"💀 Kernel {self.kernel_id} did not respond to interrupt, killing")
+                        self.kill()
+                        raise KernelTimeoutError(
+                            f'Kernel {self.kernel_id} did not finish within {reply_timeout:g}s and was killed')
+                    
+                    message = self.conn.recv()
+                    if message['type'] == 'reply':
+                        break
+                    if message['type'] == 'ready':
+                        self.namespace_init_time = message['namespace_init_time']
+                        continue
+                    yield message['event']
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                raise KernelDiedError(f'Kernel {self.kernel_id} died (exit code {self.process.exitcode})')
+            finally:
+                if (message is None or message['type'] != 'reply') and self.is_alive():
+                    # The consumer went away mid-operation (e.g. client disconnected)
+                    self._abandon()
+                self.last_used = time.time()
+        
+        if not message['success']:
+            raise RuntimeError(message['error'])
+        yield {'type': 'reply', 'result': message['result']}
+    
+    def request(self, op, reply_timeout=None, lock_timeout=None, **payload):
+        """Send an operation to the worker and wait for its result, ignoring streamed events"""
+        for event in self.stream(op, reply_timeout, lock_timeout, **payload):
+            if event['type'] == 'reply':
+                return event['result']
+    
+    def shutdown(self, timeout=2):
+        """Ask the worker to exit, killing it if it does not comply"""
+        try:
+            self.conn.send({'op': 'shutdown'})
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+    
+    def poll_ready(self):
+        """Record the worker's startup report if it arrived and the kernel is idle"""
+        if self.namespace_init_time is None and self.lock.acquire(blocking=False):
+            try:
+                # An idle kernel's pipe can only hold the startup report
+                if self.is_alive() and self.conn.poll():
+                    message = self.conn.recv()
+                    if message['type'] == 'ready':
+                        self.namespace_init_time = message['namespace_init_time']
+            except (EOFError, OSError):
+                pass
+            finally:
+                self.lock.release()
+        return self.namespace_init_time
+    
+    def info(self):
+        self.poll_ready()
+        return {
+            'kernel_id': self.kernel_id,
+            'session_id': self.session_id,
+            'pid': self.process.pid,
+            'alive': self.is_alive(),
+            'busy': self.is_busy(),
+            'idle_seconds': round(time.time() - self.last_used, 1),
+            'namespace_init_time': self.namespace_init_time
+        }
+
+class KernelManager:
+    """Bind notebook sessions to kernel processes drawn from a pre-forked pool"""
+    
+    def __init__(self, pool_size=KERNEL_POOL_SIZE, idle_timeout=KERNEL_IDLE_TIMEOUT,
+                 reap_interval=KERNEL_REAP_INTERVAL):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._context = multiprocessing.get_context(KERNEL_START_METHOD)
+        if KERNEL_START_METHOD == 'forkserver':
+            # The template imports this module (kernel code) and the heavy libraries once
+            self._context.set_forkserver_preload([__name__] + KERNEL_PRELOAD)
+        self._lock = threading.Lock()
+        self._pool = []  # Warm kernels not yet bound to a session
+        self._sessions = {}  # session id -> Kernel
+        self._keep_alive = set()  # Session ids whose kernels are never reaped for idleness
+        self._started = False
+        self.reset_stats = {'count': 0, 'total_time': 0.0, 'last_time': None}
+    
+    def _ensure_started(self):
+        # Started lazily so the Flask reloader's watcher process never forks kernels
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        
+        self._refill_pool()
+        threading.Thread(target=self._reap_loop, name='kernel-reaper', daemon=True).start()
+    
+    def _refill_pool(self):
+        while True:
+            with self._lock:
+                self._pool = [k for k in self._pool if k.is_alive()]
+                if len(self._pool) >= self.pool_size:
+                    return
+            kernel = Kernel(self._context)
+            with self._lock:
+                self._pool.append(kernel)
+    
+    def _refill_pool_async(self):
+        threading.Thread(target=self._refill_pool, name='kernel-pool-refill', daemon=True).start()
+    
+    def get_kernel(self, session_id):
+        """Return the session's kernel, binding a pooled one on first use"""
+        self._ensure_started()
+        
+        dead_kernel = None
+        with self._lock:
+            kernel = self._sessions.get(session_id)
+            if kernel is not None and not kernel.is_alive():
+                dead_kernel = self._sessions.pop(session_id)
+                kernel = None
+            
+            if kernel is None:
+                while self._pool:
+                    candidate = self._pool.pop(0)
+                    if candidate.is_alive():
+                        kernel = candidate
+                        break
+        
+        if dead_kernel is not None:
+            dead_kernel.shutdown()
+        
+        if kernel is None or kernel.session_id != session_id:
+            if kernel is None:
+                kernel = Kernel(self._context)
+            kernel.session_id = session_id
+            with self._lock:
+                existing = self._sessions.setdefault(session_id, kernel)
+            if existing is not kernel:
+                # Another request bound this session first; return the kernel to the pool
+                kernel.session_id = None
+                with self._lock:
+                    self._pool.append(kernel)
+                kernel = existing
+            self._refill_pool_async()
+        
+        return kernel
+    
+    def stream_execute(self, session_id, code, timeout=EXECUTION_TIMEOUT, plot_options=None, incremental=False,
+                       cell_key=None, cache=False):
+        """Execute code in the session's kernel, yielding output events as they are produced
+        
+        The last event is {'type': 'reply', 'result': CodeExecutionResult}; stdout is only
+        delivered through 'stream' events. A kernel that had to be killed is respawned.
+        With ``incremental``, an unchanged cell is skipped (see execute_incremental); with
+        ``cache``, the cell goes through the cell cache (see CellCache).
+        """
+        kernel = self.get_kernel(session_id)
+        # The worker interrupts itself at ``timeout``; only intervene if it fails to
+        reply_timeout = timeout + KERNEL_INTERRUPT_GRACE if timeout else None
+        start_time = time.time()
+        
+        try:
+            for event in kernel.stream('execute', reply_timeout, code=code, timeout=timeout, stream=True,
+                                       plot_options=plot_options, incremental=incremental, cell_key=cell_key,
+                                       cache=cache):
+                if event['type'] == 'reply':
+                    cell_cache_stats.record(event['result'])
+                yield event
+        except KernelDiedError as e:
+            self.restart_kernel(session_id, expected=kernel)
+            yield {'type': 'reply', 'result': kernel_died_result(e, start_time)}
+    
+    def execute(self, session_id, code, timeout=EXECUTION_TIMEOUT, plot_options=None, incremental=False, cell_key=None,
+                cache=False):
+        """Execute code in the session's kernel and return the buffered CodeExecutionResult"""
+        kernel = self.get_kernel(session_id)
+        reply_timeout = timeout + KERNEL_INTERRUPT_GRACE if timeout else None
+        start_time = time.time()
+        
+        try:
+            result = kernel.request('execute', reply_timeout, code=code, timeout=timeout, plot_options=plot_options,
+                                    incremental=incremental, cell_key=cell_key, cache=cache)
+            cell_cache_stats.record(result)
+            return result
+        except KernelDiedError as e:
+            self.restart_kernel(session_id, expected=kernel)
+            return kernel_died_result(e, start_time)
+    
+    def interrupt(self, session_id, force=False):
+        """Interrupt the session's running cell
+        
+        Returns 'idle', 'interrupted' or 'restarted', or None if the session has no kernel.
+        """
+        with self._lock:
+            kernel = self._sessions.get(session_id)
+        if kernel is None:
+            return None
+        if not kernel.is_busy():
+            return 'idle'
+        
+        if not force and kernel.interrupt():
+            return 'interrupted'
+        
+        kernel.kill()
+        self.restart_kernel(session_id, expected=kernel)
+        return 'restarted'
+    
+    def broadcast(self, op, reply_timeout=30, **payload):
+        """Send an operation to every idle kernel (sessions and pool) in one pass
+        
+        Returns {kernel name: reply result, or {'error': ...}}. Busy kernels are skipped
+        rather than waited for and reported as {'error': 'busy'}.
+        """
+        with self._lock:
+            kernels = [(session_id, kernel) for session_id, kernel in self._sessions.items()]
+            kernels += [(f'pool-{kernel.process.pid}', kernel) for kernel in self._pool]
+        
+        replies = {}
+        for name, kernel in kernels:
+            if not kernel.is_alive():
+                continue
+            if kernel.is_busy():
+                replies[name] = {'error': 'busy'}
+                continue
+            try:
+                replies[name] = kernel.request(op, reply_timeout, **payload)
+            except Exception as e:
+                replies[name] = {'error': str(e)}
+        return replies
+    
+    def restart_kernel(self, session_id, expected=None):
+        """Replace the session's kernel with a fresh one from the pool
+        
+        With ``expected``, only replace it if it is still that kernel (avoids double restarts).
+        """
+        with self._lock:
+            kernel = self._sessions.get(session_id)
+            if kernel is not None and expected in (None, kernel):
+                del self._sessions[session_id]
+            else:
+                kernel = None
+        if kernel is not None:
+            kernel.shutdown()
+        return self.get_kernel(session_id)
+    
+    def shutdown_kernel(self, session_id):
+        """Shut down a session's kernel; returns False if the session has none"""
+        with self._lock:
+            kernel = self._sessions.pop(session_id, None)
+        if kernel is None:
+            return False
+        kernel.shutdown()
+        return True
+    
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self.reap_idle_kernels()
+            except Exception as e:
+                print(f"⚠️ Kernel reaper error: {e}")
+    
+    def set_keep_alive(self, session_id, keep_alive=True):
+        """Exempt a session's kernel from idle reaping (e.g. incremental scheduled tasks)"""
+        with self._lock:
+            if keep_alive:
+                self._keep_alive.add(session_id)
+            else:
+                self._keep_alive.discard(session_id)
+    
+    def reap_idle_kernels(self):
+        """Shut down session kernels that have been idle longer than the idle timeout"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                session_id for session_id, kernel in self._sessions.items()
+                if not kernel.is_alive()
+                or (session_id not in self._keep_alive and not kernel.is_busy()
+                    and now - kernel.last_used > self.idle_timeout)
+            ]
+            kernels = [self._sessions.pop(session_id) for session_id in expired]
+        
+        for kernel in kernels:
+            print(f"🧹 Reaping idle kernel {kernel.kernel_id} (session {kernel.session_id})")
+            kernel.shutdown()
+        return len(kernels)
+    
+    def shutdown_all(self):
+        with self._lock:
+            kernels = list(self._sessions.values()) + self._pool
+            self._sessions.clear()
+            self._pool = []
+        for kernel in kernels:
+            kernel.shutdown()
+    
+    def reset(self, session_id):
+        """Restart the session's kernel by swapping in a warm kernel from the pool
+        
+        The old process is killed outright, which frees all of its state at once.
+        Returns the reset time in seconds and the new kernel's id.
+        """
+        start_time = time.time()
+        with self._lock:
+            old_kernel = self._sessions.pop(session_id, None)
+        if old_kernel is not None:
+            old_kernel.kill()
+            old_kernel.conn.close()
+        kernel = self.get_kernel(session_id)
+        reset_time = time.time() - start_time
+        
+        with self._lock:
+            self.reset_stats['count'] += 1
+            self.reset_stats['total_time'] += reset_time
+            self.reset_stats['last_time'] = reset_time
+        return {'reset_time': reset_time, 'kernel_id': kernel.kernel_id}
+    
+    def namespace_init_time(self):
+        """Average namespace setup time reported by the live kernels, or None before any reported"""
+        with self._lock:
+            kernels = list(self._sessions.values()) + self._pool
+        times = [t for t in (kernel.poll_ready() for kernel in kernels) if t is not None]
+        return sum(times) / len(times) if times else None
+    
+    def status(self):
+        with self._lock:
+            sessions = [{**kernel.info(), 'keep_alive': session_id in self._keep_alive}
+                        for session_id, kernel in self._sessions.items()]
+            pooled = len(self._pool)
+            resets = dict(self.reset_stats)
+        if resets['count']:
+            resets['average_time'] = resets['total_time'] / resets['count']
+        return {
+            'pool_size': self.pool_size,
+            'pooled_kernels': pooled,
+            'start_method': KERNEL_START_METHOD,
+            'idle_timeout': self.idle_timeout,
+            'sessions': sessions,
+            'resets': resets
+        }
+
+kernel_manager = KernelManager()
+
+def get_session_id(data):
+    """Read the notebook session id from request JSON or query args"""
+    return str((data or {}).get('session_id') or DEFAULT_SESSION_ID)
+
+# Per-session plot option overrides set through /api/plots/settings (outlive kernel resets)
+session_plot_options = {}
+
+def parse_plot_options(data):
+    """Validate plot option overrides from a request; raises ValueError on bad values"""
+    options = {}
+    if data.get('format') is not None:
+        if data['format'] not in PLOT_FORMATS:
+            raise ValueError(f"Plot format must be one of: {', '.join(PLOT_FORMATS)}")
+        options['format'] = data['format']
+    if data.get('dpi') is not None:
+        if data['dpi'] != 'auto' and not (isinstance(data['dpi'], (int, float)) and 10 <= data['dpi'] <= 600):
+            raise ValueError("Plot dpi must be 'auto' or a number between 10 and 600")
+        options['dpi'] = data['dpi']
+    for key in ('max_points', 'max_pixels'):
+        if data.get(key) is not None:
+            if not isinstance(data[key], int) or data[key] <= 0:
+                raise ValueError(f"Plot {key} must be a positive integer")
+            options[key] = data[key]
+    if data.get('tight') is not None:
+        options['tight'] = bool(data['tight'])
+    return options
+
+def get_plot_options(data, session_id):
+    """Plot options for an execution: session settings overridden by the request's 'plot' object"""
+    return {**session_plot_options.get(session_id, {}), **parse_plot_options(data.get('plot') or {})}
+
+def get_execution_timeout(data):
+    """Read the per-request execution time limit in seconds (0 disables it)"""
+    timeout = float((data or {}).get('timeout', EXECUTION_TIMEOUT) or 0)
+    return timeout if timeout > 0 else None
+
+def build_execution_response(result, cell_id, session_id):
+    """JSON-serialisable response body for a CodeExecutionResult"""
+    return {
+        'success': result.success,
+        'output': result.output,
+        'error': result.error,
+        'execution_time': result.execution_time,
+        'timestamp': result.timestamp,
+        'cell_id': cell_id,
+        'session_id': session_id,
+        'missing_packages': result.missing_packages,
+        'plots': plot_references(result.plots),
+        'interrupted': result.interrupted,
+        'variables_delta': result.variables_delta,
+        'reused': result.reused,
+        'cache': result.cache
+    }
+
+@app.route('/api/execute', methods=['POST'])
+def execute_code():
+    """
+    Execute Python code endpoint
+    """
     try:
         data = request.get_json()
-        packages = data.get('packages', [])
-        code = data.get('code', '')
+        
+        if not data or 'code' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'No code provided'
+            }), 400
+        
+        code = data['code']
         cell_id = data.get('cell_id', 'unknown')
+        session_id = get_session_id(data)
+        
+        try:
+            plot_options = get_plot_options(data, session_id)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        # Execute the code in the session's kernel process
+        result = kernel_manager.execute(session_id, code, timeout=get_execution_timeout(data),
+                                        plot_options=plot_options, incremental=bool(data.get('incremental')),
+                                        cell_key=data.get('cell_id'), cache=bool(data.get('cache')))
+        
+        return jsonify(build_execution_response(result, cell_id, session_id))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Server error: {str(e)}'
+        }), 500
+
+def format_sse(event_type, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/execute/stream', methods=['POST'])
+def execute_code_stream():
+    """
+    Execute Python code, streaming output as Server-Sent Events
+    
+    Events: 'stream' (stdout/stderr chunks), 'display' (plots shown with plt.show()),
+    'progress' (elapsed time), and a final 'result' shaped like the /api/execute response
+    (its 'output' is empty: stdout was already streamed).
+    """
+    data = request.get_json(silent=True)
+    if not data or 'code' not in data:
+        return jsonify({
+            'success': False,
+            'error': 'No code provided'
+        }), 400
+    
+    code = data['code']
+    cell_id = data.get('cell_id', 'unknown')
+    session_id = get_session_id(data)
+    timeout = get_execution_timeout(data)
+    incremental = bool(data.get('incremental'))
+    cache = bool(data.get('cache'))
+    try:
+        plot_options = get_plot_options(data, session_id)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    def generate():
+        try:
+            for event in kernel_manager.stream_execute(session_id, code, timeout=timeout, plot_options=plot_options,
+                                                       incremental=incremental, cell_key=data.get('cell_id'),
+                                                       cache=cache):
+                if event['type'] == 'reply':
+                    yield format_sse('result', build_execution_response(event['result'], cell_id, session_id))
+                elif event['type'] == 'display':
+                    yield format_sse('display', {'type': 'display', 'plots': plot_references(event['plots'])})
+                else:
+                    yield format_sse(event['type'], event)
+        except Exception as e:
+            yield format_sse('result', {
+                'success': False,
+                'error': f'Server error: {str(e)}',
+                'cell_id': cell_id,
+                'session_id': session_id
+            })
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+    })
+
+@app.route('/api/reset', methods=['POST'])
+def reset_namespace():
+    """
+    Reset the execution namespace (like restarting kernel)
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = get_session_id(data)
+    
+    # Swap in a fresh kernel process with common imports already loaded
+    timings = kernel_manager.reset(session_id)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Execution namespace reset successfully',
+        'session_id': session_id,
+        **timings
+    })
+
+@app.route('/api/plots/settings', methods=['GET', 'POST'])
+def plot_settings():
+    """
+    Get or update a session's plot rendering options (format, dpi, max_points, max_pixels, tight)
+    """
+    if request.method == 'GET':
+        session_id = get_session_id(request.args)
+    else:
+        data = request.get_json(silent=True) or {}
+        session_id = get_session_id(data)
+        try:
+            options = parse_plot_options(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        session_plot_options.setdefault(session_id, {}).update(options)
+    
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'settings': {**PLOT_DEFAULTS, **session_plot_options.get(session_id, {})}
+    })
+
+@app.route('/api/plots/<plot_id>', methods=['GET'])
+def get_plot(plot_id):
+    """
+    Serve a stored plot; its id is the content hash, so responses are immutable
+    """
+    if request.if_none_match.contains(plot_id):
+        return '', 304, {'ETag': f'"{plot_id}"', 'Cache-Control': 'public, max-age=31536000, immutable'}
+    
+    plot = plot_store.get(plot_id)
+    if plot is None:
+        return jsonify({
+            'success': False,
+            'error': 'Plot not found'
+        }), 404
+    
+    data, mime = plot
+    return data, 200, {
+        'Content-Type': mime,
+        'ETag': f'"{plot_id}"',
+        'Cache-Control': 'public, max-age=31536000, immutable'
+    }
+
+@app.route('/api/interrupt', methods=['POST'])
+def interrupt_execution():
+    """
+    Interrupt the running cell of a session (force=true kills and restarts the kernel)
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = get_session_id(data)
+    
+    outcome = kernel_manager.interrupt(session_id, force=bool(data.get('force')))
+    if outcome is None:
+        return jsonify({
+            'success': False,
+            'error': f'No kernel for session: {session_id}'
+        }), 404
+    
+    messages = {
+        'idle': 'Kernel is idle, nothing to interrupt',
+        'interrupted': 'Interrupt sent to running cell',
+        'restarted': 'Kernel killed and restarted'
+    }
+    return jsonify({
+        'success': True,
+        'status': outcome,
+        'message': messages[outcome],
+        'session_id': session_id
+    })
+
+@app.route('/api/variables', methods=['GET'])
+def get_variables():
+    """
+    Get current variables in the namespace
+    
+    Query: offset, limit (paging), filter (name substring), type (type name),
+    deep=true (count Python objects in pandas memory), all=true (include modules and callables).
+    Values are described (type, shape, dtype, nbytes, bounded preview), never fully rendered.
+    """
+    session_id = get_session_id(request.args)
+    try:
+        query = {
+            'offset': max(request.args.get('offset', 0, type=int), 0),
+            'limit': min(max(request.args.get('limit', VARIABLE_PAGE_SIZE, type=int), 1), 500),
+            'name_filter': request.args.get('filter', ''),
+            'type_filter': request.args.get('type', ''),
+            'deep': request.args.get('deep', 'false').lower() == 'true',
+            'show_all': request.args.get('all', 'false').lower() == 'true'
+        }
+        page = kernel_manager.get_kernel(session_id).request('variables', lock_timeout=VARIABLE_LOCK_TIMEOUT, query=query)
+        
+        return jsonify({
+            'success': True,
+            **page,
+            'session_id': session_id
+        })
+        
+    except KernelBusyError as e:
+        return kernel_busy_response(e, session_id)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'session_id': session_id
+        }), 500
+
+@app.route('/api/variables/<name>', methods=['GET'])
+def get_variable_slice(name):
+    """
+    Get a slice of one variable, e.g. rows 1000-1100 of a DataFrame
+    
+    Query: start, stop (row/item range, at most VARIABLE_SLICE_MAX_ROWS), columns (comma-separated, DataFrames).
+    """
+    session_id = get_session_id(request.args)
+    try:
+        columns = request.args.get('columns')
+        query = {
+            'name': name,
+            'start': max(request.args.get('start', 0, type=int), 0),
+            'stop': request.args.get('stop', type=int),
+            'columns': columns.split(',') if columns else None
+        }
+        result = kernel_manager.get_kernel(session_id).request('variable_slice', lock_timeout=VARIABLE_LOCK_TIMEOUT,
+                                                               query=query)
+        
+        if 'error' in result:
+            return jsonify({
+                'success': False,
+                'error': result['error']
+            }), 404 if not result['found'] else 400
+        
+        del result['found']
+        return jsonify({
+            'success': True,
+            **result,
+            'session_id': session_id
+        })
+        
+    except KernelBusyError as e:
+        return kernel_busy_response(e, session_id)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'session_id': session_id
+        }), 500
+
+def kernel_busy_response(error, session_id):
+    """409 reply for a request that would have to wait for a running cell"""
+    return jsonify({
+        'success': False,
+        'busy': True,
+        'error': f'{error}; try again when it has finished',
+        'session_id': session_id
+    }), 409
+
+@app.route('/api/kernels', methods=['GET'])
+def list_kernels():
+    """
+    Get kernel pool status and the kernels bound to sessions
+    """
+    return jsonify({
+        'success': True,
+        **kernel_manager.status()
+    })
+
+@app.route('/api/kernels/<session_id>', methods=['DELETE'])
+def shutdown_kernel(session_id):
+    """
+    Shut down the kernel bound to a session
+    """
+    if not kernel_manager.shutdown_kernel(session_id):
+        return jsonify({
+            'success': False,
+            'error': f'No kernel for session: {session_id}'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'message': f'Kernel for session {session_id} shut down'
+    })
+
+@app.route('/api/status', methods=['GET'])
+def get_status():
+    """
+    Get server status
+    """
+    return jsonify({
+        'success': True,
+        'status': 'running',
+        'python_version': sys.version,
+        'available_modules': list(sys.modules.keys())[:20],  # First 20 modules
+        'startup_time': SERVER_STARTUP_TIME,
+        'namespace_init_time': kernel_manager.namespace_init_time(),  # Measured inside the kernels
+        'plot_cache': plot_store.stats(),
+        'cell_cache': cell_cache_stats.stats(),
+        'kernels': kernel_manager.status()
+    })
+
+@app.route('/api/install', methods=['POST'])
+def install_package():
+    """
+    Install Python packages using pip, in the background
+    
+    Accepts 'package' or a 'packages' list; responds at once with the install
+    operation(s) to poll at /api/install/<install_id>. With 'wait': true the
+    request blocks until pip finishes.
+    """
+    try:
+        data = request.get_json() or {}
+        requirements = data.get('packages') or ([data['package']] if data.get('package') else [])
+        
+        if not requirements:
+            return jsonify({
+                'success': False,
+                'error': 'No package name provided'
+            }), 400
+        
+        try:
+            operations = package_installer.install(requirements)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if not data.get('wait'):
+            return jsonify({
+                'success': True,
+                'message': f"Installing {', '.join(requirements)}",
+                'install_id': operations[0].id,
+                'installs': [operation.to_dict() for operation in operations]
+            }), 202
+        
+        results = package_installer.wait(operations, requirements)
+        if all(result['success'] for result in results):
+            return jsonify({
+                'success': True,
+                'message': f"Package \"{', '.join(requirements)}\" installed successfully",
+                'installation_results': results
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'error': f"Failed to install package \"{', '.join(requirements)}\"",
+                'installation_results': results
+            }), 400
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Installation error: {str(e)}'
+        }), 500
+
+@app.route('/api/install/<install_id>', methods=['GET'])
+def get_install_status(install_id):
+    """Progress of a package install: status, phase, pip output and per-package results"""
+    try:
+        operation = package_installer.get(install_id)
+        if operation is None:
+            return jsonify({
+                'success': False,
+                'error': f'Install not found: {install_id}'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'install': operation.to_dict()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/install-and-retry', methods=['POST'])
+def install_and_retry():
+    """Install missing packages and retry code execution"""
+    try:
+        data = request.get_json()
+        packages = data.get('packages', [])
+        code = data.get('code', '')
+        cell_id = data.get('cell_id', 'unknown')
+        
+        if not packages or not code:
+            return jsonify({
+                'success': False,
+                'error': 'Missing packages or code'
+            }), 400
+        
+        session_id = get_session_id(data)
+        kernel_manager.get_kernel(session_id)  # Started now so the installed packages are injected into it
+        requirements = [package_info.get('package') for package_info in packages if package_info.get('package')]
+        
+        # One pip run for the whole batch, shared with identical requests already in flight
+        try:
+            operations = package_installer.install(requirements)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        installation_results = package_installer.wait(operations, requirements)
+        
+        # Retry code execution
+        execution_result = kernel_manager.execute(session_id, code, timeout=get_execution_timeout(data),
+                                                  plot_options=get_plot_options(data, session_id))
+        
+        return jsonify({
+            **build_execution_response(execution_result, cell_id, session_id),
+            'installation_results': installation_results
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Installation and retry error: {str(e)}'
+        }), 500
+
+@app.route('/api/pip-check', methods=['GET'])
+def pip_check():
+    """Check if pip is working and accessible"""
+    try:
+        # Test pip version
+        result = subprocess.run([
+            sys.executable, '-m', 'pip', '--version'
+        ], capture_output=True, text=True, timeout=30)
+        
+        if result.returncode == 0:
+            return jsonify({
+                'success': True,
+                'pip_version': result.stdout.strip(),
+                'python_executable': sys.executable
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'pip not accessible',
+                'stderr': result.stderr
+            })
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'pip check failed: {str(e)}'
+        })
+
+@app.route('/api/files', methods=['GET'])
+def list_files():
+    """List files in the current directory"""
+    try:
+        # Include all file types (no filtering)
+        files, version = build_file_listing('')
+        return file_listing_response(files, version)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/files/content', methods=['GET'])
+def get_file_content():
+    """Get content of a specific file
+    
+    Small text files are returned whole and larger ones streamed in chunks. ``download``
+    sends the raw bytes as an attachment, ``mode=head|tail`` with ``lines`` returns only
+    the first or last lines, and a ``Range`` header gets a partial response.
+    """
+    try:
+        file_path = request.args.get('path')
+        if not file_path:
+            return jsonify({
+                'success': False,
+                'error': 'No file path provided'
+            }), 400
+        
+        # Security check: prevent directory traversal
+        if '..' in file_path or file_path.startswith('/'):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file path'
+            }), 400
+        
+        if not os.path.exists(file_path):
+            return jsonify({
+                'success': False,
+                'error': 'File not found'
+            }), 404
+        
+        if not os.path.isfile(file_path):
+            return jsonify({
+                'success': False,
+                'error': 'Path is not a file'
+            }), 400
+        
+        full_path = os.path.abspath(file_path)
+        if full_path.endswith('.ipynb'):
+            notebook_store.flush(full_path)  # Write pending cell patches first
+        size = os.path.getsize(full_path)
+        
+        # Raw bytes, any encoding; send_file streams the file and answers Range requests
+        if request.args.get('download', '').lower() in ('1', 'true', 'yes'):
+            return send_file(full_path, as_attachment=True, conditional=True)
+        if request.range is not None:
+            return send_file(full_path, conditional=True)
+        
+        mode = request.args.get('mode')
+        if mode is not None:
+            if mode not in ('head', 'tail'):
+                return jsonify({
+                    'success': False,
+                    'error': 'mode must be head or tail'
+                }), 400
+            try:
+                lines = max(1, int(request.args.get('lines', FILE_PREVIEW_LINES)))
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'lines must be an integer'
+                }), 400
+            data, truncated = read_file_lines(full_path, lines, from_end=mode == 'tail')
+            return data.decode('utf-8', errors='replace'), 200, {
+                'Content-Type': 'text/plain; charset=utf-8',
+                'X-File-Size': str(size),
+                'X-Truncated': 'true' if truncated else 'false'
+            }
+        
+        if full_path.endswith('.ipynb') and request.args.get('inline', '').lower() in ('1', 'true', 'yes'):
+            # Standalone copy with output store blobs put back in place
+            with open(full_path, 'r', encoding='utf-8') as f:
+                notebook_data = internalize_notebook_outputs(json.load(f))
+            return json.dumps(notebook_data, indent=1, ensure_ascii=False), 200, {'Content-Type': 'application/json; charset=utf-8'}
+        
+        headers = {'Content-Type': 'text/plain; charset=utf-8', 'Accept-Ranges': 'bytes', 'X-File-Size': str(size)}
+        if full_path.endswith('.ipynb'):
+            headers['X-File-Version'] = notebook_store.version(full_path)  # Base version for /api/files/notebook patches
+        if size <= FILE_CONTENT_INLINE_BYTES:
+            with open(full_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return content, 200, headers
+        
+        # Large file: check the first chunk decodes, then stream the rest without holding it in memory
+        f = open(full_path, 'rb')
+        first = f.read(FILE_STREAM_CHUNK_BYTES)
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(first, final=False)
+        except UnicodeDecodeError:
+            f.close()
+            raise
+        
+        def generate():
+            with f:
+                chunk = first
+                while chunk:
+                    yield chunk
+                    chunk = f.read(FILE_STREAM_CHUNK_BYTES)
+        
+        return Response(stream_with_context(generate()), headers=headers)
+        
+    except UnicodeDecodeError:
+        return jsonify({
+            'success': False,
+            'error': 'File contains binary data or unsupported encoding (use download=1 for the raw bytes)'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def read_file_lines(file_path, lines, from_end=False):
+    """First (or last) ``lines`` lines of a file, read through mmap
+    
+    Only the returned part of the file is paged in, so previews of large files take
+    constant memory. At most FILE_PREVIEW_MAX_BYTES are returned. Returns
+    (bytes, truncated).
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return b'', False
+    
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if not from_end:
+            end = 0
+            for _ in range(lines):
+                end = mm.find(b'\n', end)
+                if end == -1:
+                    end = size
+                    break
+                end += 1
+            end = min(end, FILE_PREVIEW_MAX_BYTES)
+            return mm[:end], end < size
+        
+        # Skip the newline that terminates the last line
+        start = size - 1 if mm[size - 1:size] == b'\n' else size
+        for _ in range(lines):
+            start = mm.rfind(b'\n', 0, start)
+            if start == -1:
+                break
+        start = max(start + 1, size - FILE_PREVIEW_MAX_BYTES)
+        return mm[start:], start > 0
+
+@app.route('/api/files/save', methods=['POST'])
+def save_file():
+    """Save a file to the server"""
+    import os
+    try:
+        data = request.get_json()
+        if not data or 'filename' not in data or 'content' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Missing filename or content'
+            }), 400
+        
+        filename = data['filename']
+        content = data['content']
+        
+        # Security check: prevent directory traversal with '..'
+        if '..' in filename:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid filename - directory traversal not allowed'
+            }), 400
+        
+        # Handle file paths properly
+        if filename.endswith('.ipynb'):
+            # For notebooks, save to notebooks directory if it's just a filename
+            if '/' not in filename and '\\' not in filename:
+                notebooks_dir = 'notebooks'
+                if not os.path.exists(notebooks_dir):
+                    os.makedirs(notebooks_dir)
+                file_path = os.path.join(notebooks_dir, filename)
+            else:
+                file_path = filename
+        else:
+            # For other files, use the provided path
+            file_path = filename
+            
+        # Ensure the directory exists
+        dir_path = os.path.dirname(file_path)
+        if dir_path and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        
+        if file_path.endswith('.ipynb'):
+            # Large outputs and images are stored once in the output store and referenced
+            try:
+                notebook_data = json.loads(content)
+                if isinstance(notebook_data, dict) and externalize_notebook_outputs(notebook_data):
+                    content = json.dumps(notebook_data, indent=1, ensure_ascii=False) + '\n'
+            except ValueError:
+                pass  # Not valid JSON; saved as given
+        
+        # Atomic replace, so a crash mid-write cannot leave a truncated file
+        write_file_atomic(file_path, content.encode('utf-8'))
+        fsync_directory(dir_path)
+        notebook_store.discard(file_path)
+        # Size and modification time changed; make the next listing rescan
+        directory_index.invalidate(dir_path or '.')
+        
+        return jsonify({
+            'success': True,
+            'message': f'File saved as {file_path}',
+            'path': file_path,
+            'version': file_version(file_path)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/files/notebook', methods=['GET'])
+def get_notebook_sources():
+    """Notebook without outputs; each cell reports its output_count instead"""
+    try:
+        path = request.args.get('path', '')
+        if '..' in path or path.startswith('/') or not path.endswith('.ipynb'):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid notebook path'
+            }), 400
+        if not os.path.isfile(path):
+            return jsonify({
+                'success': False,
+                'error': 'Notebook not found'
+            }), 404
+        
+        notebook_data, version = notebook_store.read(path)
+        cells = []
+        for cell in notebook_data.get('cells', []):
+            source_cell = {key: value for key, value in cell.items() if key != 'outputs'}
+            source_cell['output_count'] = len(cell.get('outputs') or [])
+            cells.append(source_cell)
+        
+        return jsonify({
+            'success': True,
+            'path': path,
+            'version': version,
+            'metadata': notebook_data.get('metadata', {}),
+            'nbformat': notebook_data.get('nbformat', 4),
+            'nbformat_minor': notebook_data.get('nbformat_minor', 4),
+            'cells': cells
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid notebook: {e}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/files/notebook/outputs', methods=['GET'])
+def get_notebook_outputs():
+    """Outputs of the cells start..stop-1 of a notebook; large values are given as URLs"""
+    try:
+        path = request.args.get('path', '')
+        if '..' in path or path.startswith('/') or not path.endswith('.ipynb'):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid notebook path'
+            }), 400
+        if not os.path.isfile(path):
+            return jsonify({
+                'success': False,
+                'error': 'Notebook not found'
+            }), 404
+        
+        try:
+            start = max(0, int(request.args.get('start', 0)))
+            stop = int(request.args.get('stop', start + 20))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'start and stop must be integers'
+            }), 400
+        
+        notebook_data, version = notebook_store.read(path)
+        cells = notebook_data.get('cells', [])
+        outputs = {
+            index: [notebook_output_view(output) for output in cells[index].get('outputs') or []]
+            for index in range(start, min(stop, len(cells)))
+        }
+        
+        return jsonify({
+            'success': True,
+            'version': version,
+            'outputs': outputs
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid notebook: {e}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/outputs/<name>', methods=['GET'])
+def get_output_blob(name):
+    """
+    Serve an output store blob; its name is the content hash, so responses are immutable
+    """
+    if request.if_none_match.contains(name):
+        return '', 304, {'ETag': f'"{name}"', 'Cache-Control': 'public, max-age=31536000, immutable'}
+    
+    path = output_store.path(name)
+    if path is None:
+        return jsonify({
+            'success': False,
+            'error': 'Output not found'
+        }), 404
+    
+    response = send_file(os.path.abspath(path), mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+    response.headers['ETag'] = f'"{name}"'
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/api/files/notebook', methods=['PATCH'])
+def patch_notebook():
+    """Update only the changed cells of a saved notebook"""
+    try:
+        data = request.get_json() or {}
+        path = data.get('path')
+        if not path or 'length' not in data or 'cells' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Missing path, length or cells'
+            }), 400
+        
+        # Security check: prevent directory traversal
+        if '..' in path or path.startswith('/') or not path.endswith('.ipynb'):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid notebook path'
+            }), 400
+        
+        if not os.path.isfile(path):
+            return jsonify({
+                'success': False,
+                'error': 'Notebook not found'
+            }), 404
+        
+        try:
+            version = notebook_store.patch(path, data.get('base_version'), data['length'], data['cells'], data.get('metadata'))
+        except NotebookConflict as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'version': e.version
+            }), 409
+        if data.get('flush'):
+            notebook_store.flush(path)
+        
+        return jsonify({
+            'success': True,
+            'path': path,
+            'version': version,
+            'changed': len(data['cells'])
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable upload (path, size, optional sha256); chunks are then PUT to it"""
+    try:
+        data = request.get_json() or {}
+        status = upload_manager.create(data.get('path'), data.get('size'), data.get('sha256'))
+        return jsonify({
+            'success': True,
+            'upload_id': status['id'],
+            'chunk_size': UPLOAD_CHUNK_BYTES,
+            **status
+        }), 201
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def manage_upload(upload_id):
+    """
+    GET: current offset to resume from. PUT: raw chunk bytes starting at ``offset``
+    (optional X-Chunk-SHA256 header). DELETE: abort the upload.
+    """
+    try:
+        if request.method == 'GET':
+            return jsonify({
+                'success': True,
+                **upload_manager.status(upload_id)
+            })
+        
+        if request.method == 'DELETE':
+            upload_manager.status(upload_id)  # 404 for unknown uploads
+            upload_manager.abort(upload_id)
+            return jsonify({
+                'success': True,
+                'message': 'Upload aborted'
+            })
+        
+        try:
+            offset = int(request.args.get('offset', ''))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'offset must be an integer'
+            }), 400
+        
+        try:
+            status = upload_manager.write_chunk(upload_id, offset, request.stream, request.headers.get('X-Chunk-SHA256'))
+        except UploadConflict as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'offset': e.offset
+            }), 409
+        
+        return jsonify({
+            'success': True,
+            **status
+        })
+        
+    except KeyError:
+        return jsonify({
+            'success': False,
+            'error': 'Upload not found'
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/files/folder', methods=['GET'])
+def list_folder_contents():
+    """List contents of a specific folder"""
+    try:
+        folder_path = request.args.get('path', '')
+        
+        # Security check: prevent directory traversal
+        if '..' in folder_path:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid folder path'
+            }), 400
+        
+        # Remove trailing slash for consistency
+        folder_path = folder_path.rstrip('/')
+        full_path = os.path.join(os.getcwd(), folder_path) if folder_path else os.getcwd()
+        
+        if not os.path.isdir(full_path):
+            return jsonify({
+                'success': False,
+                'error': 'Folder not found'
+            }), 404
+        
+        # Only include relevant file types
+        files, version = build_file_listing(folder_path, FOLDER_FILE_EXTENSIONS)
+        return file_listing_response(files, version, {'folder': folder_path})
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/files/search', methods=['GET'])
+def search_files():
+    """Search workspace files by name, glob pattern or .py/.ipynb content"""
+    try:
+        name = request.args.get('q') or None
+        pattern = request.args.get('glob') or None
+        content = request.args.get('content') or None
+        if name is None and pattern is None and content is None:
+            return jsonify({
+                'success': False,
+                'error': 'Give at least one of q, glob or content'
+            }), 400
+        
+        cursor = request.args.get('cursor') or None
+        try:
+            limit = min(max(1, int(request.args.get('limit', 50))), SEARCH_MAX_PAGE_SIZE)
+            budget = min(float(request.args.get('budget', SEARCH_TIME_BUDGET)), SEARCH_TIME_BUDGET)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'limit and budget must be numbers'
+            }), 400
+        
+        try:
+            result = search_index.search(
+                name=name,
+                pattern=pattern,
+                content=content,
+                regex=request.args.get('regex', '').lower() in ('1', 'true', 'yes'),
+                case_sensitive=request.args.get('case', '').lower() in ('1', 'true', 'yes'),
+                cursor=cursor,
+                limit=limit,
+                budget=budget
+            )
+        except re.error as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid regular expression: {e}'
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            **result
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ================================
+# SCHEDULER ENGINE
+# ================================
+
+INTERVAL_UNITS = {'seconds': 1, 'minutes': 60, 'hours': 3600, 'days': 86400}
+CATCH_UP_POLICIES = ('run_once', 'run_all', 'skip')
+CRON_FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7)]
+CRON_NAMES = {
+    'month': {name: index + 1 for index, name in enumerate(
+        ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])},
+    'weekday': {name: index for index, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+}
+
+class CronExpression:
+    """Five-field cron expression: minute hour day-of-month month day-of-week
+    
+    Supports '*', lists, ranges, steps and month/weekday names; Sunday is 0 or 7.
+    """
+    
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError('Cron expression must have 5 fields: minute hour day month weekday')
+        
+        self.expression = expression
+        self.fields = {
+            name: self._parse_field(text, name, low, high)
+            for text, (name, low, high) in zip(parts, CRON_FIELDS)
+        }
+        if 7 in self.fields['weekday']:
+            self.fields['weekday'] = (self.fields['weekday'] - {7}) | {0}
+        # As in Vixie cron: when both day fields are restricted, either one may match
+        self.day_restricted = parts[2] != '*'
+        self.weekday_restricted = parts[4] != '*'
+    
+    @staticmethod
+    def _parse_value(text, name):
+        text = text.lower()
+        if text in CRON_NAMES.get(name, {}):
+            return CRON_NAMES[name][text]
+        if not text.isdigit():
+            raise ValueError(f"Invalid cron {name} value: '{text}'")
+        return int(text)
+    
+    def _parse_field(self, text, name, low, high):
+        values = set()
+        for item in text.split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                if not step_text.isdigit() or int(step_text) < 1:
+                    raise ValueError(f"Invalid cron {name} step: '{step_text}'")
+                step = int(step_text)
+            
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (self._parse_value(part, name) for part in item.split('-', 1))
+            else:
+                start = self._parse_value(item, name)
+                end = high if step > 1 else start
+            
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron {name} value out of range {low}-{high}: '{item}'")
+            values.update(range(start, end + 1, step))
+        return values
+    
+    def _day_matches(self, moment):
+        day_match = moment.day in self.fields['day']
+        weekday_match = (moment.weekday() + 1) % 7 in self.fields['weekday']  # Python Monday=0, cron Sunday=0
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        if self.day_restricted:
+            return day_match
+        if self.weekday_restricted:
+            return weekday_match
+        return True
+    
+    def next_after(self, after):
+        """First matching minute strictly after ``after``"""
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        
+        while moment < limit:
+            if moment.month not in self.fields['month']:
+                moment = (moment.replace(day=28, hour=0, minute=0) + timedelta(days=4)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.fields['hour']:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.fields['minute']:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+def parse_clock_time(text):
+    """'HH:MM' -> (hour, minute)"""
+    try:
+        hour, minute = (int(part) for part in str(text).split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid time '{text}', expected HH:MM")
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"Invalid time '{text}', expected HH:MM")
+    return hour, minute
+
+def schedule_to_cron(schedule_type, schedule):
+    """CronExpression for daily/weekly/cron schedules (None for interval schedules)"""
+    if schedule_type == 'daily':
+        hour, minute = parse_clock_time(schedule.get('time'))
+        return CronExpression(f'{minute} {hour} * * *')
+    if schedule_type == 'weekly':
+        hour, minute = parse_clock_time(schedule.get('time'))
+        day = schedule.get('day')
+        if not isinstance(day, int) or not 0 <= day <= 6:
+            raise ValueError('Weekly schedule needs a day between 0 (Sunday) and 6 (Saturday)')
+        return CronExpression(f'{minute} {hour} * * {day}')
+    if schedule_type == 'cron':
+        return CronExpression(str(schedule.get('expression', '')))
+    return None
+
+def validate_schedule(schedule_type, schedule):
+    """Raise ValueError unless the schedule is well-formed"""
+    if schedule_type == 'interval':
+        value = schedule.get('value')
+        if not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError('Interval schedule needs a positive value')
+        if schedule.get('unit', 'minutes') not in INTERVAL_UNITS:
+            raise ValueError(f"Interval unit must be one of: {', '.join(INTERVAL_UNITS)}")
+    elif schedule_type in ('daily', 'weekly', 'cron'):
+        schedule_to_cron(schedule_type, schedule)
+    else:
+        raise ValueError("Schedule type must be one of: interval, daily, weekly, cron")
+
+def next_run_time(task, after):
+    """First occurrence of a task's schedule strictly after ``after``"""
+    if task['scheduleType'] == 'interval':
+        # Occurrences are anchored at the task's creation: created + k * interval
+        interval = task['schedule']['value'] * INTERVAL_UNITS[task['schedule'].get('unit', 'minutes')]
+        anchor = datetime.fromisoformat(task['created'])
+        elapsed = (after - anchor).total_seconds()
+        steps = max(0, int(elapsed // interval) + 1)
+        return anchor + timedelta(seconds=steps * interval)
+    return schedule_to_cron(task['scheduleType'], task['schedule']).next_after(after)
+
+def format_timestamp(moment):
+    return moment.isoformat(timespec='seconds') if moment else None
+
+def validate_workspace_path(path):
+    """Relative path inside the workspace; raises ValueError otherwise"""
+    if not path or '..' in path or path.startswith(('/', '\\')) or os.path.isabs(path):
+        raise ValueError('Invalid file path')
+    return path
+
+def read_code_cells(file_path):
+    """Code cell sources of a notebook, or the whole file for a .py script"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    if file_path.endswith('.py'):
+        return [content] if content.strip() else []
+    if not file_path.endswith('.ipynb'):
+        raise ValueError('Unsupported file type')
+    
+    cells = []
+    for cell in json.loads(content).get('cells', []):
+        if cell.get('cell_type') == 'code':
+            source = cell.get('source', [])
+            code = ''.join(source) if isinstance(source, list) else source
+            if code.strip():
+                cells.append(code)
+    return cells
+
+class TaskStore:
+    """Durable SQLite store for scheduled tasks and their run history"""
+    
+    def __init__(self, path=SCHEDULER_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    description TEXT NOT NULL DEFAULT '',
+                    notebook TEXT NOT NULL,
+                    schedule_type TEXT NOT NULL,
+                    schedule TEXT NOT NULL,
+                    catch_up TEXT NOT NULL DEFAULT 'run_once',
+                    incremental INTEGER NOT NULL DEFAULT 0,
+                    enabled INTEGER NOT NULL DEFAULT 1,
+                    created TEXT NOT NULL,
+                    last_run TEXT,
+                    last_status TEXT,
+                    next_run TEXT
+                );
+                CREATE TABLE IF NOT EXISTS task_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id INTEGER NOT NULL,
+                    trigger TEXT NOT NULL,
+                    scheduled_for TEXT,
+                    started TEXT,
+                    finished TEXT,
+                    status TEXT NOT NULL,
+                    duration REAL,
+                    cells_run INTEGER NOT NULL DEFAULT 0,
+                    cells_reused INTEGER NOT NULL DEFAULT 0,
+                    missed_runs INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS task_runs_by_task ON task_runs (task_id, id);
+            """)
+            # Runs interrupted by a server stop can never finish
+            self._db.execute(
+                "UPDATE task_runs SET status = 'failed', error = 'Server stopped during run' "
+                "WHERE status IN ('queued', 'running')"
+            )
+    
+    @staticmethod
+    def _task_from_row(row):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'notebook': row['notebook'],
+            'scheduleType': row['schedule_type'],
+            'schedule': json.loads(row['schedule']),
+            'catchUp': row['catch_up'],
+            'incremental': bool(row['incremental']),
+            'enabled': bool(row['enabled']),
+            'status': 'enabled' if row['enabled'] else 'disabled',
+            'created': row['created'],
+            'lastRun': row['last_run'],
+            'lastStatus': row['last_status'],
+            'nextRun': row['next_run']
+        }
+    
+    def list_tasks(self):
+        with self._lock:
+            rows = self._db.execute('SELECT * FROM tasks ORDER BY id').fetchall()
+        return [self._task_from_row(row) for row in rows]
+    
+    def get_task(self, task_id):
+        with self._lock:
+            row = self._db.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return self._task_from_row(row) if row else None
+    
+    def due_tasks(self, now):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT * FROM tasks WHERE enabled = 1 AND next_run IS NOT NULL AND next_run <= ? ORDER BY next_run',
+                (format_timestamp(now),)
+            ).fetchall()
+        return [self._task_from_row(row) for row in rows]
+    
+    def earliest_next_run(self):
+        with self._lock:
+            row = self._db.execute('SELECT MIN(next_run) FROM tasks WHERE enabled = 1').fetchone()
+        return datetime.fromisoformat(row[0]) if row[0] else None
+    
+    def create_task(self, task):
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                'INSERT INTO tasks (name, description, notebook, schedule_type, schedule, catch_up, incremental, enabled, '
+                'created, next_run) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (task['name'], task['description'], task['notebook'], task['scheduleType'], json.dumps(task['schedule']),
+                 task['catchUp'], int(task['incremental']), int(task['enabled']), task['created'], task['nextRun'])
+            )
+        return self.get_task(cursor.lastrowid)
+    
+    def update_task(self, task):
+        with self._lock, self._db:
+            self._db.execute(
+                'UPDATE tasks SET name = ?, description = ?, notebook = ?, schedule_type = ?, schedule = ?, '
+                'catch_up = ?, incremental = ?, enabled = ?, next_run = ? WHERE id = ?',
+                (task['name'], task['description'], task['notebook'], task['scheduleType'], json.dumps(task['schedule']),
+                 task['catchUp'], int(task['incremental']), int(task['enabled']), task['nextRun'], task['id'])
+            )
+        return self.get_task(task['id'])
+    
+    def set_next_run(self, task_id, next_run):
+        with self._lock, self._db:
+            self._db.execute('UPDATE tasks SET next_run = ? WHERE id = ?', (format_timestamp(next_run), task_id))
+    
+    def delete_task(self, task_id):
+        with self._lock, self._db:
+            deleted = self._db.execute('DELETE FROM tasks WHERE id = ?', (task_id,)).rowcount
+            self._db.execute('DELETE FROM task_runs WHERE task_id = ?', (task_id,))
+        return deleted > 0
+    
+    def add_run(self, task_id, trigger, scheduled_for, status='queued', missed_runs=0, error=None):
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                'INSERT INTO task_runs (task_id, trigger, scheduled_for, status, missed_runs, error) VALUES (?, ?, ?, ?, ?, ?)',
+                (task_id, trigger, format_timestamp(scheduled_for), status, missed_runs, error)
+            )
+            # Keep the history bounded
+            self._db.execute(
+                'DELETE FROM task_runs WHERE task_id = ? AND id <= ('
+                'SELECT id FROM task_runs WHERE task_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (task_id, task_id, SCHEDULER_HISTORY_LIMIT)
+            )
+        return cursor.lastrowid
+    
+    def start_run(self, run_id):
+        with self._lock, self._db:
+            self._db.execute("UPDATE task_runs SET status = 'running', started = ? WHERE id = ?",
+                             (format_timestamp(datetime.now()), run_id))
+    
+    def finish_run(self, run_id, task_id, status, duration, cells_run, error=None, cells_reused=0):
+        finished = format_timestamp(datetime.now())
+        with self._lock, self._db:
+            self._db.execute(
+                'UPDATE task_runs SET status = ?, finished = ?, duration = ?, cells_run = ?, cells_reused = ?, error = ? '
+                'WHERE id = ?',
+                (status, finished, duration, cells_run, cells_reused, error, run_id)
+            )
+            self._db.execute('UPDATE tasks SET last_run = ?, last_status = ? WHERE id = ?',
+                             (finished, status, task_id))
+    
+    def list_runs(self, task_id, limit=50):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT * FROM task_runs WHERE task_id = ? ORDER BY id DESC LIMIT ?', (task_id, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+class Scheduler:
+    """Runs due tasks from the TaskStore on a bounded worker pool
+    
+    A background thread sleeps until the earliest next run. Each run executes the
+    task's notebook in a fresh kernel that is shut down afterwards (incremental tasks
+    keep theirs, exempt from idle reaping, until the task changes); at most
+    ``max_workers`` runs execute at once and later ones queue. Overdue tasks (e.g.
+    after downtime) follow their catch-up policy: 'run_once' runs once for all missed
+    occurrences, 'run_all' replays each (up to SCHEDULER_MAX_CATCH_UP), 'skip' records
+    them as skipped. A task never runs concurrently with itself.
+    """
+    
+    def __init__(self, store_path=SCHEDULER_DB_PATH, max_workers=SCHEDULER_MAX_CONCURRENCY):
+        self.store_path = store_path
+        self.max_workers = max_workers
+        self._store = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='scheduler-worker')
+        self._lock = threading.Lock()
+        self._active = set()  # Task ids queued or running
+        self._wake = threading.Event()
+        self._thread = None
+    
+    @property
+    def store(self):
+        # Opened on first use so kernel processes importing this module never touch the database
+        with self._lock:
+            if self._store is None:
+                self._store = TaskStore(self.store_path)
+            return self._store
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+            print(f"⏰ Scheduler started ({self.max_workers} workers, store: {self.store_path})")
+    
+    def wake(self):
+        """Re-check the schedule now (after tasks changed)"""
+        self._wake.set()
+    
+    def _loop(self):
+        while True:
+            try:
+                self.run_due_tasks()
+            except Exception as e:
+                print(f"⚠️ Scheduler error: {e}")
+            
+            wait = SCHEDULER_POLL_INTERVAL
+            earliest = self.store.earliest_next_run()
+            if earliest is not None:
+                wait = min(wait, max(0.0, (earliest - datetime.now()).total_seconds()))
+            self._wake.wait(wait)
+            self._wake.clear()
+    
+    def run_due_tasks(self, now=None):
+        now = now or datetime.now()
+        for task in self.store.due_tasks(now):
+            scheduled = datetime.fromisoformat(task['nextRun'])
+            
+            # Occurrences that came due since the last check (more than one after downtime)
+            missed = [scheduled]
+            upcoming = next_run_time(task, scheduled)
+            while upcoming <= now and len(missed) <= SCHEDULER_MAX_CATCH_UP:
+                missed.append(upcoming)
+                upcoming = next_run_time(task, upcoming)
+            self.store.set_next_run(task['id'], next_run_time(task, now))
+            
+            late = (now - scheduled).total_seconds() > SCHEDULER_MISFIRE_GRACE
+            if task['catchUp'] == 'skip' and late:
+                self.store.add_run(task['id'], 'schedule', scheduled, status='skipped', missed_runs=len(missed),
+                                   error='Missed while the server was unavailable')
+            elif task['catchUp'] == 'run_all' and len(missed) > 1:
+                self.submit(task, [(occurrence, 'catch-up') for occurrence in missed])
+            else:
+                self.submit(task, [(missed[-1], 'schedule')], missed_runs=len(missed) - 1)
+    
+    def submit(self, task, occurrences, missed_runs=0):
+        """Queue runs of a task; returns their run ids (empty if the task is already active)"""
+        with self._lock:
+            if task['id'] in self._active:
+                busy = True
+            else:
+                busy = False
+                self._active.add(task['id'])
+        
+        if busy:
+            self.store.add_run(task['id'], occurrences[0][1], occurrences[0][0], status='skipped',
+                               error='Previous run still in progress')
+            return []
+        
+        run_ids = [
+            self.store.add_run(task['id'], trigger, scheduled_for, missed_runs=missed_runs)
+            for scheduled_for, trigger in occurrences
+        ]
+        self._executor.submit(self._run_sequence, task, run_ids)
+        return run_ids
+    
+    def _run_sequence(self, task, run_ids):
+        try:
+            for run_id in run_ids:
+                self._run(task, run_id)
+        finally:
+            with self._lock:
+                self._active.discard(task['id'])
+    
+    def _run(self, task, run_id):
+        self.store.start_run(run_id)
+        # Incremental tasks keep their kernel between runs so unchanged cells can be skipped;
+        # runs are usually further apart than the idle timeout, so it is never reaped
+        incremental = task['incremental']
+        session_id = f"scheduler-{task['id']}" if incremental else f"scheduler-{task['id']}-{run_id}"
+        if incremental:
+            kernel_manager.set_keep_alive(session_id)
+        start_time = time.time()
+        status, error, cells_run, cells_reused = 'success', None, 0, 0
+        print(f"▶️ Running task {task['id']} ({task['name']}): {task['notebook']}")
+        
+        try:
+            for index, code in enumerate(read_code_cells(task['notebook'])):
+                result = kernel_manager.execute(session_id, code, incremental=incremental, cell_key=index)
+                cells_run += 1
+                cells_reused += result.reused
+                if not result.success:
+                    status, error = 'failed', result.error
+                    break
+        except Exception as e:
+            status, error = 'failed', f"{type(e).__name__}: {str(e)}"
+        finally:
+            if not incremental or status != 'success':
+                kernel_manager.shutdown_kernel(session_id)
+        
+        self.store.finish_run(run_id, task['id'], status, time.time() - start_time, cells_run, error, cells_reused)
+        print(f"{'✅' if status == 'success' else '❌'} Task {task['id']} finished: {status}")
+    
+    def status(self):
+        with self._lock:
+            active = sorted(self._active)
+        return {
+            'running': self._thread is not None,
+            'max_workers': self.max_workers,
+            'active_tasks': active
+        }
+
+scheduler = Scheduler()
+
+def release_task_kernel(task_id):
+    """Shut down the kernel an incremental task keeps between runs"""
+    kernel_manager.set_keep_alive(f'scheduler-{task_id}', False)
+    kernel_manager.shutdown_kernel(f'scheduler-{task_id}')
+
+def build_task(data, existing=None):
+    """Validate task fields from a request, merged over an existing task; raises ValueError"""
+    task = dict(existing or {
+        'description': '',
+        'enabled': True,
+        'catchUp': 'run_once',
+        'incremental': False,
+        'created': format_timestamp(datetime.now())
+    })
+    for key in ('name', 'description', 'notebook', 'scheduleType', 'schedule', 'catchUp', 'incremental', 'enabled'):
+        if key in data:
+            task[key] = data[key]
+    
+    for key in ('name', 'notebook', 'scheduleType', 'schedule'):
+        if not task.get(key):
+            raise ValueError(f"Missing task field: {key}")
+    if not isinstance(task['schedule'], dict):
+        raise ValueError('Task schedule must be an object')
+    validate_schedule(task['scheduleType'], task['schedule'])
+    if task['catchUp'] not in CATCH_UP_POLICIES:
+        raise ValueError(f"Catch-up policy must be one of: {', '.join(CATCH_UP_POLICIES)}")
+    
+    validate_workspace_path(task['notebook'])
+    if not os.path.isfile(task['notebook']):
+        raise ValueError(f"File not found: {task['notebook']}")
+    if not task['notebook'].endswith(('.ipynb', '.py')):
+        raise ValueError('Unsupported file type')
+    
+    task['enabled'] = bool(task['enabled'])
+    task['incremental'] = bool(task['incremental'])
+    task['nextRun'] = format_timestamp(next_run_time(task, datetime.now())) if task['enabled'] else None
+    return task
+
+# ================================
+# JOB QUEUE
+# ================================
+
+class Job:
+    """A notebook or script executed in the background, cell by cell"""
+    
+    def __init__(self, file_path, cells, timeout=EXECUTION_TIMEOUT, stop_on_error=False, incremental=False):
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.cells = cells
+        self.timeout = timeout
+        self.stop_on_error = stop_on_error
+        self.incremental = incremental
+        # Incremental runs of a file share a kernel that outlives the job, so unchanged cells can be skipped
+        self.session_id = f'notebook-{file_path}' if incremental else f'job-{self.id}'
+        self.status = 'queued'  # queued -> running -> completed | failed | cancelled
+        self.error = None
+        self.results = []  # Execution responses of finished cells, in order
+        self.current_cell = None
+        self.cell_started = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = False
+        self.future = None
+    
+    @property
+    def done(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+    
+    def to_dict(self, include_results=True):
+        now = time.time()
+        info = {
+            'id': self.id,
+            'file_path': self.file_path,
+            'status': self.status,
+            'error': self.error,
+            'total_cells': len(self.cells),
+            'completed_cells': len(self.results),
+            'reused_cells': sum(result['reused'] for result in self.results),
+            'current_cell': self.current_cell,
+            'current_cell_elapsed': now - self.cell_started if self.current_cell is not None else None,
+            'created': datetime.fromtimestamp(self.created).isoformat(),
+            'started': datetime.fromtimestamp(self.started).isoformat() if self.started else None,
+            'finished': datetime.fromtimestamp(self.finished).isoformat() if self.finished else None,
+            'elapsed': ((self.finished or now) - self.started) if self.started else 0
+        }
+        if include_results:
+            info['results'] = list(self.results)
+        return info
+
+class JobQueue:
+    """Runs submitted jobs on a bounded worker pool, each in its own kernel
+    
+    Submission returns immediately; progress is read back by job id. Finished jobs are
+    kept for lookup until more than ``history_limit`` of them exist, oldest evicted first.
+    Incremental jobs of the same file share a kernel, so they run one after another:
+    later ones stay queued (without holding a worker) until the running one is done.
+    """
+    
+    def __init__(self, max_workers=JOB_MAX_WORKERS, history_limit=JOB_HISTORY_LIMIT):
+        self.max_workers = max_workers
+        self.history_limit = history_limit
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        self._jobs = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._shared_sessions = {}  # Session id of an active incremental job -> jobs waiting for it
+    
+    def submit(self, file_path, cells, **options):
+        job = Job(file_path, cells, **options)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+            if job.incremental:
+                waiting = self._shared_sessions.get(job.session_id)
+                if waiting is not None:
+                    waiting.append(job)
+                    return job
+                self._shared_sessions[job.session_id] = collections.deque()
+        job.future = self._executor.submit(self._run, job)
+        return job
+    
+    def _start_next(self, job):
+        """Hand the shared kernel of a finished incremental job to the next waiting job"""
+        if not job.incremental:
+            return
+        with self._lock:
+            waiting = self._shared_sessions[job.session_id]
+            if not waiting:
+                del self._shared_sessions[job.session_id]
+                return
+            next_job = waiting.popleft()
+            next_job.future = self._executor.submit(self._run, next_job)
+    
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+    
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job, or None if unknown"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
         
-        if not packages or not code:
-            return jsonify({
-                'success': False,
-                'error': 'Missing packages or code'
-            }), 400
+        job.cancel_requested = True
+        with self._lock:
+            waiting = self._shared_sessions.get(job.session_id)
+            waited = waiting is not None and job in waiting
+            if waited:
+                waiting.remove(job)
+        if waited:
+            self._finish(job, 'cancelled')
+        elif job.future.cancel():
+            self._finish(job, 'cancelled')
+            self._start_next(job)
+        else:
+            # Stop the running cell; the worker sees the flag before the next one
+            kernel_manager.interrupt(job.session_id)
+        return job
+    
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.history_limit)]:
+            del self._jobs[job_id]
+    
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.current_cell = None
+        job.finished = time.time()
+        with self._lock:
+            self._evict()
+    
+    def _run(self, job):
+        job.status = 'running'
+        job.started = time.time()
+        status, error = 'completed', None
+        print(f"▶️ Job {job.id}: {job.file_path} ({len(job.cells)} cells)")
         
-        installation_results = []
+        try:
+            for index, code in enumerate(job.cells):
+                if job.cancel_requested:
+                    break
+                job.current_cell, job.cell_started = index, time.time()
+                result = kernel_manager.execute(job.session_id, code, timeout=job.timeout,
+                                                incremental=job.incremental, cell_key=index)
+                job.results.append(build_execution_response(result, index, job.session_id))
+                if not result.success and job.stop_on_error and not job.cancel_requested:
+                    status, error = 'failed', f'Cell {index} failed'
+                    break
+        except Exception as e:
+            status, error = 'failed', f"{type(e).__name__}: {str(e)}"
+        finally:
+            if not job.incremental:
+                kernel_manager.shutdown_kernel(job.session_id)
         
-        # Install each package
-        for package_info in packages:
-            package_name = package_info.get('package')
-            if not package_name:
-                continue
-                
-            print(f"🔄 Installing package: {package_name}")
-            print(f"   Command: pip install {package_name}")
+        if job.cancel_requested:
+            status = 'cancelled'
+        self._finish(job, status, error)
+        print(f"🏁 Job {job.id} {status} in {job.finished - job.started:.1f}s")
+        self._start_next(job)
+    
+    def status(self):
+        jobs = self.list()
+        return {
+            'max_workers': self.max_workers,
+            'queued': sum(job.status == 'queued' for job in jobs),
+            'running': sum(job.status == 'running' for job in jobs),
+            'stored': len(jobs)
+        }
+
+job_queue = JobQueue()
+
+# ================================
+# PACKAGE INSTALLER
+# ================================
+
+def requirement_name(requirement):
+    """Normalised project name of a requirement ('Scikit_Learn>=1.0' -> 'scikit-learn')"""
+    import re
+    match = re.match(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)', requirement)
+    if not match or requirement.strip().startswith('-'):
+        raise ValueError(f"Invalid package name: '{requirement}'")
+    return re.sub(r'[-_.]+', '-', match.group(1)).lower()
+
+class InstallOperation:
+    """One pip run installing a batch of requirements"""
+    
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.requirements = {}  # Normalised name -> requirement as requested
+        self.status = 'queued'  # queued -> running -> completed | failed
+        self.phase = None
+        self.log = collections.deque(maxlen=INSTALL_LOG_LINES)
+        self.results = {}  # Normalised name -> {'package', 'success', 'message'}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'packages': list(self.requirements.values()),
+            'status': self.status,
+            'phase': self.phase,
+            'progress': self.log[-1] if self.log else None,
+            'log': list(self.log),
+            'results': list(self.results.values()),
+            'elapsed': ((self.finished or time.time()) - self.started) if self.started else 0
+        }
+
+class PackageInstaller:
+    """Serialises pip runs, batching and de-duplicating install requests
+    
+    Only one pip process runs at a time, so concurrent installs never step on each
+    other. Requests for a package that is already queued or installing join that
+    operation, and packages requested while pip is busy are merged into the next
+    operation, which resolves them all in one pip call. Wheels are kept in a local
+    wheelhouse: packages that are already there install offline without touching
+    the index.
+    """
+    
+    def __init__(self, wheelhouse=PACKAGE_WHEELHOUSE_DIR, timeout=INSTALL_TIMEOUT):
+        self.wheelhouse = wheelhouse
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending = None  # Operation collecting requirements until pip is free
+        self._running = None
+        self._operations = collections.OrderedDict()
+        self._thread = None
+    
+    def install(self, requirements):
+        """Queue requirements; returns the operations that will install them (raises ValueError for bad names)"""
+        names = {requirement_name(requirement): requirement.strip() for requirement in requirements}
+        operations = []
+        with self._lock:
+            for name, requirement in names.items():
+                operation = next((op for op in (self._running, self._pending) if op and name in op.requirements), None)
+                if operation is None:
+                    if self._pending is None:
+                        self._pending = InstallOperation()
+                        self._operations[self._pending.id] = self._pending
+                        while len(self._operations) > INSTALL_HISTORY_LIMIT:
+                            self._operations.popitem(last=False)
+                    operation = self._pending
+                    operation.requirements[name] = requirement
+                if operation not in operations:
+                    operations.append(operation)
             
+            if self._pending is not None and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._worker, name='package-installer', daemon=True)
+                self._thread.start()
+        return operations
+    
+    def get(self, operation_id):
+        with self._lock:
+            return self._operations.get(operation_id)
+    
+    def _worker(self):
+        while True:
+            with self._lock:
+                operation = self._running = self._pending
+                self._pending = None
+                if operation is None:
+                    self._thread = None
+                    return
             try:
-                result = subprocess.run([
-                    sys.executable, '-m', 'pip', 'install', package_name, '--verbose'
-                ], capture_output=True, text=True, timeout=300)
-                
-                print(f"   Return code: {result.returncode}")
-                if result.stdout:
-                    print(f"   STDOUT: {result.stdout[:500]}...")
-                if result.stderr:
-                    print(f"   STDERR: {result.stderr[:500]}...")
-                    
-            except subprocess.TimeoutExpired:
-                print(f"   ❌ Installation timeout for {package_name}")
-                installation_results.append({
-                    'package': package_name,
-                    'success': False,
-                    'message': f'Installation timeout for {package_name}'
-                })
+                self._run(operation)
+            except Exception as e:
+                operation.status = 'failed'
+                operation.log.append(f'Installer error: {e}')
+            finally:
+                operation.finished = time.time()
+                with self._lock:
+                    self._running = None
+                operation.done.set()
+    
+    def _pip(self, operation, args, deadline):
+        """Run pip, streaming its output into the operation log; returns True on success"""
+        command = [sys.executable, '-m', 'pip', *args, '--disable-pip-version-check', '--progress-bar', 'off']
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        timer = threading.Timer(max(0, deadline - time.time()), process.kill)
+        timer.start()
+        try:
+            for line in process.stdout:
+                line = line.rstrip()
+                if line:
+                    operation.log.append(line)
+            return process.wait() == 0
+        finally:
+            timer.cancel()
+            process.stdout.close()
+    
+    def _install(self, operation, requirements, deadline):
+        """Install requirements through the wheelhouse with at most one index resolution"""
+        find_links = ['--find-links', self.wheelhouse]
+        install = ['install', '--no-index', *find_links, *requirements]
+        
+        operation.phase = 'installing from wheelhouse'
+        if os.path.isdir(self.wheelhouse) and self._pip(operation, install, deadline):
+            return True
+        
+        os.makedirs(self.wheelhouse, exist_ok=True)
+        operation.phase = 'downloading'
+        if not self._pip(operation, ['wheel', '--wheel-dir', self.wheelhouse, *find_links, *requirements], deadline):
+            return False
+        operation.phase = 'installing'
+        return self._pip(operation, install, deadline)
+    
+    def _run(self, operation):
+        operation.status = 'running'
+        operation.started = time.time()
+        deadline = operation.started + self.timeout
+        requirements = list(operation.requirements.values())
+        print(f"🔄 Installing packages: {' '.join(requirements)}")
+        
+        if self._install(operation, requirements, deadline):
+            succeeded = set(operation.requirements)
+        elif len(requirements) > 1 and time.time() < deadline:
+            # Isolate the requirement(s) that broke the batch
+            succeeded = {
+                name for name, requirement in operation.requirements.items()
+                if self._install(operation, [requirement], deadline)
+            }
+        else:
+            succeeded = set()
+        
+        for name, requirement in operation.requirements.items():
+            if name in succeeded:
+                message = f'Successfully installed {requirement}'
+            elif time.time() >= deadline:
+                message = f'Installation timeout for {requirement}'
+            else:
+                message = f'Failed to install {requirement}: ' + '\n'.join(list(operation.log)[-10:])
+            operation.results[name] = {'package': requirement, 'success': name in succeeded, 'message': message}
+        
+        if succeeded:
+            # Bind the new packages in every running kernel before anyone waiting is released
+            operation.phase = 'loading into kernels'
+            kernel_manager.broadcast('inject_packages',
+                                     packages=[operation.requirements[name] for name in succeeded])
+        operation.phase = None
+        operation.status = 'completed' if len(succeeded) == len(requirements) else 'failed'
+        print(f"{'✅' if operation.status == 'completed' else '❌'} Install {operation.status}: {' '.join(requirements)}")
+    
+    def wait(self, operations, requirements):
+        """Block until the operations finish; returns the per-package results for ``requirements``"""
+        deadline = time.time() + self.timeout * len(operations)
+        for operation in operations:
+            operation.done.wait(max(0, deadline - time.time()))
+        
+        results = []
+        for requirement in requirements:
+            name = requirement_name(requirement)
+            operation = next(op for op in operations if name in op.requirements)
+            results.append(operation.results.get(name) or {
+                'package': requirement,
+                'success': False,
+                'message': f'Installation timeout for {requirement}'
+            })
+        return results
+
+package_installer = PackageInstaller()
+
+# ================================
+# NOTEBOOK BATCH RUNNER
+# ================================
+
+def notebook_cell_outputs(result):
+    """nbformat outputs for a CodeExecutionResult"""
+    outputs = []
+    if result.output:
+        outputs.append({'output_type': 'stream', 'name': 'stdout', 'text': result.output.splitlines(keepends=True)})
+    
+    for plot in result.plots:
+        if plot['mime'] == 'image/svg+xml':
+            data = plot['data'].decode('utf-8')
+        else:
+            data = base64.b64encode(plot['data']).decode('ascii')
+        outputs.append({'output_type': 'display_data', 'data': {plot['mime']: data}, 'metadata': {}})
+    
+    if result.error:
+        if result.success:
+            # Warnings and other stderr of a successful cell
+            outputs.append({'output_type': 'stream', 'name': 'stderr', 'text': result.error.splitlines(keepends=True)})
+        else:
+            last_line = result.error.strip().splitlines()[-1] if result.error.strip() else 'Error'
+            ename, _, evalue = last_line.partition(': ')
+            outputs.append({
+                'output_type': 'error',
+                'ename': ename,
+                'evalue': evalue,
+                'traceback': result.error.splitlines()
+            })
+    return outputs
+
+def executed_notebook_path(path, output_dir=None):
+    """Where the executed copy of a notebook is written: <name>.executed.ipynb"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir or os.path.dirname(path), f'{stem}.executed.ipynb')
+
+def run_notebook(path, output_path=None, timeout=EXECUTION_TIMEOUT, allow_errors=False):
+    """Execute a notebook in a fresh kernel and write it, with outputs, to ``output_path``
+    
+    The source notebook is never modified. Execution stops at the first failing cell
+    unless ``allow_errors`` is set. Returns a summary dict.
+    """
+    output_path = output_path or executed_notebook_path(path)
+    session_id = f'batch-{uuid.uuid4().hex}'
+    start_time = time.time()
+    status, error, cells_run = 'success', None, 0
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        notebook = json.load(f)
+    
+    try:
+        execution_count = 0
+        for cell in notebook.get('cells', []):
+            if cell.get('cell_type') != 'code':
+                continue
+            source = cell.get('source', [])
+            code = ''.join(source) if isinstance(source, list) else source
+            if not code.strip():
+                cell['outputs'], cell['execution_count'] = [], None
                 continue
+            
+            execution_count += 1
+            result = kernel_manager.execute(session_id, code, timeout=timeout)
+            cells_run += 1
+            cell['outputs'] = notebook_cell_outputs(result)
+            cell['execution_count'] = execution_count
+            
+            if not result.success:
+                status, error = 'failed', f'Cell {execution_count}: {cell["outputs"][-1].get("evalue") or result.error}'
+                if not allow_errors:
+                    break
+    finally:
+        kernel_manager.shutdown_kernel(session_id)
+    
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(notebook, f, indent=1, ensure_ascii=False)
+        f.write('\n')
+    
+    return {
+        'notebook': path,
+        'output': output_path,
+        'status': status,
+        'error': error,
+        'cells_run': cells_run,
+        'duration': time.time() - start_time
+    }
+
+def run_notebooks(paths, jobs=os.cpu_count() or 1, output_dir=None, timeout=EXECUTION_TIMEOUT, allow_errors=False):
+    """Execute notebooks in parallel, each in its own kernel process; yields summaries as they finish"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix='notebook-runner') as executor:
+        futures = {
+            executor.submit(run_notebook, path, executed_notebook_path(path, output_dir), timeout, allow_errors): path
+            for path in paths
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result()
             except Exception as e:
-                print(f"   ❌ Installation error for {package_name}: {e}")
-                installation_results.append({
-                    'package': package_name,
-                    'success': False,
-                    'message': f'Installation error: {str(e)}'
+                yield {
+                    'notebook': futures[future],
+                    'output': None,
+                    'status': 'failed',
+                    'error': f"{type(e).__name__}: {str(e)}",
+                    'cells_run': 0,
+                    'duration': 0
+                }
+
+def run_notebooks_command(argv):
+    """CLI: python backend_server.py run-notebooks notebooks/*.ipynb -j 8"""
+    parser = argparse.ArgumentParser(prog='backend_server.py run-notebooks',
+                                     description='Execute notebooks in parallel, each in a fresh kernel, '
+                                                 'writing the outputs to <name>.executed.ipynb copies.')
+    parser.add_argument('notebooks', nargs='+', help='Notebook files or glob patterns')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Notebooks run at once (default: CPU count)')
+    parser.add_argument('-o', '--output-dir', help='Directory for executed copies (default: next to each notebook)')
+    parser.add_argument('--timeout', type=float, default=EXECUTION_TIMEOUT, help='Per-cell time limit in seconds (0 disables)')
+    parser.add_argument('--allow-errors', action='store_true', help='Keep executing cells after one fails')
+    args = parser.parse_args(argv)
+    
+    # Expand patterns the shell left alone (e.g. on Windows)
+    paths = []
+    for pattern in args.notebooks:
+        paths.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    if not paths:
+        parser.error('no notebooks matched')
+    
+    print(f"📓 Running {len(paths)} notebook(s) with {args.jobs} worker(s)")
+    failures = 0
+    try:
+        for summary in run_notebooks(paths, args.jobs, args.output_dir, args.timeout or None, args.allow_errors):
+            if summary['status'] == 'success':
+                print(f"✅ {summary['notebook']} -> {summary['output']} "
+                      f"({summary['cells_run']} cells, {summary['duration']:.1f}s)")
+            else:
+                failures += 1
+                print(f"❌ {summary['notebook']}: {summary['error']}")
+    finally:
+        kernel_manager.shutdown_all()
+    
+    print(f"🏁 {len(paths) - failures} succeeded, {failures} failed")
+    return 1 if failures else 0
+
+# ================================
+# FILE INDEX
+# ================================
+
+# Directories never shown in the file browser
+IGNORED_DIRECTORIES = {'__pycache__', 'venv'}
+FILE_SORT_KEYS = {
+    'name': lambda entry: entry['name'].lower(),
+    'size': lambda entry: entry.get('size', 0),
+    'modified': lambda entry: entry['modified'],
+    'type': lambda entry: (os.path.splitext(entry['name'])[1].lower(), entry['name'].lower())
+}
+
+class DirectoryIndex:
+    """Cached os.scandir listings of workspace directories
+    
+    A cached listing is reused while the directory's mtime is unchanged (entries added,
+    removed or renamed change it) and it is younger than ``ttl`` seconds (file sizes and
+    times can change without touching the directory). Serving a listing then costs one
+    stat call instead of several per entry. Each listing carries a version hash used
+    as the ETag of the responses built from it.
+    """
+    
+    def __init__(self, ttl=DIRECTORY_INDEX_TTL, max_directories=DIRECTORY_INDEX_MAX_DIRECTORIES):
+        self.ttl = ttl
+        self.max_directories = max_directories
+        self._lock = threading.Lock()
+        self._listings = collections.OrderedDict()  # Absolute path -> (mtime_ns, scanned at, entries, version)
+        self.scans = 0
+        self.hits = 0
+    
+    def listing(self, directory):
+        """(entries, version) of a directory; entries are dicts with name, is_dir, size and modified"""
+        directory = os.path.abspath(directory)
+        mtime_ns = os.stat(directory).st_mtime_ns
+        now = time.time()
+        
+        with self._lock:
+            cached = self._listings.get(directory)
+            if cached and cached[0] == mtime_ns and now - cached[1] < self.ttl:
+                self._listings.move_to_end(directory)
+                self.hits += 1
+                return cached[2], cached[3]
+        
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Vanished or broken link
+                entries.append({
+                    'name': entry.name,
+                    'is_dir': is_dir,
+                    'size': 0 if is_dir else stat.st_size,
+                    'modified': stat.st_mtime
                 })
+        version = hashlib.sha1(json.dumps(entries, sort_keys=True).encode('utf-8')).hexdigest()
+        
+        with self._lock:
+            self._listings[directory] = (mtime_ns, now, entries, version)
+            self._listings.move_to_end(directory)
+            while len(self._listings) > self.max_directories:
+                self._listings.popitem(last=False)
+            self.scans += 1
+        return entries, version
+    
+    def invalidate(self, directory):
+        with self._lock:
+            self._listings.pop(os.path.abspath(directory), None)
+    
+    def stats(self):
+        with self._lock:
+            return {'directories': len(self._listings), 'scans': self.scans, 'hits': self.hits}
+
+directory_index = DirectoryIndex()
+
+class WorkspaceSearchIndex:
+    """Incrementally maintained index of workspace files for /api/files/search
+    
+    A background thread builds the file list at startup and refreshes it every
+    ``refresh_interval`` seconds; a refresh stats every known directory and rescans only
+    those whose mtime changed, then swaps in the new list. Searches never walk the tree
+    themselves. The text of ``.py`` and ``.ipynb`` files is extracted on first content
+    search and kept until the file's mtime or size changes.
+    """
+    
+    def __init__(self, root=None, refresh_interval=SEARCH_INDEX_REFRESH_INTERVAL,
+                 max_content_bytes=SEARCH_CONTENT_CACHE_BYTES):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.max_content_bytes = max_content_bytes
+        self._lock = threading.Lock()
+        self._directories = {}  # Relative dir -> (mtime_ns, files [(path, size, modified)], subdirectories)
+        self._files = []  # Sorted (path, size, modified) of every indexed file
+        self._paths = []  # Paths of _files, for cursor lookups
+        self._ready = threading.Event()  # Set once the first build finished
+        self._thread = None
+        self._content = collections.OrderedDict()  # Path -> (mtime_ns, size, lines, bytes)
+        self._content_bytes = 0
+    
+    def start(self):
+        """Start building and refreshing the index in the background"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refresh_loop, name='search-indexer', daemon=True)
+                self._thread.start()
+    
+    def _refresh_loop(self):
+        while True:
+            started = time.time()
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"⚠️ Search index refresh failed: {e}")
+            if not self._ready.is_set():
+                print(f"🔎 Search index built: {len(self._files)} files in {time.time() - started:.1f}s")
+                self._ready.set()
+            time.sleep(self.refresh_interval)
+    
+    def files(self, wait=0):
+        """(files, paths, ready) of the latest index; waits up to ``wait`` seconds for the first build"""
+        self.start()
+        self._ready.wait(wait)
+        with self._lock:
+            return self._files, self._paths, self._ready.is_set()
+    
+    def _refresh(self):
+        # Runs on the indexer thread only; searches keep using the previous list meanwhile
+        root = self.root or os.getcwd()
+        directories = {}
+        files = []
+        pending = ['']
+        while pending:
+            relative = pending.pop()
+            full = os.path.join(root, relative) if relative else root
+            try:
+                mtime_ns = os.stat(full).st_mtime_ns
+            except OSError:
+                continue
+            known = self._directories.get(relative)
+            if known is None or known[0] != mtime_ns:
+                known = (mtime_ns,) + self._scan(full, relative)
+            directories[relative] = known
+            files.extend(known[1])
+            pending.extend(known[2])
+            if len(files) > SEARCH_INDEX_MAX_FILES:
+                print(f"⚠️ Search index stopped at {SEARCH_INDEX_MAX_FILES} files")
+                break
+        files.sort()
+        self._directories = directories
+        with self._lock:
+            self._files = files
+            self._paths = [path for path, _, _ in files]
+    
+    @staticmethod
+    def _scan(full, relative):
+        files = []
+        subdirectories = []
+        try:
+            with os.scandir(full) as it:
+                for entry in it:
+                    path = f"{relative}/{entry.name}" if relative else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith('.') and entry.name not in IGNORED_DIRECTORIES:
+                                subdirectories.append(path)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files.append((path, stat.st_size, stat.st_mtime))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return files, subdirectories
+    
+    def lines(self, path):
+        """Searchable lines of a .py/.ipynb file as (cell index or None, line number, text)"""
+        full = os.path.join(self.root or os.getcwd(), path)
+        try:
+            stat = os.stat(full)
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._content.get(path)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                self._content.move_to_end(path)
+                return cached[2]
+        
+        if stat.st_size > SEARCH_MAX_FILE_BYTES:
+            return []
+        try:
+            with open(full, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            if path.endswith('.ipynb'):
+                lines = []
+                for index, cell in enumerate(json.loads(text).get('cells', [])):
+                    source = cell.get('source', '')
+                    source = ''.join(source) if isinstance(source, list) else source
+                    lines.extend((index, number, line) for number, line in enumerate(source.splitlines(), 1))
+            else:
+                lines = [(None, number, line) for number, line in enumerate(text.splitlines(), 1)]
+        except (OSError, ValueError, AttributeError):
+            return []  # Unreadable or not a notebook
+        
+        with self._lock:
+            previous = self._content.pop(path, None)
+            if previous:
+                self._content_bytes -= previous[3]
+            self._content[path] = (stat.st_mtime_ns, stat.st_size, lines, stat.st_size)
+            self._content_bytes += stat.st_size
+            while self._content_bytes > self.max_content_bytes and len(self._content) > 1:
+                _, evicted = self._content.popitem(last=False)
+                self._content_bytes -= evicted[3]
+        return lines
+    
+    def search(self, name=None, pattern=None, content=None, regex=False, case_sensitive=False,
+               cursor=None, limit=50, budget=SEARCH_TIME_BUDGET, max_matches=20):
+        """Search files by name substring, glob pattern and/or content
+        
+        Files are visited in path order, starting after the path given as ``cursor``.
+        The search stops after ``limit`` results or ``budget`` seconds, whichever comes
+        first, and returns the last visited path as the cursor to resume from (None once
+        every file was visited). Because the cursor is a path, a refresh between pages
+        neither skips nor repeats files.
+        """
+        started = time.time()
+        if content is not None:
+            flags = 0 if case_sensitive else re.IGNORECASE
+            matcher = re.compile(content if regex else re.escape(content), flags)
+        if name is not None and not case_sensitive:
+            name = name.lower()
+        
+        files, paths, ready = self.files(wait=budget)
+        results = []
+        start = position = bisect.bisect_right(paths, cursor) if cursor else 0
+        while position < len(files):
+            # Always visit at least one file so every page makes progress
+            if position > start and (len(results) >= limit or time.time() - started > budget):
+                break
+            path, size, modified = files[position]
+            position += 1
+            basename = path.rsplit('/', 1)[-1]
+            
+            if name is not None and name not in (basename if case_sensitive else basename.lower()):
+                continue
+            if pattern is not None and not fnmatch.fnmatch(path if '/' in pattern else basename, pattern):
                 continue
+            result = {'name': basename, 'path': path, 'size': size, 'modified': modified}
             
-            if result.returncode == 0:
-                installation_results.append({
-                    'package': package_name,
-                    'success': True,
-                    'message': f'Successfully installed {package_name}'
+            if content is not None:
+                if not path.endswith(SEARCH_CONTENT_EXTENSIONS):
+                    continue
+                matches = []
+                for cell, line_number, text in self.lines(path):
+                    if matcher.search(text):
+                        matches.append({'cell': cell, 'line': line_number, 'text': text[:SEARCH_MATCH_TEXT_CHARS]})
+                        if len(matches) >= max_matches:
+                            break
+                if not matches:
+                    continue
+                result['matches'] = matches
+            results.append(result)
+        
+        return {
+            'results': results,
+            'next_cursor': files[position - 1][0] if position < len(files) else None,
+            'complete': ready and position >= len(files),
+            'indexing': not ready,
+            'indexed_files': len(files),
+            'elapsed': round(time.time() - started, 4)
+        }
+
+search_index = WorkspaceSearchIndex()
+
+def build_file_listing(folder_path, extensions=None):
+    """File browser entries of a workspace folder, and the listing version
+    
+    Hidden and ignored directories are left out; with ``extensions`` only files with
+    those suffixes are listed.
+    """
+    entries, version = directory_index.listing(os.path.join(os.getcwd(), folder_path) if folder_path else os.getcwd())
+    files = []
+    for entry in entries:
+        name = entry['name']
+        relative_path = os.path.join(folder_path, name) if folder_path else name
+        if entry['is_dir']:
+            if not name.startswith('.') and name not in IGNORED_DIRECTORIES:
+                files.append({
+                    'name': name + '/',
+                    'type': 'directory',
+                    'path': relative_path + '/',
+                    'modified': entry['modified']
                 })
-                
-                # Try to import the newly installed package
+        elif extensions is None or name.endswith(extensions):
+            files.append({
+                'name': name,
+                'type': 'file',
+                'path': relative_path,
+                'size': entry['size'],
+                'modified': entry['modified']
+            })
+    return files, version
+
+def file_listing_response(files, version, extra=None):
+    """Sorted, paged JSON response for a file listing, honouring If-None-Match
+    
+    Query parameters: sort (name, size, modified, type), order (asc, desc), offset
+    and limit. Directories always come first.
+    """
+    sort = request.args.get('sort', 'name')
+    order = request.args.get('order', 'asc')
+    if sort not in FILE_SORT_KEYS or order not in ('asc', 'desc'):
+        return jsonify({
+            'success': False,
+            'error': f"Invalid sort: use sort={'|'.join(FILE_SORT_KEYS)} and order=asc|desc"
+        }), 400
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = request.args.get('limit')
+        limit = max(1, int(limit)) if limit is not None else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'offset and limit must be integers'
+        }), 400
+    
+    etag = hashlib.sha1(f"{version}:{request.full_path}".encode('utf-8')).hexdigest()
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if request.if_none_match.contains(etag):
+        return '', 304, headers
+    
+    key = FILE_SORT_KEYS[sort]
+    directories = sorted((f for f in files if f['type'] == 'directory'), key=key, reverse=order == 'desc')
+    regular = sorted((f for f in files if f['type'] == 'file'), key=key, reverse=order == 'desc')
+    ordered = directories + regular
+    page = ordered[offset:offset + limit] if limit is not None else ordered[offset:]
+    
+    return jsonify({
+        'success': True,
+        'files': page,
+        'total': len(ordered),
+        'offset': offset,
+        'limit': limit,
+        **(extra or {})
+    }), 200, headers
+
+# ================================
+# OUTPUT STORE
+# ================================
+
+OUTPUT_BLOB_KEY = 'jupyter_web_blobs'  # Output metadata key mapping mime types to blob names
+
+class OutputStore:
+    """Content-addressed blob directory for large notebook outputs
+    
+    Saved notebooks keep a blob name in place of each large output (images, big HTML
+    or text), so an identical plot is stored once however many notebooks or cells show
+    it. Unlike the plot cache nothing is evicted: saved notebooks refer to the blobs.
+    """
+    
+    def __init__(self, directory=OUTPUT_STORE_DIR):
+        self.directory = directory
+    
+    def put(self, data, mime):
+        """Store blob bytes and return the blob name (content hash plus extension)"""
+        extension = (mimetypes.guess_extension(mime) or '.bin') if mime != 'text/plain' else '.txt'
+        name = hashlib.sha256(data).hexdigest() + extension
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            write_file_atomic(path, data, sync=False)
+        return name
+    
+    def path(self, name):
+        """File of a blob name, or None if the name is malformed or unknown"""
+        blob_id, _, extension = name.partition('.')
+        if len(blob_id) != 64 or not all(c in '0123456789abcdef' for c in blob_id) or not extension.isalnum():
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+    
+    def get(self, name):
+        path = self.path(name)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+output_store = OutputStore()
+
+def is_binary_mime(mime):
+    # nbformat keeps these base64-encoded
+    return mime.startswith('image/') and mime != 'image/svg+xml'
+
+def externalize_notebook_outputs(notebook, threshold=OUTPUT_INLINE_MAX_BYTES):
+    """Move large mime-bundle outputs of a notebook into the output store
+    
+    The value is replaced with an empty string and the blob name recorded in the
+    output's metadata. Returns the number of values moved.
+    """
+    moved = 0
+    for cell in notebook.get('cells', []):
+        for output in cell.get('outputs') or []:
+            data = output.get('data') if isinstance(output, dict) else None
+            if not isinstance(data, dict):
+                continue
+            for mime, value in data.items():
+                text = ''.join(value) if isinstance(value, list) else value
+                if not isinstance(text, str) or len(text) <= threshold:
+                    continue
                 try:
-                    if package_name == 'matplotlib':
-                        import matplotlib.pyplot as plt
-                        execution_namespace['plt'] = plt
-                        execution_namespace['matplotlib'] = plt.matplotlib
-                    elif package_name == 'numpy':
-                        import numpy as np
-                        execution_namespace['np'] = np
-                        execution_namespace['numpy'] = np
-                    elif package_name == 'pandas':
-                        import pandas as pd
-                        execution_namespace['pd'] = pd
-                        execution_namespace['pandas'] = pd
-                    elif package_name == 'seaborn':
-                        import seaborn as sns
-                        execution_namespace['sns'] = sns
-                        execution_namespace['seaborn'] = sns
-                except ImportError as e:
-                    print(f"Warning: Could not import {package_name}: {e}")
+                    blob = base64.b64decode(text) if is_binary_mime(mime) else text.encode('utf-8')
+                except ValueError:
+                    continue
+                metadata = output.setdefault('metadata', {})
+                metadata.setdefault(OUTPUT_BLOB_KEY, {})[mime] = output_store.put(blob, mime)
+                data[mime] = ''
+                moved += 1
+    return moved
+
+def internalize_notebook_outputs(notebook):
+    """Inline the blobs of an externalized notebook again (a standalone .ipynb)"""
+    for cell in notebook.get('cells', []):
+        for output in cell.get('outputs') or []:
+            metadata = output.get('metadata') if isinstance(output, dict) else None
+            blobs = metadata.pop(OUTPUT_BLOB_KEY, None) if isinstance(metadata, dict) else None
+            for mime, name in (blobs or {}).items():
+                blob = output_store.get(name)
+                if blob is not None:
+                    output.setdefault('data', {})[mime] = (base64.b64encode(blob).decode('ascii')
+                                                           if is_binary_mime(mime) else blob.decode('utf-8'))
+    return notebook
+
+def notebook_output_view(output):
+    """An output as sent to lazy-loading clients: externalized values become URLs"""
+    if not isinstance(output, dict):
+        return output
+    blobs = (output.get('metadata') or {}).get(OUTPUT_BLOB_KEY) or {}
+    if not blobs:
+        return output
+    view = dict(output)
+    view['data'] = {mime: value for mime, value in (output.get('data') or {}).items() if mime not in blobs}
+    view['urls'] = {mime: f'/api/outputs/{name}' for mime, name in blobs.items()}
+    return view
+
+# ================================
+# NOTEBOOK STORE
+# ================================
+
+def write_file_atomic(path, data, sync=True):
+    """Write bytes to a temp file next to ``path`` and rename it over ``path``
+    
+    Readers see either the old or the new file, never a partial one. With ``sync`` the
+    temp file is fsynced before the rename; the caller syncs the directory (see
+    fsync_directory) to make the rename itself durable.
+    """
+    directory = os.path.dirname(path) or '.'
+    temp_path = os.path.join(directory, f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+def fsync_directory(directory):
+    """Persist renames in a directory (no-op where directories cannot be opened, e.g. Windows)"""
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def file_version(path):
+    """Version token of a file on disk, from its mtime and size"""
+    stat = os.stat(path)
+    return f'd{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+class NotebookStore:
+    """Notebooks patched cell by cell and written back in batches
+    
+    A patch replaces only the cells it lists and is applied to an in-memory copy of
+    the notebook. Dirty notebooks are written by a background thread at most every
+    ``flush_interval`` seconds, each with an atomic temp file + rename; all renames of
+    one flush share a single directory fsync. Versions guard against patches made
+    on top of an outdated copy.
+    """
+    
+    def __init__(self, flush_interval=NOTEBOOK_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._notebooks = {}  # Absolute path -> {'notebook', 'version', 'stamp', 'dirty'}
+        self._thread = None
+        self.flushes = 0
+        self.writes = 0
+    
+    @staticmethod
+    def _stamp(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _entry(self, path):
+        """Cached notebook, reloaded if the file was changed by someone else"""
+        entry = self._notebooks.get(path)
+        if entry is not None and (entry['dirty'] or entry['stamp'] == self._stamp(path)):
+            return entry
+        with open(path, 'r', encoding='utf-8') as f:
+            notebook = json.load(f)
+        externalize_notebook_outputs(notebook)  # Keeps large outputs out of memory and out of responses
+        entry = {
+            'notebook': notebook,
+            'version': file_version(path),
+            'stamp': self._stamp(path),
+            'dirty': False
+        }
+        self._notebooks[path] = entry
+        return entry
+    
+    def read(self, path):
+        """(notebook, version) of a notebook; the notebook must not be modified"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entry(path)
+            return entry['notebook'], entry['version']
+    
+    def version(self, path):
+        """Current version of a notebook, without loading it"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._notebooks.get(path)
+            if entry is not None and (entry['dirty'] or entry['stamp'] == self._stamp(path)):
+                return entry['version']
+        return file_version(path)
+    
+    def patch(self, path, base_version, length, cells, metadata=None):
+        """Apply a cell patch and schedule the write; returns the new version
+        
+        ``length`` is the cell count after the patch and ``cells`` maps cell indexes to
+        their new content; cells not listed keep what the notebook had at that index.
+        Raises ValueError for a malformed patch and NotebookConflict if ``base_version``
+        is not the current version.
+        """
+        path = os.path.abspath(path)
+        if not isinstance(length, int) or length < 0:
+            raise ValueError('length must be a non-negative integer')
+        if not isinstance(cells, dict) or not all(isinstance(cell, dict) for cell in cells.values()):
+            raise ValueError('cells must map cell indexes to cell objects')
+        try:
+            changes = {int(index): cell for index, cell in cells.items()}
+        except (TypeError, ValueError):
+            raise ValueError('cell indexes must be integers')
+        if any(index < 0 or index >= length for index in changes):
+            raise ValueError('cell index out of range')
+        
+        with self._lock:
+            entry = self._entry(path)
+            if base_version != entry['version']:
+                raise NotebookConflict(entry['version'])
+            
+            current = entry['notebook'].get('cells', [])
+            missing = [index for index in range(len(current), length) if index not in changes]
+            if missing:
+                raise ValueError(f'cells {missing} are new and must be sent')
+            entry['notebook']['cells'] = [changes[index] if index in changes else current[index]
+                                          for index in range(length)]
+            if metadata is not None:
+                entry['notebook']['metadata'] = metadata
+            entry['version'] = uuid.uuid4().hex
+            entry['dirty'] = True
+            
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._flush_loop, name='notebook-writer', daemon=True)
+                self._thread.start()
+            return entry['version']
+    
+    def flush(self, path=None):
+        """Write dirty notebooks (or only ``path``) now"""
+        with self._lock:
+            if path is not None:
+                path = os.path.abspath(path)
+                paths = [path] if path in self._notebooks and self._notebooks[path]['dirty'] else []
             else:
-                installation_results.append({
-                    'package': package_name,
-                    'success': False,
-                    'message': f'Failed to install {package_name}: {result.stderr}'
-                })
+                paths = [p for p, entry in self._notebooks.items() if entry['dirty']]
+            if not paths:
+                return 0
+            
+            for p in paths:
+                entry = self._notebooks[p]
+                externalize_notebook_outputs(entry['notebook'])
+                data = json.dumps(entry['notebook'], indent=1, ensure_ascii=False).encode('utf-8') + b'\n'
+                write_file_atomic(p, data)
+                entry['stamp'] = self._stamp(p)
+                entry['dirty'] = False
+                directory_index.invalidate(os.path.dirname(p))
+            for directory in {os.path.dirname(p) for p in paths}:
+                fsync_directory(directory)
+            self.flushes += 1
+            self.writes += len(paths)
+            return len(paths)
+    
+    def discard(self, path):
+        """Forget a notebook that was overwritten as a whole"""
+        with self._lock:
+            self._notebooks.pop(os.path.abspath(path), None)
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"❌ Notebook write failed: {e}")
+                if not any(entry['dirty'] for entry in self._notebooks.values()):
+                    self._thread = None
+                    return
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'notebooks': len(self._notebooks),
+                'dirty': sum(1 for entry in self._notebooks.values() if entry['dirty']),
+                'flushes': self.flushes,
+                'writes': self.writes
+            }
+
+class NotebookConflict(Exception):
+    """A notebook patch was based on an outdated version"""
+    
+    def __init__(self, version):
+        super().__init__('Notebook was changed since it was loaded')
+        self.version = version
+
+notebook_store = NotebookStore()
+
+# ================================
+# UPLOADS
+# ================================
+
+class UploadConflict(Exception):
+    """A chunk did not start at the upload's current offset"""
+    
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}')
+        self.offset = offset
+
+class UploadManager:
+    """Resumable chunked uploads streamed to disk
+    
+    An upload is a ``<id>.part`` file plus a ``<id>.json`` description in ``directory``,
+    so an interrupted upload can continue from its current offset even after a server
+    restart. Chunks are appended in order and can carry a SHA-256 that is checked
+    before they count; the whole file is checked against the SHA-256 given at creation
+    before it is moved into the workspace.
+    """
+    
+    def __init__(self, directory=UPLOAD_DIR, expiry=UPLOAD_EXPIRY):
+        self.directory = directory
+        self.expiry = expiry
+        self._lock = threading.Lock()
+        self._busy = set()  # Upload ids with a chunk being written
+    
+    def _paths(self, upload_id):
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise KeyError(upload_id)
+        return (os.path.join(self.directory, f'{upload_id}.json'),
+                os.path.join(self.directory, f'{upload_id}.part'))
+    
+    def create(self, path, size, sha256=None):
+        """Start an upload of ``size`` bytes to workspace ``path``; returns its status"""
+        validate_workspace_path(path)
+        if not isinstance(size, int) or size < 0:
+            raise ValueError('size must be a non-negative integer')
+        if sha256 is not None and (len(sha256) != 64 or not all(c in '0123456789abcdef' for c in sha256.lower())):
+            raise ValueError('sha256 must be a hex SHA-256 digest')
+        self.expire()
+        
+        upload = {
+            'id': uuid.uuid4().hex,
+            'path': path,
+            'size': size,
+            'sha256': sha256.lower() if sha256 else None,
+            'created_at': time.time()
+        }
+        info_path, part_path = self._paths(upload['id'])
+        os.makedirs(self.directory, exist_ok=True)
+        open(part_path, 'wb').close()
+        write_file_atomic(info_path, json.dumps(upload).encode('utf-8'), sync=False)
+        return self.status(upload['id'])
+    
+    def _load(self, upload_id):
+        info_path, part_path = self._paths(upload_id)
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                upload = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+        return upload, part_path
+    
+    def status(self, upload_id):
+        upload, part_path = self._load(upload_id)
+        return {**upload, 'offset': os.path.getsize(part_path), 'complete': False}
+    
+    def write_chunk(self, upload_id, offset, stream, sha256=None):
+        """Append a chunk read from ``stream`` at ``offset``; finishes the upload with its last byte
         
-        # Retry code execution
-        execution_result = execute_python_code(code)
+        A chunk whose SHA-256 does not match is discarded (ValueError). Returns the
+        upload status; ``complete`` is True once the file was moved into place.
+        """
+        upload, part_path = self._load(upload_id)
+        with self._lock:
+            if upload_id in self._busy:
+                raise UploadConflict(os.path.getsize(part_path))
+            self._busy.add(upload_id)
+        try:
+            current = os.path.getsize(part_path)
+            if offset != current:
+                raise UploadConflict(current)
+            
+            digest = hashlib.sha256()
+            written = 0
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                while True:
+                    block = stream.read(UPLOAD_READ_BYTES)
+                    if not block:
+                        break
+                    written += len(block)
+                    if offset + written > upload['size']:
+                        f.truncate(offset)
+                        raise ValueError(f"Chunk goes past the declared size of {upload['size']} bytes")
+                    digest.update(block)
+                    f.write(block)
+                if sha256 is not None and digest.hexdigest() != sha256.lower():
+                    f.truncate(offset)
+                    raise ValueError('Chunk checksum mismatch; resend it')
+                f.flush()
+                os.fsync(f.fileno())
+            
+            if offset + written == upload['size']:
+                return self._finish(upload, part_path)
+            return {**upload, 'offset': offset + written, 'complete': False}
+        finally:
+            with self._lock:
+                self._busy.discard(upload_id)
+    
+    def _finish(self, upload, part_path):
+        if upload['sha256'] is not None:
+            digest = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(UPLOAD_READ_BYTES), b''):
+                    digest.update(block)
+            if digest.hexdigest() != upload['sha256']:
+                self.abort(upload['id'])
+                raise ValueError('File checksum mismatch; the upload was discarded')
         
+        target = os.path.abspath(upload['path'])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(part_path, target)
+        fsync_directory(os.path.dirname(target))
+        notebook_store.discard(target)
+        directory_index.invalidate(os.path.dirname(target))
+        self.abort(upload['id'])
+        print(f"📤 Uploaded {upload['path']} ({upload['size']} bytes)")
+        return {**upload, 'offset': upload['size'], 'complete': True}
+    
+    def abort(self, upload_id):
+        """Delete an upload and what was received of it"""
+        for path in self._paths(upload_id):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+    
+    def expire(self):
+        """Delete uploads not touched for ``expiry`` seconds"""
+        if not os.path.isdir(self.directory):
+            return
+        cutoff = time.time() - self.expiry
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                upload_id, _, extension = entry.name.partition('.')
+                if extension != 'part':
+                    continue
+                # The upload may be completed or aborted concurrently
+                with contextlib.suppress(KeyError, OSError):
+                    if entry.stat().st_mtime < cutoff:
+                        self.abort(upload_id)
+
+upload_manager = UploadManager()
+
+# ================================
+# SCHEDULER ENDPOINTS
+# ================================
+
+@app.route('/api/scheduler/tasks', methods=['GET'])
+def get_scheduled_tasks():
+    """Get all scheduled tasks"""
+    try:
+        active = set(scheduler.status()['active_tasks'])
+        tasks = scheduler.store.list_tasks()
+        for task in tasks:
+            task['running'] = task['id'] in active
         return jsonify({
-            'success': execution_result.success,
-            'output': execution_result.output,
-            'error': execution_result.error,
-            'execution_time': execution_result.execution_time,
-            'timestamp': execution_result.timestamp,
-            'cell_id': cell_id,
-            'missing_packages': execution_result.missing_packages,
-            'plots': execution_result.plots,
-            'installation_results': installation_results
+            'success': True,
+            'tasks': tasks
         })
-        
     except Exception as e:
         return jsonify({
             'success': False,
-            'error': f'Installation and retry error: {str(e)}'
+            'error': str(e)
         }), 500
 
-@app.route('/api/pip-check', methods=['GET'])
-def pip_check():
-    """Check if pip is working and accessible"""
+@app.route('/api/scheduler/tasks', methods=['POST'])
+def create_scheduled_task():
+    """Create a new scheduled task"""
     try:
-        # Test pip version
-        result = subprocess.run([
-            sys.executable, '-m', 'pip', '--version'
-        ], capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
+        data = request.get_json()
+        if not data:
             return jsonify({
-                'success': True,
-                'pip_version': result.stdout.strip(),
-                'python_executable': sys.executable
-            })
-        else:
+                'success': False,
+                'error': 'No task data provided'
+            }), 400
+        
+        try:
+            task = build_task(data)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': 'pip not accessible',
-                'stderr': result.stderr
-            })
-            
+                'error': str(e)
+            }), 400
+        
+        task = scheduler.store.create_task(task)
+        scheduler.wake()
+        return jsonify({
+            'success': True,
+            'message': 'Task created successfully',
+            'task_id': task['id'],
+            'task': task
+        })
     except Exception as e:
         return jsonify({
             'success': False,
-            'error': f'pip check failed: {str(e)}'
-        })
+            'error': str(e)
+        }), 500
 
-@app.route('/api/files', methods=['GET'])
-def list_files():
-    """List files in the current directory"""
-    import os
+@app.route('/api/scheduler/tasks/<int:task_id>', methods=['GET'])
+def get_scheduled_task(task_id):
+    """Get one scheduled task"""
     try:
-        files = []
-        current_dir = os.getcwd()
-        
-        for item in os.listdir(current_dir):
-            item_path = os.path.join(current_dir, item)
-            if os.path.isfile(item_path):
-                # Include all file types (no filtering)
-                files.append({
-                    'name': item,
-                    'type': 'file',
-                    'path': item,
-                    'size': os.path.getsize(item_path)
-                })
-            elif os.path.isdir(item_path) and not item.startswith('.') and item not in ['__pycache__', 'venv']:
-                # Include directories (except hidden ones and common ignore patterns)
-                files.append({
-                    'name': item + '/',
-                    'type': 'directory',
-                    'path': item + '/'
-                })
-        
-        # Sort: directories first, then files alphabetically
-        files.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
+        task = scheduler.store.get_task(task_id)
+        if task is None:
+            return jsonify({
+                'success': False,
+                'error': f'Task not found: {task_id}'
+            }), 404
         
+        task['running'] = task_id in scheduler.status()['active_tasks']
         return jsonify({
             'success': True,
-            'files': files
+            'task': task
         })
-        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/files/content', methods=['GET'])
-def get_file_content():
-    """Get content of a specific file"""
-    import os
+@app.route('/api/scheduler/tasks/<int:task_id>', methods=['PATCH', 'PUT'])
+def update_scheduled_task(task_id):
+    """Update a scheduled task (e.g. enable/disable or change its schedule)"""
     try:
-        file_path = request.args.get('path')
-        if not file_path:
-            return jsonify({
-                'success': False,
-                'error': 'No file path provided'
-            }), 400
-        
-        # Security check: prevent directory traversal
-        if '..' in file_path or file_path.startswith('/'):
-            return jsonify({
-                'success': False,
-                'error': 'Invalid file path'
-            }), 400
-        
-        if not os.path.exists(file_path):
+        task = scheduler.store.get_task(task_id)
+        if task is None:
             return jsonify({
                 'success': False,
-                'error': 'File not found'
+                'error': f'Task not found: {task_id}'
             }), 404
         
-        if not os.path.isfile(file_path):
+        try:
+            task = build_task(request.get_json() or {}, existing=task)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': 'Path is not a file'
+                'error': str(e)
             }), 400
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        return content, 200, {'Content-Type': 'text/plain; charset=utf-8'}
-        
-    except UnicodeDecodeError:
+        task = scheduler.store.update_task(task)
+        if not (task['incremental'] and task['enabled']):
+            release_task_kernel(task_id)
+        scheduler.wake()
         return jsonify({
-            'success': False,
-            'error': 'File contains binary data or unsupported encoding'
-        }), 400
+            'success': True,
+            'task': task
+        })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/files/save', methods=['POST'])
-def save_file():
-    """Save a file to the server"""
-    import os
+@app.route('/api/scheduler/tasks/<int:task_id>', methods=['DELETE'])
+def delete_scheduled_task(task_id):
+    """Delete a scheduled task and its run history"""
     try:
-        data = request.get_json()
-        if not data or 'filename' not in data or 'content' not in data:
+        if not scheduler.store.delete_task(task_id):
             return jsonify({
                 'success': False,
-                'error': 'Missing filename or content'
-            }), 400
-        
-        filename = data['filename']
-        content = data['content']
-        
-        # Security check: prevent directory traversal with '..'
-        if '..' in filename:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid filename - directory traversal not allowed'
-            }), 400
-        
-        # Handle file paths properly
-        if filename.endswith('.ipynb'):
-            # For notebooks, save to notebooks directory if it's just a filename
-            if '/' not in filename and '\\' not in filename:
-                notebooks_dir = 'notebooks'
-                if not os.path.exists(notebooks_dir):
-                    os.makedirs(notebooks_dir)
-                file_path = os.path.join(notebooks_dir, filename)
-            else:
-                file_path = filename
-        else:
-            # For other files, use the provided path
-            file_path = filename
-            
-        # Ensure the directory exists
-        dir_path = os.path.dirname(file_path)
-        if dir_path and not os.path.exists(dir_path):
-            os.makedirs(dir_path)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+                'error': f'Task not found: {task_id}'
+            }), 404
+        release_task_kernel(task_id)
         
         return jsonify({
             'success': True,
-            'message': f'File saved as {file_path}',
-            'path': file_path
+            'message': f'Task {task_id} deleted'
         })
-        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/files/folder', methods=['GET'])
-def list_folder_contents():
-    """List contents of a specific folder"""
-    import os
+@app.route('/api/scheduler/tasks/<int:task_id>/run', methods=['POST'])
+def run_scheduled_task(task_id):
+    """Queue an immediate run of a scheduled task"""
     try:
-        folder_path = request.args.get('path', '')
-        
-        # Security check: prevent directory traversal
-        if '..' in folder_path:
+        task = scheduler.store.get_task(task_id)
+        if task is None:
             return jsonify({
                 'success': False,
-                'error': 'Invalid folder path'
-            }), 400
-        
-        # Get the full path
-        if folder_path:
-            # Remove trailing slash for consistency
-            folder_path = folder_path.rstrip('/')
-            full_path = os.path.join(os.getcwd(), folder_path)
-        else:
-            full_path = os.getcwd()
+                'error': f'Task not found: {task_id}'
+            }), 404
         
-        if not os.path.exists(full_path) or not os.path.isdir(full_path):
+        run_ids = scheduler.submit(task, [(datetime.now(), 'manual')])
+        if not run_ids:
             return jsonify({
                 'success': False,
-                'error': 'Folder not found'
-            }), 404
-        
-        files = []
-        
-        for item in os.listdir(full_path):
-            item_path = os.path.join(full_path, item)
-            relative_path = os.path.join(folder_path, item) if folder_path else item
-            
-            if os.path.isfile(item_path):
-                # Only include relevant file types
-                if item.endswith(('.py', '.ipynb', '.txt', '.md', '.json', '.html', '.css', '.js')):
-                    files.append({
-                        'name': item,
-                        'type': 'file',
-                        'path': relative_path,
-                        'size': os.path.getsize(item_path)
-                    })
-            elif os.path.isdir(item_path) and not item.startswith('.') and item not in ['__pycache__', 'venv']:
-                # Include directories (except hidden ones and common ignore patterns)
-                files.append({
-                    'name': item + '/',
-                    'type': 'directory',
-                    'path': relative_path + '/'
-                })
-        
-        # Sort: directories first, then files alphabetically
-        files.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
+                'error': 'Task is already running'
+            }), 409
         
         return jsonify({
             'success': True,
-            'files': files,
-            'folder': folder_path
+            'message': f"Task '{task['name']}' queued",
+            'run_id': run_ids[0]
         })
-        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-# ================================
-# SCHEDULER ENDPOINTS
-# ================================
-
-@app.route('/api/scheduler/tasks', methods=['GET'])
-def get_scheduled_tasks():
-    """Get all scheduled tasks"""
+@app.route('/api/scheduler/tasks/<int:task_id>/runs', methods=['GET'])
+def get_task_runs(task_id):
+    """Get the run history of a scheduled task (newest first)"""
     try:
-        # In a real implementation, this would read from a database
-        # For now, we'll return a simple response
+        if scheduler.store.get_task(task_id) is None:
+            return jsonify({
+                'success': False,
+                'error': f'Task not found: {task_id}'
+            }), 404
+        
+        limit = max(1, min(int(request.args.get('limit', 50)), SCHEDULER_HISTORY_LIMIT))
         return jsonify({
             'success': True,
-            'tasks': []
+            'runs': scheduler.store.list_runs(task_id, limit)
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid limit: {str(e)}'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/scheduler/tasks', methods=['POST'])
-def create_scheduled_task():
-    """Create a new scheduled task"""
+@app.route('/api/scheduler/status', methods=['GET'])
+def get_scheduler_status():
+    """Get scheduler worker status"""
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                'success': False,
-                'error': 'No task data provided'
-            }), 400
-        
-        # In a real implementation, this would save to a database
-        # For now, we'll just return success
         return jsonify({
             'success': True,
-            'message': 'Task created successfully',
-            'task_id': data.get('id', 'generated_id')
+            'scheduler': scheduler.status()
         })
     except Exception as e:
         return jsonify({
@@ -793,7 +5214,7 @@ def create_scheduled_task():
 
 @app.route('/api/scheduler/execute', methods=['POST'])
 def execute_scheduled_task():
-    """Execute a scheduled task"""
+    """Queue a notebook or Python file for background execution; returns a job id"""
     try:
         data = request.get_json()
         if not data or 'file_path' not in data:
@@ -804,76 +5225,150 @@ def execute_scheduled_task():
         
         file_path = data['file_path']
         
-        # Read the file content
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            validate_workspace_path(file_path)
+            cells = read_code_cells(file_path)
+            timeout = get_execution_timeout(data)
         except FileNotFoundError:
             return jsonify({
                 'success': False,
                 'error': f'File not found: {file_path}'
             }), 404
-        
-        # Execute the content
-        if file_path.endswith('.ipynb'):
-            # Handle notebook execution
-            import json
-            notebook_data = json.loads(content)
-            results = []
-            
-            for cell in notebook_data.get('cells', []):
-                if cell.get('cell_type') == 'code':
-                    source = cell.get('source', [])
-                    if isinstance(source, list):
-                        code = ''.join(source)
-                    else:
-                        code = source
-                    
-                    if code.strip():
-                        result = execute_python_code(code)
-                        results.append(result)
-            
+        except ValueError as e:
             return jsonify({
-                'success': True,
-                'message': 'Notebook executed successfully',
-                'results': results
-            })
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        elif file_path.endswith('.py'):
-            # Handle Python file execution
-            result = execute_python_code(content)
+        job = job_queue.submit(file_path, cells, timeout=timeout, stop_on_error=bool(data.get('stop_on_error', False)),
+                               incremental=bool(data.get('incremental', False)))
+        return jsonify({
+            'success': True,
+            'message': f'Execution of {file_path} queued',
+            'job_id': job.id,
+            'job': job.to_dict(include_results=False)
+        }), 202
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ================================
+# JOB ENDPOINTS
+# ================================
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List background jobs (without per-cell results)"""
+    try:
+        return jsonify({
+            'success': True,
+            'jobs': [job.to_dict(include_results=False) for job in job_queue.list()],
+            'queue': job_queue.status()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progress of a background job: status, current cell, elapsed time and per-cell results"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
             return jsonify({
-                'success': True,
-                'message': 'Python file executed successfully',
-                'result': result
-            })
+                'success': False,
+                'error': f'Job not found: {job_id}'
+            }), 404
         
-        else:
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    try:
+        job = job_queue.cancel(job_id)
+        if job is None:
             return jsonify({
                 'success': False,
-                'error': 'Unsupported file type'
-            }), 400
-            
+                'error': f'Job not found: {job_id}'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job.to_dict(include_results=False)
+        })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+# Seconds spent initialising this module (cold-start latency before serving)
+SERVER_STARTUP_TIME = time.time() - SERVER_START_TIME
+
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['run-notebooks']:
+        sys.exit(run_notebooks_command(sys.argv[2:]))
+    
     print("🚀 Starting Jupyter Web Backend Server...")
     print("📍 Server will be available at: http://localhost:5000")
     print("🔗 API endpoints:")
     print("   - POST /api/execute - Execute Python code")
+    print("   - POST /api/execute/stream - Execute Python code, streaming output (SSE)")
     print("   - POST /api/reset - Reset execution namespace")
+    print("   - POST /api/interrupt - Interrupt a running cell")
     print("   - GET /api/variables - Get current variables")
+    print("   - GET /api/variables/<name> - Get a slice of one variable")
+    print("   - GET /api/plots/<plot_id> - Get a rendered plot")
+    print("   - GET/POST /api/plots/settings - Session plot rendering options")
+    print("   - GET /api/kernels - Kernel pool status")
+    print("   - DELETE /api/kernels/<session_id> - Shut down a session kernel")
     print("   - GET /api/status - Get server status")
-    print("   - POST /api/install - Install Python packages")
+    print("   - POST /api/install - Install Python packages (in the background)")
+    print("   - GET /api/install/<id> - Package install progress")
     print("   - POST /api/install-and-retry - Auto-install missing packages")
     print("   - GET /api/files - List files in directory")
     print("   - GET /api/files/folder - List folder contents")
+    print("   - GET /api/files/search - Search files by name, glob or content")
     print("   - GET /api/files/content - Get file content")
     print("   - POST /api/files/save - Save files to server")
+    print("   - GET /api/files/notebook - Get notebook cells without outputs")
+    print("   - GET /api/files/notebook/outputs - Get the outputs of a range of cells")
+    print("   - PATCH /api/files/notebook - Save changed notebook cells")
+    print("   - GET /api/outputs/<name> - Get a stored notebook output")
+    print("   - POST /api/uploads - Start a resumable upload")
+    print("   - GET/PUT/DELETE /api/uploads/<id> - Upload progress, send a chunk, abort")
+    print("   - GET/POST /api/scheduler/tasks - List or create scheduled tasks")
+    print("   - GET/PATCH/DELETE /api/scheduler/tasks/<id> - Manage a scheduled task")
+    print("   - POST /api/scheduler/tasks/<id>/run - Run a scheduled task now")
+    print("   - GET /api/scheduler/tasks/<id>/runs - Scheduled task run history")
+    print("   - GET /api/scheduler/status - Scheduler status")
+    print("   - POST /api/scheduler/execute - Queue a notebook run (returns a job id)")
+    print("   - GET /api/jobs, GET /api/jobs/<id> - Background job progress and results")
+    print("   - DELETE /api/jobs/<id> - Cancel a background job")
     print("\n✨ Ready to execute Python code and manage files!")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # The debug reloader imports this module twice; only its serving child runs tasks
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        search_index.start()  # Build the search index before the first query needs it
+        if SCHEDULER_ENABLED:
+            scheduler.start()
+    
+    try:
+        app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
+    finally:
+        notebook_store.flush()  # Write cell patches still waiting for the next batch
@@ -3,25 +3,199 @@
 
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+import os
+import glob
+import hashlib
+import json
+import warnings
+from typing import List, Dict, Any, Iterator, Optional, Union
 
-def load_csv_data(file_path: str) -> pd.DataFrame:
+# pyarrow is optional: without it CSV files are read directly and never cached
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+CACHE_FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}  # Sidecar cache format -> file extension
+
+def load_csv_data(file_path: str, columns: Optional[List[str]] = None,
+                  dtypes: Optional[Dict[str, Any]] = None, chunksize: Optional[int] = None,
+                  cache: bool = False, cache_format: str = 'parquet') -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
     """
     Load CSV data with error handling
     
+    With ``cache``, the CSV is converted on first read to a sidecar file next to it
+    (``.<name>.<key>.parquet`` or ``.arrow``), which later reads use until the CSV's
+    modification time or size changes. Reading the sidecar only touches the requested
+    columns and is much faster than parsing the CSV again; with ``chunksize`` it is read
+    batch by batch. Needs pyarrow; without it a warning is issued and the CSV is read
+    directly. Cached reads return the same columns, dtypes and index as
+    ``pd.read_csv``, except that pyarrow parses floats exactly: pandas' default parser
+    can differ in the last digit (0.30897453758526094 vs 0.3089745375852609), as with
+    ``pd.read_csv(float_precision='round_trip')``.
+    
     Args:
         file_path: Path to the CSV file
+        columns: Only load these columns
+        dtypes: dtype hints per column, e.g. {'zip': str, 'region': 'category'}
+        chunksize: Return an iterator of DataFrames with this many rows each instead
+            of one DataFrame, for files larger than memory
+        cache: Use (and create) the sidecar cache; off by default
+        cache_format: 'parquet' (compact) or 'arrow' (Arrow IPC, memory-mapped)
         
     Returns:
-        pandas DataFrame with the loaded data
+        pandas DataFrame with the loaded data, or an iterator of DataFrames with chunksize
     """
+    if cache_format not in CACHE_FORMATS:
+        raise ValueError(f"cache_format must be one of {list(CACHE_FORMATS)}")
+    
+    if cache and pa is None:
+        warnings.warn("load_csv_data(cache=True) needs pyarrow (pip install pyarrow); reading the CSV directly",
+                      RuntimeWarning, stacklevel=2)
+    
     try:
-        df = pd.read_csv(file_path)
+        cache_path = csv_cache_path(file_path, dtypes, cache_format) if cache and pa is not None else None
+        if cache_path is not None and not os.path.exists(cache_path):
+            try:
+                build_csv_cache(file_path, cache_path, dtypes, cache_format)
+            except Exception as e:
+                # E.g. a column whose type changes further down the file
+                print(f"Could not cache CSV, reading it directly: {e}")
+                cache_path = None
+        
+        if cache_path is None:
+            if chunksize:
+                return pd.read_csv(file_path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+            df = pd.read_csv(file_path, usecols=columns, dtype=dtypes)
+        else:
+            if chunksize:
+                return iter_csv_cache(cache_path, columns, dtypes, cache_format, chunksize)
+            df = apply_dtypes(read_csv_cache(cache_path, columns, cache_format).to_pandas(), dtypes)
+        
         print(f"Successfully loaded {len(df)} rows and {len(df.columns)} columns")
         return df
     except Exception as e:
         print(f"Error loading CSV: {e}")
-        return pd.DataFrame()
+        return iter([]) if chunksize else pd.DataFrame()
+
+def csv_cache_path(file_path: str, dtypes: Optional[Dict[str, Any]], cache_format: str) -> str:
+    """
+    Sidecar cache file of a CSV
+    
+    The name includes a hash of the CSV's modification time, size and dtype hints, so
+    a changed file (or different hints) never reuses an outdated cache.
+    """
+    stat = os.stat(file_path)
+    hints = json.dumps({column: str(dtype) for column, dtype in (dtypes or {}).items()}, sort_keys=True)
+    key = hashlib.sha1(f"{stat.st_mtime_ns}:{stat.st_size}:{hints}".encode('utf-8')).hexdigest()[:16]
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, f".{name}.{key}.{CACHE_FORMATS[cache_format]}")
+
+def build_csv_cache(file_path: str, cache_path: str, dtypes: Optional[Dict[str, Any]], cache_format: str) -> None:
+    """
+    Convert a CSV to a Parquet or Arrow IPC sidecar, streaming it block by block
+    
+    Memory use does not depend on the file size. Types follow pandas: empty strings
+    are missing values, dates stay strings and empty columns are float. Older sidecars
+    of the same CSV are removed.
+    """
+    column_types = {}
+    for column, dtype in (dtypes or {}).items():
+        try:
+            column_types[column] = pa.from_numpy_dtype(np.dtype(dtype))
+        except (TypeError, ValueError, pa.ArrowException):
+            pass  # e.g. 'category': inferred here and converted after loading
+    
+    reader = pa_csv.open_csv(file_path, convert_options=csv_convert_options(column_types))
+    # pandas does not parse dates and reads all-empty columns as NaN
+    overrides = {
+        field.name: pa.string() if pa.types.is_temporal(field.type) else pa.float64()
+        for field in reader.schema
+        if field.name not in column_types and (pa.types.is_temporal(field.type) or pa.types.is_null(field.type))
+    }
+    if overrides:
+        reader = pa_csv.open_csv(file_path, convert_options=csv_convert_options({**column_types, **overrides}))
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        if cache_format == 'parquet':
+            writer = pq.ParquetWriter(temp_path, reader.schema)
+        else:
+            writer = pa.ipc.new_file(temp_path, reader.schema)
+        with writer:
+            for batch in reader:
+                writer.write_batch(batch)
+        os.replace(temp_path, cache_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    directory, name = os.path.split(os.path.abspath(file_path))
+    for stale in glob.glob(os.path.join(directory, f".{glob.escape(name)}.*.{CACHE_FORMATS[cache_format]}")):
+        if stale != cache_path:
+            os.remove(stale)
+
+def csv_convert_options(column_types: Dict[str, Any]) -> "pa_csv.ConvertOptions":
+    """
+    pyarrow CSV conversion options that treat empty strings as missing, like pandas
+    """
+    return pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+
+def read_csv_cache(cache_path: str, columns: Optional[List[str]], cache_format: str) -> "pa.Table":
+    """
+    Read a sidecar cache; only the requested columns are read (Parquet) or paged in (Arrow)
+    """
+    if cache_format == 'parquet':
+        return pq.read_table(cache_path, columns=columns, memory_map=True)
+    
+    table = pa.ipc.open_file(pa.memory_map(cache_path, 'r')).read_all()
+    return table.select(columns) if columns else table
+
+def iter_csv_cache(cache_path: str, columns: Optional[List[str]], dtypes: Optional[Dict[str, Any]],
+                   cache_format: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Read a sidecar cache in DataFrames of ``chunksize`` rows, holding about one chunk at a time
+    
+    Chunks are indexed by row number in the file, like ``pd.read_csv`` chunks.
+    """
+    if cache_format == 'parquet':
+        batches = pq.ParquetFile(cache_path, memory_map=True).iter_batches(batch_size=chunksize, columns=columns)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(cache_path, 'r'))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        if columns:
+            batches = (selected for batch in batches
+                       for selected in pa.Table.from_batches([batch]).select(columns).to_batches())
+    
+    # Stored batches follow the CSV block size (and row groups); regroup them into chunks
+    pending, rows, offset = [], 0, 0
+    for batch in batches:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield cache_chunk(table.slice(0, chunksize), dtypes, offset)
+            offset += chunksize
+            rest = table.slice(chunksize)
+            pending, rows = rest.to_batches(), rest.num_rows
+    if rows:
+        yield cache_chunk(pa.Table.from_batches(pending), dtypes, offset)
+
+def cache_chunk(table: "pa.Table", dtypes: Optional[Dict[str, Any]], offset: int) -> pd.DataFrame:
+    """
+    DataFrame of one cached chunk, indexed from its first row's position in the file
+    """
+    df = apply_dtypes(table.to_pandas(), dtypes)
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    return df
+
+def apply_dtypes(df: pd.DataFrame, dtypes: Optional[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Convert columns to their dtype hints (those that could not be applied while parsing)
+    """
+    hints = {column: dtype for column, dtype in (dtypes or {}).items() if column in df.columns}
+    return df.astype(hints) if hints else df
 
 def basic_stats(df: pd.DataFrame, column: str) -> Dict[str, float]:
     """
@@ -1,4 +1,12 @@
 // Main application functionality
+
+// Lines fetched when opening a file other than a notebook
+const FILE_PREVIEW_LINES = 5000;
+// Cells whose outputs are fetched together when one of them scrolls into view
+const OUTPUT_BATCH_SIZE = 10;
+// Uploaded text files up to this size are also opened in the editor
+const EDITABLE_UPLOAD_BYTES = 5 * 1024 * 1024;
+
 class JupyterWebApp {
     constructor() {
         this.currentSection = 'notebook';
@@ -7,6 +15,7 @@ class JupyterWebApp {
         this.originalFileType = null; // 'python' or 'notebook'
         this.originalFilename = null;
         this.originalFilePath = null; // Store the full path with directory
+        this.savedNotebook = null; // Name, path, version and cells of the notebook as last saved on the server
         this.scheduledTasks = []; // Store scheduled tasks
         this.initializeApp();
     }
@@ -144,11 +153,20 @@ class JupyterWebApp {
                 filename = this.originalFilePath; // Use full path instead of just filename
                 content = this.exportAsPython();
             } else {
-                // Save as notebook JSON
-                content = notebook.exportNotebook();
                 if (!filename.endsWith('.ipynb')) {
                     filename += '.ipynb';
                 }
+                
+                // Once the notebook is on the server, only its changed cells are sent
+                if (await this.saveNotebookPatch(filename)) {
+                    this.showNotification(`Notebook saved as ${filename}`, 'success');
+                    localStorage.removeItem('jupyter-web-autosave');
+                    this.updateNotebookInfoAfterSave(filename);
+                    return;
+                }
+                
+                // Save as notebook JSON
+                content = notebook.exportNotebook();
             }
             
             console.log('Saving as:', this.originalFileType === 'python' ? 'Python file' : 'Notebook');
@@ -175,6 +193,9 @@ class JupyterWebApp {
                 
                 if (result.success) {
                     this.showNotification(`Notebook saved as ${filename}`, 'success');
+                    if (filename.endsWith('.ipynb')) {
+                        this.rememberSavedNotebook(filename, result.path, result.version, JSON.parse(content).cells);
+                    }
                     
                     // Clear autosave since we have a proper save now
                     localStorage.removeItem('jupyter-web-autosave');
@@ -201,6 +222,65 @@ class JupyterWebApp {
         }
     }
 
+    rememberSavedNotebook(name, path, version, cells) {
+        // Baseline that later saves are diffed against
+        this.savedNotebook = {
+            name: name,
+            path: path,
+            version: version,
+            cells: cells.map(cell => JSON.stringify(cell))
+        };
+    }
+
+    async saveNotebookPatch(filename) {
+        // Send only the cells that changed since the last server save; false means a full save is needed
+        const saved = this.savedNotebook;
+        if (!notebook || !saved || !saved.version || saved.name !== filename) {
+            return false;
+        }
+        
+        const cells = notebook.exportNotebookData().cells;
+        const serialized = cells.map(cell => JSON.stringify(cell));
+        const changed = {};
+        serialized.forEach((cell, index) => {
+            if (cell !== saved.cells[index]) {
+                changed[index] = cells[index];
+            }
+        });
+        if (Object.keys(changed).length === 0 && serialized.length === saved.cells.length) {
+            return true;
+        }
+        
+        try {
+            const response = await fetch('http://localhost:5000/api/files/notebook', {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    path: saved.path,
+                    base_version: saved.version,
+                    length: serialized.length,
+                    cells: changed
+                })
+            });
+            
+            const result = await response.json();
+            if (!result.success) {
+                // E.g. the file was changed on disk since it was loaded
+                console.warn('Notebook patch rejected, saving the whole notebook:', result.error);
+                return false;
+            }
+            
+            this.savedNotebook = { ...saved, version: result.version, cells: serialized };
+            console.log(`Saved ${result.changed} changed cell(s) of ${saved.path}`);
+            return true;
+        } catch (error) {
+            console.warn('Notebook patch failed, saving the whole notebook:', error);
+            return false;
+        }
+    }
+
     getCurrentNotebookName() {
         const nameElement = document.getElementById('notebookName');
         if (nameElement && nameElement.textContent !== 'Untitled.ipynb') {
@@ -459,19 +539,35 @@ class JupyterWebApp {
     async loadFileContent(path, filename) {
         try {
             let content;
+            let truncated = false;
+            let version = null;
+            let sourceNotebook = null; // Notebook cells without outputs, which are loaded lazily
             
             console.log('Loading file content:', { path, filename });
             
             // Try to load from server first
             try {
-                const url = `http://localhost:5000/api/files/content?path=${encodeURIComponent(path)}`;
+                let url = `http://localhost:5000/api/files/content?path=${encodeURIComponent(path)}`;
+                if (filename.endsWith('.ipynb')) {
+                    // Cell sources first; outputs are fetched as cells scroll into view
+                    url = `http://localhost:5000/api/files/notebook?path=${encodeURIComponent(path)}`;
+                } else {
+                    // Only the first lines of other files, so large data files open instantly
+                    url += `&mode=head&lines=${FILE_PREVIEW_LINES}`;
+                }
                 console.log('Fetching from URL:', url);
                 
                 const response = await fetch(url);
                 console.log('Response status:', response.status);
                 
-                if (response.ok) {
+                if (response.ok && filename.endsWith('.ipynb')) {
+                    sourceNotebook = await response.json();
+                    version = sourceNotebook.version;
+                    console.log('Notebook cells loaded from server:', sourceNotebook.cells.length);
+                } else if (response.ok) {
                     content = await response.text();
+                    truncated = response.headers.get('X-Truncated') === 'true';
+                    version = response.headers.get('X-File-Version');
                     console.log('Content loaded from server:', content.substring(0, 100) + '...');
                 } else {
                     const errorText = await response.text();
@@ -487,7 +583,7 @@ class JupyterWebApp {
             
             if (filename.endsWith('.ipynb')) {
                 // Load as Jupyter notebook
-                const notebookData = JSON.parse(content);
+                const notebookData = sourceNotebook || JSON.parse(content);
                 this.loadNotebook(notebookData);
                 this.fileLoaded = true; // Mark that we loaded from a file
                 
@@ -495,6 +591,12 @@ class JupyterWebApp {
                 this.originalFileType = 'notebook';
                 this.originalFilename = filename;
                 this.originalFilePath = path; // Store the full path
+                if (version) {
+                    this.rememberSavedNotebook(filename, path, version, notebook.exportNotebookData().cells);
+                }
+                if (sourceNotebook) {
+                    this.observeNotebookOutputs(path, sourceNotebook.cells);
+                }
                 
                 // Update notebook info
                 this.updateNotebookInfo(filename, notebookData.cells.length);
@@ -518,15 +620,20 @@ class JupyterWebApp {
                     notebook.hideEmptyNotebook();
                     
                     // Store the original file type for proper saving
-                    this.originalFileType = 'python';
+                    // (a truncated preview must never be saved over the full file)
+                    this.originalFileType = truncated ? null : 'python';
                     this.originalFilename = filename;
-                    this.originalFilePath = path; // Store the full path
+                    this.originalFilePath = truncated ? null : path; // Store the full path
                     this.fileLoaded = true; // Mark that we loaded from a file
                     
                     // Update notebook info
                     this.updateNotebookInfo(filename, 1);
                     
-                    this.showNotification(`Loaded ${filename} as a new notebook`, 'success');
+                    if (truncated) {
+                        this.showNotification(`Showing the first ${FILE_PREVIEW_LINES} lines of ${filename} (preview)`, 'info');
+                    } else {
+                        this.showNotification(`Loaded ${filename} as a new notebook`, 'success');
+                    }
                     
                     // Clear autosave since we loaded from a real file
                     localStorage.removeItem('jupyter-web-autosave');
@@ -688,7 +795,7 @@ print(f"Sum: {sum(data)}")`;
     openFileUpload() {
         const input = document.createElement('input');
         input.type = 'file';
-        input.accept = '.ipynb,.py,.txt,.md,.json,.csv,.html,.css,.js,.xml,.yml,.yaml';
+        input.accept = '.ipynb,.py,.txt,.md,.json,.csv,.html,.css,.js,.xml,.yml,.yaml,.parquet,.feather,.arrow,.xlsx,.xls,.png,.jpg,.jpeg,.gif,.zip,.gz';
         input.multiple = true;
         
         input.onchange = (e) => {
@@ -704,87 +811,145 @@ print(f"Sum: {sum(data)}")`;
         input.click();
     }
 
-    handleFileUpload(file) {
-        const reader = new FileReader();
+    async handleFileUpload(file) {
+        const isNotebook = file.name.endsWith('.ipynb');
+        // Text files small enough to edit are opened after the upload; anything else is only stored
+        const editable = file.size <= EDITABLE_UPLOAD_BYTES && ['.ipynb', '.py', '.txt', '.md', '.json', '.csv']
+            .some(extension => file.name.endsWith(extension));
         
-        reader.onload = async (e) => {
+        try {
+            let path = isNotebook ? `notebooks/${file.name}` : file.name;
+            
+            // First, upload the file to the server
             try {
-                const content = e.target.result;
+                path = await this.uploadFile(file, path);
+                this.showNotification(`File '${file.name}' uploaded and saved successfully!`, 'success');
                 
-                // First, save the file to the server
-                try {
-                    const response = await fetch('http://localhost:5000/api/files/save', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                        },
-                        body: JSON.stringify({
-                            filename: file.name,
-                            content: content
-                        })
-                    });
-                    
-                    const result = await response.json();
-                    
-                    if (result.success) {
-                        this.showNotification(`File '${file.name}' uploaded and saved successfully!`, 'success');
-                        
-                        // Refresh file tree to show the new file
-                        setTimeout(() => this.refreshFileTree(), 500);
-                        
-                        // Now load the file into the editor
-                        if (file.name.endsWith('.ipynb')) {
-                            // Load Jupyter notebook
-                            const notebookData = JSON.parse(content);
-                            this.loadNotebook(notebookData);
-                            this.originalFileType = 'notebook';
-                        } else {
-                            // Load as text file
-                            this.loadTextFile(file.name, content);
-                            this.originalFileType = 'python';
-                        }
-                        
-                        // Set file tracking info
-                        this.originalFilename = file.name;
-                        this.originalFilePath = file.name;
-                        this.fileLoaded = true;
-                        
-                        // Update notebook info
-                        this.updateNotebookInfo(file.name);
-                        
-                        // Switch to notebook tab
-                        document.querySelector('[data-section="notebook"]').click();
-                        
-                    } else {
-                        throw new Error(result.error);
-                    }
-                } catch (serverError) {
-                    // If server save fails, just load into editor (old behavior)
-                    console.warn('Server save failed, loading into editor only:', serverError);
-                    
-                    if (file.name.endsWith('.ipynb')) {
-                        const notebookData = JSON.parse(content);
-                        this.loadNotebook(notebookData);
-                    } else {
-                        this.loadTextFile(file.name, content);
-                    }
-                    
-                    this.showNotification(`File '${file.name}' loaded into editor (save failed: ${serverError.message})`, 'warning');
+                // Refresh file tree to show the new file
+                setTimeout(() => this.refreshFileTree(), 500);
+            } catch (serverError) {
+                // If the upload fails, editable files are still loaded into the editor (old behavior)
+                console.warn('Server upload failed:', serverError);
+                if (!editable) {
+                    this.showNotification(`Upload of '${file.name}' failed: ${serverError.message}`, 'error');
+                    return;
                 }
-                
-            } catch (error) {
-                this.showNotification(`Error processing file '${file.name}': ${error.message}`, 'error');
+                this.showNotification(`File '${file.name}' loaded into editor (save failed: ${serverError.message})`, 'warning');
+                path = null;
             }
-        };
+            
+            if (!editable) return;
+            
+            // Now load the file into the editor
+            const content = await file.text();
+            if (isNotebook) {
+                // Load Jupyter notebook
+                const notebookData = JSON.parse(content);
+                this.loadNotebook(notebookData);
+                this.originalFileType = 'notebook';
+            } else {
+                // Load as text file
+                this.loadTextFile(file.name, content);
+                this.originalFileType = 'python';
+            }
+            
+            if (path) {
+                // Set file tracking info
+                this.originalFilename = file.name;
+                this.originalFilePath = path;
+                this.fileLoaded = true;
+            }
+            
+            // Update notebook info
+            this.updateNotebookInfo(file.name);
+            
+            // Switch to notebook tab
+            document.querySelector('[data-section="notebook"]').click();
+            
+        } catch (error) {
+            this.showNotification(`Error processing file '${file.name}': ${error.message}`, 'error');
+        }
+    }
+
+    async uploadFile(file, path) {
+        // Chunked, resumable upload of any file type; returns the path the file was saved to
+        const resumeKey = `jupyter-web-upload:${path}:${file.size}:${file.lastModified}`;
+        let status = null;
         
-        // Handle different file types appropriately
-        if (file.name.endsWith('.ipynb') || file.name.endsWith('.py') || file.name.endsWith('.txt') || 
-            file.name.endsWith('.md') || file.name.endsWith('.json') || file.name.endsWith('.csv')) {
-            reader.readAsText(file);
-        } else {
-            // For binary files, we might want to handle differently
-            this.showNotification(`File type not supported for editing: ${file.name}`, 'warning');
+        // Continue an upload of the same file that was interrupted earlier
+        const previousId = localStorage.getItem(resumeKey);
+        if (previousId) {
+            const response = await fetch(`http://localhost:5000/api/uploads/${previousId}`);
+            const result = await response.json();
+            if (result.success) {
+                status = result;
+                console.log(`Resuming upload of ${path} at byte ${status.offset}`);
+            }
         }
+        if (!status) {
+            const response = await fetch('http://localhost:5000/api/uploads', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    path: path,
+                    size: file.size
+                })
+            });
+            status = await response.json();
+            if (!status.success) {
+                throw new Error(status.error);
+            }
+            localStorage.setItem(resumeKey, status.id);
+        }
+        
+        const chunkSize = status.chunk_size || 8 * 1024 * 1024;
+        let offset = status.offset;
+        let failures = 0;
+        do {
+            const chunk = file.slice(offset, offset + chunkSize);
+            const headers = { 'Content-Type': 'application/octet-stream' };
+            try {
+                if (window.crypto && crypto.subtle) {
+                    // Lets the server reject a chunk damaged in transit
+                    const digest = await crypto.subtle.digest('SHA-256', await chunk.arrayBuffer());
+                    headers['X-Chunk-SHA256'] = Array.from(new Uint8Array(digest))
+                        .map(byte => byte.toString(16).padStart(2, '0')).join('');
+                }
+                
+                const response = await fetch(`http://localhost:5000/api/uploads/${status.id}?offset=${offset}`, {
+                    method: 'PUT',
+                    headers: headers,
+                    body: chunk
+                });
+                const result = await response.json();
+                if (response.status === 409 && result.offset !== offset) {
+                    offset = result.offset; // The server already has more (or less) of the file
+                    continue;
+                }
+                if (!result.success) {
+                    throw new Error(result.error);
+                }
+                
+                offset = result.offset;
+                failures = 0;
+                if (file.size > chunkSize) {
+                    this.showNotification(`Uploading ${file.name}: ${Math.floor(offset * 100 / file.size)}%`, 'info');
+                }
+                if (result.complete) {
+                    localStorage.removeItem(resumeKey);
+                    return result.path;
+                }
+            } catch (error) {
+                // Retry the chunk a few times before giving up; the upload stays resumable
+                failures++;
+                if (failures > 3) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            }
+        } while (true);
     }
 
     updateNotebookInfo(filename = null, cellCount = null) {
@@ -831,6 +996,12 @@ print(f"Sum: {sum(data)}")`;
     loadNotebook(notebookData) {
         if (!notebook || !notebookData.cells) return;
         
+        this.savedNotebook = null;
+        if (this.outputObserver) {
+            this.outputObserver.disconnect();
+            this.outputObserver = null;
+        }
+        
         // Clear existing cells
         notebook.cells = [];
         notebook.container.innerHTML = '';
@@ -860,6 +1031,99 @@ print(f"Sum: {sum(data)}")`;
         }
     }
 
+    observeNotebookOutputs(path, sourceCells) {
+        // Fetch the outputs of a batch of cells once one of them comes near the viewport
+        const requested = new Set();
+        this.outputObserver = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (!entry.isIntersecting) return;
+                const index = notebook.cells.findIndex(cell => cell.id === entry.target.id);
+                if (index < 0) return;
+                
+                const start = index - (index % OUTPUT_BATCH_SIZE);
+                if (!requested.has(start)) {
+                    requested.add(start);
+                    this.loadNotebookOutputs(path, start, start + OUTPUT_BATCH_SIZE);
+                }
+            });
+        }, { rootMargin: '600px' });
+        
+        notebook.cells.forEach((cell, index) => {
+            const cellElement = document.getElementById(cell.id);
+            if (cellElement && sourceCells[index] && sourceCells[index].output_count > 0) {
+                this.outputObserver.observe(cellElement);
+            }
+        });
+    }
+
+    async loadNotebookOutputs(path, start, stop) {
+        try {
+            const url = `http://localhost:5000/api/files/notebook/outputs?path=${encodeURIComponent(path)}&start=${start}&stop=${stop}`;
+            const response = await fetch(url);
+            const result = await response.json();
+            if (!result.success) {
+                throw new Error(result.error);
+            }
+            if (this.originalFilePath !== path) return; // Another file was opened meanwhile
+            
+            // Fetched outputs are not edits, so they must not show up in the next save's diff
+            const before = notebook.exportNotebookData().cells.map(cell => JSON.stringify(cell));
+            Object.entries(result.outputs).forEach(([index, outputs]) => {
+                const cell = notebook.cells[index];
+                if (cell && outputs.length > 0) {
+                    this.showNotebookOutputs(cell, outputs);
+                    const cellElement = document.getElementById(cell.id);
+                    if (cellElement && this.outputObserver) {
+                        this.outputObserver.unobserve(cellElement);
+                    }
+                }
+            });
+            
+            const saved = this.savedNotebook;
+            if (saved && saved.path === path) {
+                const after = notebook.exportNotebookData().cells.map(cell => JSON.stringify(cell));
+                Object.keys(result.outputs).forEach(index => {
+                    if (saved.cells[index] === before[index]) {
+                        saved.cells[index] = after[index];
+                    }
+                });
+            }
+        } catch (error) {
+            console.warn('Failed to load notebook outputs:', error.message);
+        }
+    }
+
+    showNotebookOutputs(cell, outputs) {
+        // Render nbformat outputs; large values come as URLs of the backend's output store
+        const joinText = (value) => Array.isArray(value) ? value.join('') : (value || '');
+        const text = outputs
+            .map(out => joinText(out.text) || joinText(out.data?.['text/plain']) || joinText(out.evalue))
+            .filter(value => value)
+            .join('\n');
+        
+        const images = [];
+        outputs.forEach(out => {
+            Object.entries(out.urls || {}).forEach(([mime, url]) => {
+                if (mime.startsWith('image/')) {
+                    images.push(`http://localhost:5000${url}`);
+                }
+            });
+            Object.entries(out.data || {}).forEach(([mime, value]) => {
+                if (mime === 'image/svg+xml') {
+                    images.push(`data:${mime};charset=utf-8,${encodeURIComponent(joinText(value))}`);
+                } else if (mime.startsWith('image/') && value) {
+                    images.push(`data:${mime};base64,${joinText(value)}`);
+                }
+            });
+        });
+        
+        if (images.length > 0) {
+            notebook.showCellOutputWithPlots(cell, text, images);
+        } else if (text) {
+            notebook.showCellOutput(cell, text);
+        }
+    }
+
     loadTextFile(filename, content) {
         if (!notebook) return;
         
@@ -965,6 +1229,11 @@ print(f"Sum: {sum(data)}")`;
                 if (lastSavedElement) {
                     lastSavedElement.textContent = new Date().toLocaleTimeString();
                 }
+                
+                // A notebook opened from or saved to the server also gets its changed cells saved there
+                if (this.savedNotebook) {
+                    this.saveNotebookPatch(this.getCurrentNotebookName());
+                }
             }
         }, 5 * 60 * 1000); // 5 minutes
     }
@@ -1147,35 +1416,34 @@ print(f"Sum: {sum(data)}")`;
         configContainer.innerHTML = configHTML;
     }
 
-    handleTaskSubmit(e) {
+    async handleTaskSubmit(e) {
         e.preventDefault();
         
         const formData = new FormData(e.target);
         const taskData = {
-            id: Date.now(), // Simple ID generation
             name: formData.get('taskName') || document.getElementById('taskName').value,
             description: formData.get('taskDescription') || document.getElementById('taskDescription').value,
             notebook: document.getElementById('taskNotebook').value,
             scheduleType: document.getElementById('scheduleType').value,
-            enabled: document.getElementById('taskEnabled').checked,
-            created: new Date().toISOString(),
-            lastRun: null,
-            nextRun: null,
-            status: 'enabled'
+            enabled: document.getElementById('taskEnabled').checked
         };
 
         // Get schedule configuration
         taskData.schedule = this.getScheduleConfig(taskData.scheduleType);
-        taskData.nextRun = this.calculateNextRun(taskData.schedule, taskData.scheduleType);
 
-        // Add to tasks list
-        this.scheduledTasks.push(taskData);
-        this.saveScheduledTasks();
-        this.updateTasksList();
-        
-        this.hideTaskForm();
-        this.showNotification(`Task "${taskData.name}" created successfully!`, 'success');
-        this.addLog('success', `Created new task: ${taskData.name}`);
+        try {
+            // The server validates the schedule, stores the task and runs it
+            const result = await this.schedulerRequest('/tasks', 'POST', taskData);
+            this.scheduledTasks.push(result.task);
+            this.updateTasksList();
+            
+            this.hideTaskForm();
+            this.showNotification(`Task "${taskData.name}" created successfully!`, 'success');
+            this.addLog('success', `Created new task: ${taskData.name}`);
+        } catch (error) {
+            this.showNotification(`Could not create task: ${error.message}`, 'error');
+            this.addLog('error', `Could not create task "${taskData.name}": ${error.message}`);
+        }
     }
 
     getScheduleConfig(scheduleType) {
@@ -1204,56 +1472,43 @@ print(f"Sum: {sum(data)}")`;
         return config;
     }
 
-    calculateNextRun(schedule, scheduleType) {
-        const now = new Date();
-        let nextRun = new Date();
-
-        switch (scheduleType) {
-            case 'interval':
-                const milliseconds = schedule.value * (schedule.unit === 'hours' ? 3600000 : 60000);
-                nextRun = new Date(now.getTime() + milliseconds);
-                break;
-
-            case 'daily':
-                const [hours, minutes] = schedule.time.split(':');
-                nextRun.setHours(parseInt(hours), parseInt(minutes), 0, 0);
-                if (nextRun <= now) {
-                    nextRun.setDate(nextRun.getDate() + 1);
-                }
-                break;
-
-            case 'weekly':
-                nextRun.setDate(now.getDate() + (schedule.day - now.getDay() + 7) % 7);
-                const [weekHours, weekMinutes] = schedule.time.split(':');
-                nextRun.setHours(parseInt(weekHours), parseInt(weekMinutes), 0, 0);
-                if (nextRun <= now) {
-                    nextRun.setDate(nextRun.getDate() + 7);
-                }
-                break;
-
-            case 'cron':
-                // Simple cron parsing - would need more sophisticated library in production
-                nextRun = new Date(now.getTime() + 3600000); // Default to 1 hour
-                break;
+    async schedulerRequest(path, method = 'GET', body = null) {
+        const options = { method, headers: {} };
+        if (body) {
+            options.headers['Content-Type'] = 'application/json';
+            options.body = JSON.stringify(body);
         }
 
-        return nextRun.toISOString();
-    }
-
-    loadScheduledTasks() {
-        const saved = localStorage.getItem('scheduler-tasks');
-        if (saved) {
-            try {
-                this.scheduledTasks = JSON.parse(saved);
-            } catch (error) {
-                console.error('Error loading scheduled tasks:', error);
-                this.scheduledTasks = [];
-            }
+        const response = await fetch(`http://localhost:5000/api/scheduler${path}`, options);
+        const result = await response.json();
+        if (!result.success) {
+            throw new Error(result.error || `Request failed: ${response.status}`);
         }
+        return result;
     }
 
-    saveScheduledTasks() {
-        localStorage.setItem('scheduler-tasks', JSON.stringify(this.scheduledTasks));
+    async loadScheduledTasks() {
+        try {
+            const result = await this.schedulerRequest('/tasks');
+            
+            // Report runs that finished since the last refresh
+            const previous = new Map(this.scheduledTasks.map(task => [task.id, task]));
+            result.tasks.forEach(task => {
+                const before = previous.get(task.id);
+                if (before && task.lastRun && task.lastRun !== before.lastRun) {
+                    if (task.lastStatus === 'success') {
+                        this.addLog('success', `Task "${task.name}" completed successfully`);
+                    } else {
+                        this.addLog('error', `Task "${task.name}" ${task.lastStatus}`);
+                    }
+                }
+            });
+            
+            this.scheduledTasks = result.tasks;
+            this.updateTasksList();
+        } catch (error) {
+            console.error('Error loading scheduled tasks:', error);
+        }
     }
 
     updateTasksList() {
@@ -1317,14 +1572,17 @@ print(f"Sum: {sum(data)}")`;
         }
     }
 
-    toggleTask(taskId) {
+    async toggleTask(taskId) {
         const task = this.scheduledTasks.find(t => t.id === taskId);
-        if (task) {
-            task.enabled = !task.enabled;
-            task.status = task.enabled ? 'enabled' : 'disabled';
-            this.saveScheduledTasks();
+        if (!task) return;
+
+        try {
+            const result = await this.schedulerRequest(`/tasks/${taskId}`, 'PATCH', { enabled: !task.enabled });
+            Object.assign(task, result.task);
             this.updateTasksList();
             this.addLog('info', `Task "${task.name}" ${task.enabled ? 'enabled' : 'disabled'}`);
+        } catch (error) {
+            this.showNotification(`Could not update task: ${error.message}`, 'error');
         }
     }
 
@@ -1332,84 +1590,31 @@ print(f"Sum: {sum(data)}")`;
         const task = this.scheduledTasks.find(t => t.id === taskId);
         if (!task) return;
 
-        this.addLog('info', `Running task: ${task.name}`);
-        
         try {
-            // Execute the task
-            await this.executeTask(task);
-            
-            // Update last run time
-            task.lastRun = new Date().toISOString();
-            task.nextRun = this.calculateNextRun(task.schedule, task.scheduleType);
-            
-            this.saveScheduledTasks();
-            this.updateTasksList();
-            
-            this.addLog('success', `Task "${task.name}" completed successfully`);
-            this.showNotification(`Task "${task.name}" executed successfully!`, 'success');
-            
+            // Runs on the server; the next refresh reports the outcome
+            await this.schedulerRequest(`/tasks/${taskId}/run`, 'POST');
+            this.addLog('info', `Running task: ${task.name}`);
+            this.showNotification(`Task "${task.name}" started`, 'success');
         } catch (error) {
             this.addLog('error', `Task "${task.name}" failed: ${error.message}`);
             this.showNotification(`Task "${task.name}" failed: ${error.message}`, 'error');
         }
     }
 
-    async executeTask(task) {
-        try {
-            // Load the file content
-            const response = await fetch(`http://localhost:5000/api/files/content?path=${encodeURIComponent(task.notebook)}`);
-            if (!response.ok) {
-                throw new Error(`Failed to load file: ${response.status}`);
-            }
-            
-            const content = await response.text();
-            
-            // Execute the content
-            if (task.notebook.endsWith('.ipynb')) {
-                // Execute notebook cells
-                const notebookData = JSON.parse(content);
-                for (const cellData of notebookData.cells) {
-                    if (cellData.cell_type === 'code' && cellData.source.length > 0) {
-                        const code = Array.isArray(cellData.source) ? cellData.source.join('') : cellData.source;
-                        await this.executeCode(code);
-                    }
-                }
-            } else {
-                // Execute Python file
-                await this.executeCode(content);
-            }
-        } catch (error) {
-            throw new Error(`Task execution failed: ${error.message}`);
-        }
-    }
-
-    async executeCode(code) {
-        const response = await fetch('http://localhost:5000/api/execute', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ code })
-        });
-
-        const result = await response.json();
-        if (!result.success) {
-            throw new Error(result.error || 'Code execution failed');
-        }
-        
-        return result;
-    }
-
-    deleteTask(taskId) {
+    async deleteTask(taskId) {
         if (confirm('Are you sure you want to delete this task?')) {
             const taskIndex = this.scheduledTasks.findIndex(t => t.id === taskId);
             if (taskIndex >= 0) {
                 const task = this.scheduledTasks[taskIndex];
-                this.scheduledTasks.splice(taskIndex, 1);
-                this.saveScheduledTasks();
-                this.updateTasksList();
-                this.addLog('warning', `Deleted task: ${task.name}`);
-                this.showNotification(`Task "${task.name}" deleted`, 'warning');
+                try {
+                    await this.schedulerRequest(`/tasks/${taskId}`, 'DELETE');
+                    this.scheduledTasks.splice(taskIndex, 1);
+                    this.updateTasksList();
+                    this.addLog('warning', `Deleted task: ${task.name}`);
+                    this.showNotification(`Task "${task.name}" deleted`, 'warning');
+                } catch (error) {
+                    this.showNotification(`Could not delete task: ${error.message}`, 'error');
+                }
             }
         }
     }
@@ -1451,20 +1656,12 @@ print(f"Sum: {sum(data)}")`;
         this.addLog('info', 'Logs refreshed');
     }
 
-    // Start the scheduler background process
+    // Tasks run on the server; keep the task list in sync with it
     startScheduler() {
-        // Check for tasks to run every minute
-        setInterval(() => {
-            const now = new Date();
-            
-            this.scheduledTasks.forEach(task => {
-                if (task.enabled && task.nextRun && new Date(task.nextRun) <= now) {
-                    this.runTaskNow(task.id);
-                }
-            });
-        }, 60000); // Check every minute
+        this.loadScheduledTasks();
+        setInterval(() => this.loadScheduledTasks(), 60000); // Refresh every minute
         
-        this.addLog('success', 'Scheduler started - checking for tasks every minute');
+        this.addLog('success', 'Connected to server scheduler');
     }
 }
 
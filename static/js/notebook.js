@@ -5,9 +5,20 @@ class NotebookManager {
         this.selectedCellIndex = -1;
         this.cellCounter = 0;
         this.container = document.getElementById('notebookContainer');
+        this.sessionId = this.getSessionId();
         this.initializeEventListeners();
     }
 
+    getSessionId() {
+        // One backend kernel per browser tab: keep the id for the lifetime of the tab
+        let sessionId = sessionStorage.getItem('jupyter-web-session-id');
+        if (!sessionId) {
+            sessionId = `session-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+            sessionStorage.setItem('jupyter-web-session-id', sessionId);
+        }
+        return sessionId;
+    }
+
     initializeEventListeners() {
         // Cell management buttons
         document.getElementById('addCodeCell').addEventListener('click', () => {
@@ -253,7 +264,7 @@ class NotebookManager {
         return false;
     }
 
-    runCell(index) {
+    runCell(index, options = {}) {
         if (index < 0 || index >= this.cells.length) return;
 
         const cell = this.cells[index];
@@ -263,7 +274,7 @@ class NotebookManager {
         cellElement.classList.add('loading');
 
         if (cell.type === 'code') {
-            this.executePythonCode(cell, index);
+            return this.executePythonCode(cell, index, options);
         } else if (cell.type === 'markdown') {
             this.renderMarkdown(cell, index);
         }
@@ -274,7 +285,7 @@ class NotebookManager {
         }, 500);
     }
 
-    async executePythonCode(cell, index) {
+    async executePythonCode(cell, index, options = {}) {
         const code = cell.content.trim();
         
         if (!code) {
@@ -288,26 +299,18 @@ class NotebookManager {
                 window.app.updateKernelStatus('busy');
             }
 
-            // Call the backend API to execute Python code
-            const response = await fetch('http://localhost:5000/api/execute', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    code: code,
-                    cell_id: cell.id
-                })
-            });
-
-            const result = await response.json();
+            // Call the backend API to execute Python code, rendering output as it streams in
+            const result = await this.streamPythonExecution(cell, code, options);
 
             if (result.success) {
                 // Show successful output
                 let output = result.output ? result.output.trim() : '';
                 
                 // Add execution time if available
-                if (result.execution_time) {
+                if (result.reused) {
+                    const reusedInfo = '[Unchanged - reused previous result]';
+                    output = output ? output + '\n\n' + reusedInfo : reusedInfo;
+                } else if (result.execution_time) {
                     const timeInfo = `[Executed in ${(result.execution_time * 1000).toFixed(1)}ms]`;
                     if (output) {
                         output = output + '\n\n' + timeInfo;
@@ -359,6 +362,89 @@ class NotebookManager {
         }
     }
 
+    async streamPythonExecution(cell, code, options = {}) {
+        // Execute via the Server-Sent Events endpoint; resolves with the final result,
+        // whose output is rebuilt from the streamed chunks
+        const response = await fetch('http://localhost:5000/api/execute/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                code: code,
+                cell_id: cell.id,
+                session_id: this.sessionId,
+                incremental: Boolean(options.incremental)
+            })
+        });
+
+        if (!response.ok || !response.body) {
+            return await response.json();
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let output = '';
+        let plots = [];
+        let result = null;
+        let renderPending = false;
+
+        const scheduleRender = () => {
+            // Coalesce bursts of chunks into one repaint per frame
+            if (renderPending) return;
+            renderPending = true;
+            requestAnimationFrame(() => {
+                renderPending = false;
+                if (result) return;
+                if (plots.length > 0) {
+                    this.showCellOutputWithPlots(cell, output, plots);
+                } else {
+                    this.showCellOutput(cell, output, 'success');
+                }
+            });
+        };
+
+        while (!result) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const message = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventType = 'message';
+                let data = '';
+                message.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) eventType = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (!data) continue;
+                const payload = JSON.parse(data);
+
+                if (eventType === 'stream') {
+                    output += payload.text;
+                    scheduleRender();
+                } else if (eventType === 'display') {
+                    plots = plots.concat(payload.plots);
+                    scheduleRender();
+                } else if (eventType === 'result') {
+                    result = payload;
+                }
+            }
+        }
+
+        if (!result) {
+            throw new Error('Execution stream ended unexpectedly');
+        }
+
+        result.output = output + (result.output || '');
+        result.plots = plots.concat(result.plots || []);
+        return result;
+    }
+
     renderMarkdown(cell, index) {
         const markdown = cell.content;
         let html = '';
@@ -478,7 +564,8 @@ class NotebookManager {
                     body: JSON.stringify({
                         packages: missingPackages,
                         code: code,
-                        cell_id: cell.id
+                        cell_id: cell.id,
+                        session_id: this.sessionId
                     }),
                     signal: controller.signal
                 });
@@ -589,7 +676,8 @@ class NotebookManager {
             plotContainer.className = 'plot-container';
             
             const plotImage = document.createElement('img');
-            plotImage.src = plotData;
+            // Plots are references to the backend's content-addressed plot cache
+            plotImage.src = typeof plotData === 'string' ? plotData : `http://localhost:5000${plotData.url}`;
             plotImage.className = 'plot-image';
             plotImage.alt = `Plot ${index + 1}`;
             
@@ -659,12 +747,11 @@ class NotebookManager {
         console.log(`Output displayed for cell ${cell.id}:`, output);
     }
 
-    runAllCells() {
-        this.cells.forEach((cell, index) => {
-            setTimeout(() => {
-                this.runCell(index);
-            }, index * 100); // Stagger execution
-        });
+    async runAllCells(options = {}) {
+        // Run in order; with options.incremental, cells whose code and inputs are unchanged are skipped
+        for (let index = 0; index < this.cells.length; index++) {
+            await this.runCell(index, options);
+        }
     }
 
     clearAllOutputs() {
@@ -872,10 +959,15 @@ class NotebookManager {
 
     // Export notebook as JSON
     exportNotebook() {
+        return JSON.stringify(this.exportNotebookData(), null, 2);
+    }
+
+    // Notebook as an nbformat object
+    exportNotebookData() {
         // Sync all cell contents from editors before export
         this.syncAllCellContents();
         
-        const notebook = {
+        return {
             cells: this.cells.map(cell => ({
                 cell_type: cell.type,
                 source: cell.content.split('\n'),
@@ -891,8 +983,6 @@ class NotebookManager {
             nbformat: 4,
             nbformat_minor: 4
         };
-
-        return JSON.stringify(notebook, null, 2);
     }
 
     // Sync all cell contents from their editors
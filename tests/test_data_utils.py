@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_utils
+from data_utils import load_csv_data
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'id': range(10),
+        'value': rng.random(10),
+        'label': ['a', '', 'c', 'd', 'e'] * 2,
+        'day': ['2024-01-01'] * 10,
+        'empty': [None] * 10,
+    })
+    path = tmp_path / 'data.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def assert_same_frame(cached, direct):
+    # pyarrow parses floats exactly; pandas' default parser may differ in the last digit
+    pd.testing.assert_frame_equal(cached, direct, check_exact=False)
+
+
+@pytest.mark.parametrize('cache_format', ['parquet', 'arrow'])
+def test_cached_read_matches_pandas(csv_path, cache_format):
+    pytest.importorskip('pyarrow')
+    direct = pd.read_csv(csv_path)
+    for _ in range(2):  # Building the sidecar, then reading it
+        assert_same_frame(load_csv_data(csv_path, cache=True, cache_format=cache_format), direct)
+
+
+@pytest.mark.parametrize('cache_format', ['parquet', 'arrow'])
+def test_cached_chunks_match_pandas(csv_path, cache_format):
+    pytest.importorskip('pyarrow')
+    direct = list(pd.read_csv(csv_path, usecols=['id', 'label'], chunksize=4))
+    for _ in range(2):
+        chunks = list(load_csv_data(csv_path, columns=['id', 'label'], chunksize=4, cache=True,
+                                    cache_format=cache_format))
+        assert [chunk.index[0] for chunk in chunks] == [0, 4, 8]
+        for cached, expected in zip(chunks, direct):
+            assert_same_frame(cached, expected)
+
+
+def test_dtype_hints_apply_with_and_without_cache(csv_path):
+    pytest.importorskip('pyarrow')
+    dtypes = {'id': 'int32', 'label': 'category'}
+    assert_same_frame(load_csv_data(csv_path, dtypes=dtypes, cache=True), load_csv_data(csv_path, dtypes=dtypes))
+
+
+def test_changed_csv_is_not_served_from_cache(csv_path):
+    pytest.importorskip('pyarrow')
+    load_csv_data(csv_path, cache=True)
+    pd.DataFrame({'id': [1, 2]}).to_csv(csv_path, index=False)
+    assert load_csv_data(csv_path, cache=True)['id'].tolist() == [1, 2]
+
+
+def test_no_cache_by_default(csv_path, tmp_path):
+    load_csv_data(csv_path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['data.csv']
+
+
+def test_cache_without_pyarrow_warns_and_reads_directly(csv_path, monkeypatch):
+    monkeypatch.setattr(data_utils, 'pa', None)
+    with pytest.warns(RuntimeWarning, match='pyarrow'):
+        df = load_csv_data(csv_path, cache=True)
+    pd.testing.assert_frame_equal(df, pd.read_csv(csv_path))
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+import backend_server
+from backend_server import LazyModule, execute_incremental, variable_version
+
+
+@pytest.fixture(autouse=True)
+def fresh_namespace():
+    backend_server.reset_execution_namespace()
+    backend_server.cell_records.clear()
+    yield
+    backend_server.cell_records.clear()
+
+
+def run(code, key):
+    result = execute_incremental(code, key)
+    assert result.success, result.error
+    return result
+
+
+def namespace():
+    return backend_server.execution_namespace
+
+
+def test_unchanged_cells_are_reused():
+    assert not run('x = 1', 0).reused
+    assert not run('y = x + 1\nprint(y)', 1).reused
+    
+    assert run('x = 1', 0).reused
+    second = run('y = x + 1\nprint(y)', 1)
+    assert second.reused
+    assert second.output == '2\n'
+    assert namespace()['y'] == 2
+
+
+def test_changed_source_reruns_the_cell_and_its_dependents():
+    run('x = 1', 0)
+    run('y = x + 1', 1)
+    
+    assert not run('x = 5', 0).reused
+    assert not run('y = x + 1', 1).reused
+    assert namespace()['y'] == 6
+
+
+def test_rebound_input_invalidates_the_reader():
+    run('x = [1, 2]', 0)
+    run('n = len(x)', 1)
+    namespace()['x'] = [1, 2, 3]
+    
+    assert not run('n = len(x)', 1).reused
+    assert namespace()['n'] == 3
+
+
+def test_output_modified_in_place_reruns_the_cell():
+    run('y = [1, 2, 3]', 0)
+    run('y.append(4)', 1)
+    
+    # Reusing cell 0 would rebind the list that cell 1 already appended to
+    assert not run('y = [1, 2, 3]', 0).reused
+    run('y.append(4)', 1)
+    assert namespace()['y'] == [1, 2, 3, 4]
+
+
+def test_failed_cells_are_always_rerun():
+    first = execute_incremental('z = undefined_name', 0)
+    assert not first.success
+    assert not execute_incremental('z = undefined_name', 0).reused
+
+
+def test_lazy_module_and_imported_module_have_the_same_version():
+    placeholder = LazyModule('json', 'json', {})
+    assert variable_version(placeholder) == variable_version(json)
+
+
+def test_cell_reading_a_lazy_alias_is_reused_after_the_import():
+    namespace()['json'] = LazyModule('json', 'json', namespace())
+    
+    assert not run("s = json.dumps([1])", 0).reused
+    assert not isinstance(namespace()['json'], LazyModule)
+    assert run("s = json.dumps([1])", 0).reused
+
+
+def test_incremental_task_keeps_its_kernel_past_the_idle_timeout(tmp_path, monkeypatch):
+    notebook = tmp_path / 'task.ipynb'
+    notebook.write_text(json.dumps({'cells': [{'cell_type': 'code', 'source': 'x = 1'},
+                                              {'cell_type': 'code', 'source': 'y = x + 1'}]}))
+    scheduler = backend_server.Scheduler(store_path=str(tmp_path / 'tasks.db'))
+    task = scheduler.store.create_task({
+        'name': 'incremental', 'description': '', 'notebook': str(notebook), 'scheduleType': 'interval',
+        'schedule': {'minutes': 60}, 'catchUp': 'run_once', 'incremental': True, 'enabled': True,
+        'created': '2026-01-01 00:00:00', 'nextRun': None
+    })
+    kernels = backend_server.kernel_manager
+    monkeypatch.setattr(kernels, 'idle_timeout', 0)
+    try:
+        for _ in range(2):
+            scheduler._run(task, scheduler.store.add_run(task['id'], 'manual', None))
+            # Runs are further apart than the idle timeout
+            kernels.reap_idle_kernels()
+        
+        runs = scheduler.store.list_runs(task['id'])
+        assert [(run['status'], run['cells_run'], run['cells_reused']) for run in reversed(runs)] == [
+            ('success', 2, 0), ('success', 2, 2)]
+    finally:
+        backend_server.release_task_kernel(task['id'])
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from backend_server import NotebookConflict, NotebookStore
+
+
+def code_cell(source):
+    return {'cell_type': 'code', 'source': source, 'metadata': {}, 'outputs': [], 'execution_count': None}
+
+
+@pytest.fixture
+def notebook_path(tmp_path):
+    path = tmp_path / 'nb.ipynb'
+    path.write_text(json.dumps({'cells': [code_cell('a = 1'), code_cell('b = 2')], 'metadata': {},
+                                'nbformat': 4, 'nbformat_minor': 5}))
+    return str(path)
+
+
+@pytest.fixture
+def store():
+    # Flush explicitly in the tests instead of waiting for the writer thread
+    return NotebookStore(flush_interval=3600)
+
+
+def test_patch_replaces_listed_cells_only(store, notebook_path):
+    _, version = store.read(notebook_path)
+    new_version = store.patch(notebook_path, version, 3, {'1': code_cell('b = 3'), '2': code_cell('c = 4')})
+    
+    notebook, current = store.read(notebook_path)
+    assert current == new_version != version
+    assert [cell['source'] for cell in notebook['cells']] == ['a = 1', 'b = 3', 'c = 4']
+    
+    assert store.flush(notebook_path) == 1
+    with open(notebook_path, encoding='utf-8') as f:
+        assert [cell['source'] for cell in json.load(f)['cells']] == ['a = 1', 'b = 3', 'c = 4']
+
+
+def test_patch_on_outdated_version_conflicts(store, notebook_path):
+    _, version = store.read(notebook_path)
+    current = store.patch(notebook_path, version, 2, {0: code_cell('a = 10')})
+    
+    with pytest.raises(NotebookConflict) as conflict:
+        store.patch(notebook_path, version, 2, {1: code_cell('b = 20')})
+    assert conflict.value.version == current
+    assert [cell['source'] for cell in store.read(notebook_path)[0]['cells']] == ['a = 10', 'b = 2']
+
+
+def test_external_change_invalidates_version(store, notebook_path):
+    _, version = store.read(notebook_path)
+    with open(notebook_path, 'w', encoding='utf-8') as f:
+        json.dump({'cells': [code_cell('edited elsewhere')], 'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5}, f)
+    
+    with pytest.raises(NotebookConflict):
+        store.patch(notebook_path, version, 1, {0: code_cell('a = 1')})
+    notebook, _ = store.read(notebook_path)
+    assert [cell['source'] for cell in notebook['cells']] == ['edited elsewhere']
+
+
+def test_patch_can_shrink_the_notebook(store, notebook_path):
+    _, version = store.read(notebook_path)
+    store.patch(notebook_path, version, 1, {})
+    assert [cell['source'] for cell in store.read(notebook_path)[0]['cells']] == ['a = 1']
+
+
+@pytest.mark.parametrize('length, cells', [
+    (3, {}),                          # New cell 2 not sent
+    (2, {5: code_cell('x')}),         # Index beyond the length
+    (-1, {}),                         # Negative length
+    (2, {'first': code_cell('x')}),   # Non-integer index
+    (2, {0: 'a = 1'}),                # Cell is not an object
+])
+def test_malformed_patches_are_rejected(store, notebook_path, length, cells):
+    _, version = store.read(notebook_path)
+    with pytest.raises(ValueError):
+        store.patch(notebook_path, version, length, cells)
+    assert store.read(notebook_path)[1] == version
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import pytest
+
+from backend_server import CronExpression
+
+
+def test_cron_every_fifteen_minutes():
+    cron = CronExpression('*/15 * * * *')
+    assert cron.next_after(datetime(2026, 3, 1, 10, 7)) == datetime(2026, 3, 1, 10, 15)
+    assert cron.next_after(datetime(2026, 3, 1, 10, 45)) == datetime(2026, 3, 1, 11, 0)
+
+
+def test_cron_next_is_strictly_after():
+    cron = CronExpression('30 9 * * *')
+    assert cron.next_after(datetime(2026, 3, 1, 9, 30, 15)) == datetime(2026, 3, 2, 9, 30)
+
+
+def test_cron_weekday_names_and_sunday_as_seven():
+    # 2026-03-01 is a Sunday
+    assert CronExpression('0 8 * * mon-fri').next_after(datetime(2026, 3, 1, 12, 0)) == datetime(2026, 3, 2, 8, 0)
+    assert CronExpression('0 8 * * 7').next_after(datetime(2026, 2, 27, 0, 0)) == datetime(2026, 3, 1, 8, 0)
+
+
+def test_cron_day_fields_match_either_when_both_restricted():
+    cron = CronExpression('0 0 13 * fri')
+    # Friday 2026-03-06 comes before the 13th
+    assert cron.next_after(datetime(2026, 3, 1)) == datetime(2026, 3, 6, 0, 0)
+
+
+def test_cron_month_rollover_and_leap_day():
+    assert CronExpression('0 0 1 jan *').next_after(datetime(2026, 6, 15)) == datetime(2027, 1, 1, 0, 0)
+    assert CronExpression('0 0 29 2 *').next_after(datetime(2026, 3, 1)) == datetime(2028, 2, 29, 0, 0)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '*/0 * * * *', '0 0 * foo *', '5-2 * * * *'])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_cron_that_never_matches():
+    with pytest.raises(ValueError):
+        CronExpression('0 0 31 2 *').next_after(datetime(2026, 1, 1))
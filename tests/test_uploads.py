@@ -0,0 +1,87 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from backend_server import UploadConflict, UploadManager
+
+DATA = bytes(range(256)) * 40
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    # Upload targets are relative to the workspace, i.e. the working directory
+    monkeypatch.chdir(tmp_path)
+    return UploadManager(directory=str(tmp_path / '.uploads'))
+
+
+def test_upload_in_chunks_with_checksums(uploads, tmp_path):
+    upload = uploads.create('data/file.bin', len(DATA), sha256(DATA))
+    
+    first = uploads.write_chunk(upload['id'], 0, io.BytesIO(DATA[:4000]), sha256(DATA[:4000]))
+    assert (first['offset'], first['complete']) == (4000, False)
+    done = uploads.write_chunk(upload['id'], 4000, io.BytesIO(DATA[4000:]), sha256(DATA[4000:]))
+    
+    assert done['complete']
+    assert (tmp_path / 'data' / 'file.bin').read_bytes() == DATA
+    assert os.listdir(tmp_path / '.uploads') == []
+
+
+def test_resume_from_reported_offset(uploads, tmp_path):
+    upload = uploads.create('file.bin', len(DATA))
+    uploads.write_chunk(upload['id'], 0, io.BytesIO(DATA[:1000]))
+    
+    # A client that lost track (or a restarted server) asks where to continue
+    resumed = UploadManager(directory=uploads.directory).status(upload['id'])
+    assert resumed['offset'] == 1000
+    with pytest.raises(UploadConflict) as conflict:
+        uploads.write_chunk(upload['id'], 0, io.BytesIO(DATA[:1000]))
+    assert conflict.value.offset == 1000
+    
+    assert uploads.write_chunk(upload['id'], resumed['offset'], io.BytesIO(DATA[1000:]))['complete']
+    assert (tmp_path / 'file.bin').read_bytes() == DATA
+
+
+def test_chunk_with_wrong_checksum_is_discarded(uploads):
+    upload = uploads.create('file.bin', len(DATA))
+    uploads.write_chunk(upload['id'], 0, io.BytesIO(DATA[:1000]))
+    
+    with pytest.raises(ValueError):
+        uploads.write_chunk(upload['id'], 1000, io.BytesIO(b'x' * 1000), sha256(DATA[1000:2000]))
+    assert uploads.status(upload['id'])['offset'] == 1000
+
+
+def test_file_with_wrong_checksum_is_not_moved_into_place(uploads, tmp_path):
+    upload = uploads.create('file.bin', len(DATA), sha256(b'something else'))
+    
+    with pytest.raises(ValueError):
+        uploads.write_chunk(upload['id'], 0, io.BytesIO(DATA))
+    assert not (tmp_path / 'file.bin').exists()
+    with pytest.raises(KeyError):
+        uploads.status(upload['id'])
+
+
+def test_chunk_past_declared_size_is_rejected(uploads):
+    upload = uploads.create('file.bin', 10)
+    with pytest.raises(ValueError):
+        uploads.write_chunk(upload['id'], 0, io.BytesIO(b'x' * 11))
+    assert uploads.status(upload['id'])['offset'] == 0
+
+
+@pytest.mark.parametrize('path', ['../outside.bin', '/etc/passwd', ''])
+def test_upload_outside_workspace_is_rejected(uploads, path):
+    with pytest.raises(ValueError):
+        uploads.create(path, 10)
+
+
+def test_expired_uploads_are_removed(uploads):
+    upload = uploads.create('file.bin', 10)
+    uploads.expiry = -1
+    uploads.expire()
+    with pytest.raises(KeyError):
+        uploads.status(upload['id'])